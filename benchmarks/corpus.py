@@ -0,0 +1,102 @@
+import random
+
+from chord_hand.analysis.harmonic_region import HarmonicRegion
+from chord_hand.analysis.modality import Modality, get_scale_step_chroma
+from chord_hand.chord.chord import Chord
+from chord_hand.chord.keymap import CODE_TO_NOTE
+from chord_hand.chord.note import Note
+from chord_hand.chord.quality import ChordQuality
+from chord_hand.encoding.projeto_mpb.maps import quality_to_code
+from chord_hand.settings import get_context
+from chord_hand.song import Song, propagate_regions
+
+TONICS = [Note(0, 0), Note(4, 0), Note(3, 0), Note(1, 0), Note(6, -1), Note(5, 0), Note(2, -1), Note(2, 0), Note(5, -1)]
+
+# (scale step, quality string, weight) for a plausible tonal progression
+MAJOR_DEGREES = [
+    (0, 'MpM______', 6),
+    (1, 'mpm______', 5),
+    (2, 'mpm______', 2),
+    (3, 'MpM______', 4),
+    (4, 'Mpm______', 6),
+    (5, 'mpm______', 4),
+    (6, 'mdm______', 1),
+]
+MINOR_DEGREES = [
+    (0, 'mpm______', 6),
+    (1, 'mdm______', 4),
+    (2, 'MpM______', 2),
+    (3, 'mpm______', 4),
+    (4, 'Mpm______', 6),
+    (5, 'MpM______', 3),
+    (6, 'Mpm______', 2),
+]
+SECONDARY_DOMINANT = 'Mpm______'
+MINOR_SCALE_OFFSETS = [0, 0, -1, 0, 0, -1, -1]  # natural minor relative to the major scale
+
+
+def get_encodable_qualities():
+    # qualities that both encodings can represent and that every exporter can handle
+    context = get_context()
+    return sorted(
+        {
+            q for q in context.key_to_chord_quality.values()
+            if q in quality_to_code and q in context.chord_quality_to_chordal_type
+        },
+        key=lambda q: q.to_string(),
+    )
+
+
+def get_note(step, chroma):
+    note = Note(step % 7, chroma)
+    return note if note in CODE_TO_NOTE.values() else Note(step % 7, 0)
+
+
+def generate_chord(rng, region, extensions):
+    degrees = MAJOR_DEGREES if region.modality == Modality.MAJOR else MINOR_DEGREES
+    step, quality_string, _ = rng.choices(degrees, weights=[d[2] for d in degrees])[0]
+    scale_chromas = get_scale_step_chroma(region.tonic.step, region.tonic.chroma)
+    if region.modality == Modality.MINOR:
+        scale_chromas = [c + offset for c, offset in zip(scale_chromas, MINOR_SCALE_OFFSETS)]
+    root_step = (region.tonic.step + step) % 7
+
+    if rng.random() < 0.1:
+        # secondary dominant, a fifth above the chosen degree
+        root_step = (root_step + 4) % 7
+        quality_string = SECONDARY_DOMINANT
+    chroma = scale_chromas[(root_step - region.tonic.step) % 7]
+
+    quality = ChordQuality.from_string(quality_string)
+    if rng.random() < 0.2:
+        quality = rng.choice(extensions)
+
+    root = get_note(root_step, chroma)
+    bass = None
+    if rng.random() < 0.05:
+        bass = get_note(root_step + 2, scale_chromas[(root_step + 2 - region.tonic.step) % 7])
+    return Chord(root, quality, bass)
+
+
+def generate_song(n_measures, seed=0):
+    rng = random.Random(seed)
+    extensions = get_encodable_qualities()
+
+    chords = []
+    explicit_regions = []
+    region = None
+    for i in range(n_measures):
+        if i == 0 or rng.random() < 1 / 16:
+            region = HarmonicRegion(rng.choice(TONICS), rng.choices([Modality.MAJOR, Modality.MINOR], [3, 1])[0])
+            explicit_regions.append(region)
+        else:
+            explicit_regions.append(None)
+        n_chords = rng.choices([1, 2, 3, 4], weights=[10, 8, 1, 1])[0]
+        chords.append([generate_chord(rng, region, extensions) for _ in range(n_chords)])
+
+    song = Song(chords, propagate_regions(explicit_regions))
+    song.analyze()
+    return song
+
+
+def generate_corpus(n_songs, n_measures, seed=0):
+    return [generate_song(n_measures, seed + i) for i in range(n_songs)]
@@ -0,0 +1,223 @@
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.corpus import generate_song
+from chord_hand.analysis import analyze
+from chord_hand.export import get_standard_text_data, get_standard_csv_data, get_tilia_csv_data
+from chord_hand.humdrum import iter_humdrum_lines
+from chord_hand.main import init_settings
+from chord_hand.musicxml import iter_musicxml
+from chord_hand.projeto_mpb import get_projeto_mpb_new_db_data, get_projeto_mpb_old_db_data
+from chord_hand.settings import get_context, load_context, use_context
+from chord_hand.song import Song, propagate_regions
+
+
+def get_musicxml_data(chords, regions, analyses):
+    return ''.join(iter_musicxml(chords))
+
+
+def get_humdrum_data(chords, regions, analyses):
+    return ''.join(iter_humdrum_lines(Song(chords, regions, analyses)))
+
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+ENCODINGS = ['standard', 'projeto_mpb']
+# the data of each exporter of the settings, without the file dialog
+EXPORTERS = {
+    'text': get_standard_text_data,
+    'csv': get_standard_csv_data,
+    'tilia': get_tilia_csv_data,
+    'projeto_mpb_new': get_projeto_mpb_new_db_data,
+    'projeto_mpb_old': get_projeto_mpb_old_db_data,
+    'musicxml': get_musicxml_data,
+    'humdrum': get_humdrum_data,
+}
+
+
+def bench_decode(song, context):
+    codes = [context.encoder.encode_measure(chords) for chords in song.chords]
+    return lambda: [context.decoder.decode_measure(code) for code in codes]
+
+
+def bench_encode(song, context):
+    return lambda: [context.encoder.encode_measure(chords) for chords in song.chords]
+
+
+def bench_analyze(song, context):
+    def run():
+        for chords, region in zip(song.chords, song.regions):
+            for chord in chords:
+                analyze(chord, region, context=context)
+    return run
+
+
+def bench_propagate_regions(song, context):
+    # only the measures where the region changes are set explicitly, as in the editor
+    explicit = [region if i == 0 or region != song.regions[i - 1] else None for i, region in enumerate(song.regions)]
+    return lambda: propagate_regions(explicit)
+
+
+def get_json_save_load_bench(directory):
+    def bench(song, context):
+        path = Path(directory) / 'song.json'
+
+        def run():
+            song.save(path)
+            Song.load(path)
+        return run
+    return bench
+
+
+def get_exporter_bench(data_func):
+    def bench(song, context):
+        return lambda: data_func(song.chords, song.regions, song.analyses)
+    return bench
+
+
+def get_benchmarks(directory):
+    # (name, encoding, setup); setup(song, context) returns the function to time. Files are written to directory.
+    benchmarks = []
+    for encoding in ENCODINGS:
+        benchmarks.append(('decode', encoding, bench_decode))
+        benchmarks.append(('encode', encoding, bench_encode))
+    benchmarks.append(('analyze', None, bench_analyze))
+    benchmarks.append(('propagate_regions', None, bench_propagate_regions))
+    benchmarks.append(('json_save_load', None, get_json_save_load_bench(directory)))
+    for name, data_func in EXPORTERS.items():
+        benchmarks.append((f'export_{name}', None, get_exporter_bench(data_func)))
+    return benchmarks
+
+
+def measure(func, budget, max_repeats):
+    times = []
+    while True:
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+        if len(times) >= max_repeats or sum(times) >= budget:
+            break
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'repeats': len(times),
+        'min_s': min(times),
+        'median_s': statistics.median(times),
+        'peak_bytes': peak,
+    }
+
+
+def run(sizes, name_filter='', seed=0, budget=0.5, max_repeats=20):
+    contexts = {encoding: load_context(encoding=encoding) for encoding in ENCODINGS}
+    results = []
+
+    if name_filter in 'settings_init':
+        results.append({'name': 'settings_init', 'encoding': None, 'measures': 0,
+                        **measure(load_context, budget, max_repeats)})
+        print_result(results[-1])
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            with use_context(contexts['standard']):
+                song = generate_song(size, seed)
+
+            for name, encoding, setup in get_benchmarks(directory):
+                if name_filter not in name:
+                    continue
+                context = contexts[encoding or 'standard']
+                with use_context(context):
+                    func = setup(song, context)
+                    result = {
+                        'name': name, 'encoding': encoding, 'measures': size, **measure(func, budget, max_repeats)
+                    }
+                results.append(result)
+                print_result(result)
+
+    return results
+
+
+def print_result(result):
+    encoding = result['encoding'] or ''
+    print(
+        f"{result['name']:<24} {encoding:<12} {result['measures']:>8} "
+        f"{result['median_s'] * 1000:>12.3f} ms {result['peak_bytes'] / 1024:>12.1f} KiB"
+    )
+
+
+def get_key(result):
+    return result['name'], result['encoding'], result['measures']
+
+
+def compare(results, baseline, threshold):
+    key_to_baseline = {get_key(result): result for result in baseline['results']}
+    regressions = []
+
+    print()
+    print(f"{'benchmark':<24} {'encoding':<12} {'measures':>8} {'baseline ms':>12} {'current ms':>12} {'ratio':>7}")
+    for result in results:
+        base = key_to_baseline.get(get_key(result))
+        if not base:
+            continue
+        ratio = result['median_s'] / base['median_s'] if base['median_s'] else float('inf')
+        flag = ' !' if ratio > 1 + threshold else ''
+        print(
+            f"{result['name']:<24} {result['encoding'] or '':<12} {result['measures']:>8} "
+            f"{base['median_s'] * 1000:>12.3f} {result['median_s'] * 1000:>12.3f} {ratio:>7.2f}{flag}"
+        )
+        if flag:
+            regressions.append(result)
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='benchmarks.run')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma-separated song sizes in measures, e.g. 10,1000,100000')
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--budget', type=float, default=0.5, help='seconds to spend repeating each benchmark')
+    parser.add_argument('--max-repeats', type=int, default=20)
+    parser.add_argument('--output', type=Path, help='write results as JSON to this path')
+    parser.add_argument('--compare', type=Path, help='compare with a JSON baseline written by --output')
+    parser.add_argument('--threshold', type=float, default=0.1, help='slowdown ratio reported as a regression')
+    args = parser.parse_args(argv)
+
+    init_settings()
+    if missing := sorted(get_context().name_to_exporter.keys() - EXPORTERS.keys()):
+        print(f"Exporters without a benchmark: {', '.join(missing)}", file=sys.stderr)
+    sizes = [int(size) for size in args.sizes.split(',')]
+    results = run(sizes, args.filter, args.seed, args.budget, args.max_repeats)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'meta': {
+                    'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                    'python': sys.version,
+                    'platform': platform.platform(),
+                    'seed': args.seed,
+                },
+                'results': results,
+            }, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
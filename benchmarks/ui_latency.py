@@ -0,0 +1,152 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt6.QtCore import Qt  # noqa: E402
+from PyQt6.QtTest import QTest  # noqa: E402
+from PyQt6.QtWidgets import QApplication  # noqa: E402
+
+from benchmarks.corpus import generate_song  # noqa: E402
+from chord_hand.main import init_settings  # noqa: E402
+from chord_hand.settings import get_context  # noqa: E402
+
+DEFAULT_SIZES = [10, 100, 500]
+TONICS = ['C', 'D', 'Eb', 'F', 'G', 'A', 'Bb']
+
+
+class LatencyRecorder:
+    def __init__(self):
+        self.operation_to_times = defaultdict(list)
+
+    def time(self, operation, func, *args):
+        start = time.perf_counter()
+        func(*args)
+        QApplication.processEvents()
+        self.operation_to_times[operation].append(time.perf_counter() - start)
+
+    def get_percentiles(self):
+        result = {}
+        for operation, times in self.operation_to_times.items():
+            if len(times) > 1:
+                p50, p95, p99 = [statistics.quantiles(times, n=100, method='inclusive')[i - 1] for i in (50, 95, 99)]
+            else:
+                p50 = p95 = p99 = times[0]
+            result[operation] = {'samples': len(times), 'p50_s': p50, 'p95_s': p95, 'p99_s': p99}
+        return result
+
+
+def load_song(window, path):
+    with open(path) as f:
+        window.load_json_data(json.load(f))
+
+
+def type_measure(recorder, cell, codes):
+    # types into the cell one key at a time, then moves on to the next one with space as a user would
+    line_edit = cell.chord_codes_line_edit
+    for char in codes:
+        recorder.time('keystroke', QTest.keyClicks, line_edit, char)
+    recorder.time('next_measure', QTest.keyClick, line_edit, Qt.Key.Key_Space)
+
+
+def change_region(recorder, window, rng):
+    cell = rng.choice(window.cells)
+    tonic = rng.choice(TONICS)
+
+    def activate():
+        cell.region_tonic_combobox.setCurrentText(tonic)
+        cell.region_tonic_combobox.activated.emit(cell.region_tonic_combobox.currentIndex())
+
+    recorder.time('region_change', activate)
+
+
+def run_size(app, size, seed, n_operations):
+    rng = random.Random(seed)
+    song = generate_song(size, seed)
+
+    from chord_hand.ui import MainWindow
+    window = MainWindow()
+    recorder = LatencyRecorder()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / 'song.json'
+        song.save(path)
+        recorder.time('json_load', load_song, window, path)
+
+    encoder = get_context().encoder
+    codes = [encoder.encode_measure(chords) for chords in generate_song(n_operations, seed + 1).chords]
+    for measure_codes in codes:
+        window.cells[-1].set_focus()
+        type_measure(recorder, window.cells[-1], measure_codes)
+
+    for _ in range(n_operations):
+        change_region(recorder, window, rng)
+        recorder.time('insert', window.insert_cell, rng.randrange(len(window.cells)))
+        recorder.time('remove', window.remove_cell, rng.randrange(len(window.cells)))
+
+    window.settings_watcher.stop()
+    window.close()
+    window.deleteLater()
+    app.processEvents()
+
+    return recorder.get_percentiles()
+
+
+def print_result(size, operation, result):
+    print(
+        f"{operation:<16} {size:>8} {result['samples']:>8} "
+        f"{result['p50_s'] * 1000:>10.3f} {result['p95_s'] * 1000:>10.3f} {result['p99_s'] * 1000:>10.3f}"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='benchmarks.ui_latency')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma-separated song sizes in measures')
+    parser.add_argument('--operations', type=int, default=20, help='measures typed and edits made per size')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=Path, help='write results as JSON to this path')
+    parser.add_argument('--compare', type=Path, help='compare p95 latencies with a JSON baseline')
+    parser.add_argument('--threshold', type=float, default=0.2, help='slowdown ratio reported as a regression')
+    args = parser.parse_args(argv)
+
+    init_settings()
+    app = QApplication(sys.argv)
+
+    results = []
+    print(f"{'operation':<16} {'measures':>8} {'samples':>8} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for size in map(int, args.sizes.split(',')):
+        for operation, result in run_size(app, size, args.seed, args.operations).items():
+            results.append({'operation': operation, 'measures': size, **result})
+            print_result(size, operation, result)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'results': results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = {(r['operation'], r['measures']): r for r in json.load(f)['results']}
+        regressions = [
+            r for r in results
+            if (r['operation'], r['measures']) in baseline
+            and r['p95_s'] > baseline[(r['operation'], r['measures'])]['p95_s'] * (1 + args.threshold)
+        ]
+        for r in regressions:
+            base = baseline[(r['operation'], r['measures'])]
+            print(f"Regression: {r['operation']} at {r['measures']} measures, "
+                  f"p95 {base['p95_s'] * 1000:.3f} ms -> {r['p95_s'] * 1000:.3f} ms")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,12 +4,14 @@ import traceback
 from dataclasses import dataclass
 from typing import TYPE_CHECKING, Union
 
-import chord_hand.ui
+from chord_hand import diagnostics
 from chord_hand.analysis.modality import Modality, tonic_to_scale_step_chroma, get_scale_step_chroma
 from chord_hand.chord.chord import Chord, RepeatChord
 from chord_hand.chord.note import Note
 from chord_hand.chord.quality import ChordQuality, CustomChordQuality
-from chord_hand.settings import name_to_analytic_type, default_analyses_major, default_analyses_minor
+from chord_hand.chord.symbol_parser import parse_chord_symbol
+from chord_hand.settings import get_context, SettingsContext
+from chord_hand.trace import traced
 
 if TYPE_CHECKING:
     from chord_hand.analysis.harmonic_region import HarmonicRegion
@@ -48,7 +50,10 @@ class HarmonicAnalysis:
                 try:
                     suffix = '/' + CHROMA_TO_SIGN[self.relative_to_chroma] + STEP_TO_ROMAN[self.relative_to_step]
                 except:
-                    chord_hand.ui.display_error('Analysis error', 'Error: ' + str(traceback.format_exc()))
+                    detail = f'{self.type.name} relative to {self.relative_to_step}, {self.relative_to_chroma}'
+                    if not diagnostics.report(diagnostics.ANALYSIS_ERROR, detail):  # the UI has no collector
+                        import chord_hand.ui  # delay import to avoid circular import
+                        chord_hand.ui.display_error('Analysis error', 'Error: ' + str(traceback.format_exc()))
                     suffix = ''
             else:
                 suffix = ''
@@ -101,10 +106,8 @@ def str_to_note(s) -> Note:
 
 
 def str_to_chord(string):
-    note = str_to_note(string[:2])
-    quality = string[1:] if not note.chroma else string[2:]
-
-    return Chord(note, quality)
+    # None if string is not a chord symbol of the settings
+    return parse_chord_symbol(string)
 
 
 def note_to_str(note):
@@ -116,7 +119,30 @@ def int_to_chroma(n):
     return pc if pc < 8 else pc - 12
 
 
-def analyze(chord: Chord, region: HarmonicRegion, analytic_type: Union[AnalyticType, None] = None):
+def get_default_analysis_key(chord: Chord, region: HarmonicRegion):
+    # the (chord_step, chord_chroma, quality) key into the default analyses table
+    chord_step = (chord.root.step - region.tonic.step) % 7
+    scale_step_chroma = get_scale_step_chroma(region.tonic.step, region.tonic.chroma)[chord_step]
+    chord_chroma = chord.root.chroma - scale_step_chroma
+    return chord_step, chord_chroma, chord.quality
+
+
+def get_default_analytic_type(chord_step, chord_chroma, quality, context: Union[SettingsContext, None] = None):
+    context = context or get_context()
+    # default_analyses = context.default_analyses_major if region.modality == Modality.MAJOR else context.default_analyses_minor
+    default_analyses = context.default_analyses_major  # considering using a single table
+    return context.name_to_analytic_type[
+        default_analyses.get((chord_step, chord_chroma), {}).get(quality, 'Aut.')
+    ]
+
+
+@traced()
+def analyze(
+        chord: Chord,
+        region: HarmonicRegion,
+        analytic_type: Union[AnalyticType, None] = None,
+        context: Union[SettingsContext, None] = None
+):
     if isinstance(chord, RepeatChord):
         return str(chord)
     elif not region or not chord:
@@ -128,18 +154,10 @@ def analyze(chord: Chord, region: HarmonicRegion, analytic_type: Union[AnalyticT
     elif not chord or chord.quality.name == 'ERROR':
         return None
 
-    chord_step = (chord.root.step - region.tonic.step) % 7
-    scale_step_chroma = get_scale_step_chroma(region.tonic.step, region.tonic.chroma)[chord_step]
-    chord_chroma = chord.root.chroma - scale_step_chroma
+    chord_step, chord_chroma, _ = get_default_analysis_key(chord, region)
     chord_pc = chord.root.to_pitch_class()
     if not analytic_type:
-        # default_analyses = default_analyses_major if region.modality == Modality.MAJOR else default_analyses_minor
-        default_analyses = default_analyses_major  # considering using a single table
-        analytic_type = name_to_analytic_type[
-            default_analyses.get((chord_step, chord_chroma), {}).get(
-                chord.quality, 'Aut.'
-            )
-        ]
+        analytic_type = get_default_analytic_type(chord_step, chord_chroma, chord.quality, context)
     target_step = (chord_step + analytic_type.relative_step) % 7
     target_pc = Note(region.tonic.step, 0).to_pitch_class() % 12 + Note(target_step, 0).to_pitch_class() % 12
     target_chroma = int_to_chroma((chord_pc - target_pc) % 12 + analytic_type.relative_pci)
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional
+
+from chord_hand.analysis import HarmonicAnalysis, analyze, get_default_analysis_key, get_default_analytic_type
+from chord_hand.analysis.harmonic_region import HarmonicRegion
+from chord_hand.analysis.inference import get_interval_index, get_resolution_masks, is_quality_compatible
+from chord_hand.chord.chord import Chord
+from chord_hand.chord.quality import ChordQuality
+from chord_hand.settings import SettingsContext, cached_per_context, get_context
+
+DEFAULT_SCORE = 2  # the type given by the default analyses table
+QUALITY_SCORE = 1  # the type applies to the chord's quality
+RESOLUTION_SCORE = 3  # the next chord is where the type resolves to
+
+
+@dataclass
+class Alternatives:
+    default: HarmonicAnalysis
+    ranked: list[HarmonicAnalysis]
+
+    def get(self, name: str) -> Optional[HarmonicAnalysis]:
+        return next((analysis for analysis in self.ranked if analysis.type.name == name), None)
+
+
+get_cached_resolution_masks = cached_per_context(get_resolution_masks)
+
+
+@cached_per_context
+def get_key_to_scored_analyses(context: SettingsContext) -> dict:
+    # analyses of a chord in a region under every analytic type, with the scores that don't depend on
+    # neighbouring chords, filled as they are asked for
+    return {}
+
+
+def get_scored_analyses(chord: Chord, region: HarmonicRegion, context: SettingsContext):
+    key_to_scored_analyses = get_key_to_scored_analyses(context)
+    key = (
+        chord.root.step, chord.root.chroma, chord.quality.to_string(),
+        region.tonic.step, region.tonic.chroma, region.modality
+    )
+    if key not in key_to_scored_analyses:
+        step, chroma, quality = get_default_analysis_key(chord, region)
+        default_name = get_default_analytic_type(step, chroma, quality, context).name
+        scored_analyses = []
+        for name, analytic_type in context.name_to_analytic_type.items():
+            score = DEFAULT_SCORE if name == default_name else 0
+            if name == 'Aut.' or is_quality_compatible(name, quality):
+                score += QUALITY_SCORE
+            scored_analyses.append((score, analyze(chord, region, analytic_type, context)))
+        key_to_scored_analyses[key] = default_name, scored_analyses
+    return key_to_scored_analyses[key]
+
+
+def get_alternatives(
+        chord,
+        region: Optional[HarmonicRegion],
+        next_chord=None,
+        context: Optional[SettingsContext] = None
+) -> Optional[Alternatives]:
+    # The analyses of chord under every analytic type, most plausible first. None if chord can't be analyzed.
+    if not region or not isinstance(chord, Chord) or not isinstance(chord.quality, ChordQuality):
+        return None
+    if chord.root.step < 0 or chord.quality.name == 'ERROR':
+        return None
+
+    context = context or get_context()
+    default_name, scored_analyses = get_scored_analyses(chord, region, context)
+    masks = get_cached_resolution_masks(context)
+
+    interval = None
+    if isinstance(next_chord, Chord) and next_chord.root.step >= 0:
+        interval = get_interval_index(chord, next_chord)
+
+    def get_score(scored_analysis):
+        score, analysis = scored_analysis
+        mask = masks.get(analysis.type.name, 0)
+        if interval is not None and mask >> interval & 1:
+            score += RESOLUTION_SCORE
+        return score
+
+    ranked = [analysis for _, analysis in sorted(scored_analyses, key=get_score, reverse=True)]
+    return Alternatives(next(a for a in ranked if a.type.name == default_name), ranked)
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import csv
+import string
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+
+from chord_hand.analysis import HarmonicAnalysis
+from chord_hand.corpus import iter_song_paths, parallel_map
+from chord_hand.settings import SettingsContext
+from chord_hand.similarity import SongMasks
+from chord_hand.song import Song
+from chord_hand.trace import traced
+
+FEATURES = ('chords', 'masks', 'analyses')
+DEFAULT_MIN_LENGTH = 4  # measures
+
+
+def get_measure_features(song: Song, features: str = 'chords') -> list:
+    # A hashable feature of each measure: its packed chords, the union of their pitch class masks or
+    # its analysis symbols, which are the same in any region. None for measures without chords,
+    # which match nothing.
+    if features == 'analyses':
+        return [
+            tuple(a.to_symbol() if isinstance(a, HarmonicAnalysis) else None for a in analyses) or None
+            for analyses in song.analyses
+        ]
+    masks = SongMasks.from_song(song)
+    if features == 'masks':
+        return [mask or None for mask in masks.iter_measure_masks()]
+    if features == 'chords':
+        ends = list(masks.measure_starts[1:]) + [len(masks.chords)]
+        return [tuple(masks.chords[start:end]) or None for start, end in zip(masks.measure_starts, ends)]
+    raise ValueError(f'Unknown features: {features}')
+
+
+def iter_fields(bits: int, width: int) -> Iterator[int]:
+    # indices of the fields with a set bit, in order
+    while bits:
+        low = bits & -bits
+        yield (low.bit_length() - 1) // width
+        bits ^= low
+
+
+class SelfSimilarity:
+    # The self-similarity matrix of a song, a diagonal at a time. Feature ids of measures are packed in
+    # an int, in fields with a spare high bit, so that comparing every measure with the one lag measures
+    # later takes a shift, a xor and an add: equal measures are fields whose high bit is not set.
+    def __init__(self, measure_features: list):
+        self.n_measures = len(measure_features)
+        feature_to_id = {}
+        for feature in measure_features:
+            if feature is not None:
+                feature_to_id.setdefault(feature, len(feature_to_id))
+        bits = max(len(feature_to_id).bit_length(), 1)
+        self.width = bits + 1
+
+        lows = ((1 << self.width * self.n_measures) - 1) // ((1 << self.width) - 1)  # lowest bit of every field
+        self.high = lows << bits
+        self.ones = lows * ((1 << bits) - 1)
+        self.packed = 0
+        self.valid = 0  # high bits of measures with chords
+        self.ids = []  # of each measure, negative and unique for measures without chords
+        for i, feature in enumerate(measure_features):
+            if feature is None:
+                self.ids.append(-1 - i)
+                continue
+            self.ids.append(feature_to_id[feature])
+            self.packed |= feature_to_id[feature] << i * self.width
+            self.valid |= 1 << (i * self.width + bits)
+
+    def get_diagonal(self, lag: int) -> int:
+        # high bits of the measures equal to the one lag measures later
+        shift = lag * self.width
+        different = (self.packed ^ self.packed >> shift) + self.ones
+        return ~different & self.high & self.valid & self.valid >> shift
+
+    def iter_stripes(self, min_length: int = DEFAULT_MIN_LENGTH) -> Iterator[tuple[int, int, int]]:
+        # (start, repeat start, length) of each run of at least min_length measures that is repeated later
+        width = self.width
+        for lag in range(1, self.n_measures):
+            diagonal = self.get_diagonal(lag)
+            long_runs = diagonal
+            for i in range(1, min_length):
+                long_runs &= diagonal >> i * width
+            if not long_runs:
+                continue
+            starts = diagonal & ~(diagonal << width) & long_runs
+            ends = diagonal & ~(diagonal >> width) & long_runs << (min_length - 1) * width
+            for start, end in zip(iter_fields(starts, width), iter_fields(ends, width)):
+                yield start, start + lag, end - start + 1
+
+
+@dataclass
+class ProposedSection:
+    label: str
+    start: int
+    end: int  # exclusive
+
+
+def get_label(i: int) -> str:
+    return string.ascii_uppercase[i % 26] + (str(i // 26) if i >= 26 else '')
+
+
+def propose_sections(ids: list[int], stripes, min_length: int = DEFAULT_MIN_LENGTH) -> list[ProposedSection]:
+    # Repeated segments are taken by the measures their instances cover, most first, with those
+    # instances that don't overlap measures already in a section. Measures left between them are
+    # sections of their own. Labels are in order of appearance.
+    n_measures = len(ids)
+    id_to_starts = defaultdict(list)
+    for i, measure_id in enumerate(ids):
+        id_to_starts[measure_id].append(i)
+
+    candidates = {}
+    # a repeat that overlaps itself is cut where its repetition starts
+    for start, repeat, length in stripes:
+        length = min(length, repeat - start)
+        if length < min_length:
+            continue
+        segment = ids[start:start + length]
+        key = tuple(segment)
+        if key in candidates:
+            continue
+        instances = []
+        for i in id_to_starts[segment[0]]:
+            if (not instances or i >= instances[-1] + length) and ids[i:i + length] == segment:
+                instances.append(i)
+        candidates[key] = (len(instances) * length, length, instances)
+
+    in_section = [False] * n_measures
+    sections = []
+    n_labels = 0
+    for _, length, instances in sorted(candidates.values(), key=lambda c: (-c[0], -c[1], c[2][0])):
+        instances = [i for i in instances if not any(in_section[i:i + length])]
+        if len(instances) < 2:
+            continue
+        for i in instances:
+            in_section[i:i + length] = [True] * length
+            sections.append(ProposedSection(n_labels, i, i + length))
+        n_labels += 1
+
+    start = None
+    for i, is_in_section in enumerate(in_section + [True]):
+        if not is_in_section and start is None:
+            start = i
+        elif is_in_section and start is not None:
+            sections.append(ProposedSection(n_labels, start, i))
+            n_labels += 1
+            start = None
+
+    sections.sort(key=lambda section: section.start)
+    key_to_label = {}
+    for section in sections:
+        section.label = key_to_label.setdefault(section.label, get_label(len(key_to_label)))
+    return sections
+
+
+@traced()
+def detect_form(song: Song, features: str = 'chords', min_length: int = DEFAULT_MIN_LENGTH) -> list[ProposedSection]:
+    similarity = SelfSimilarity(get_measure_features(song, features))
+    return propose_sections(similarity.ids, similarity.iter_stripes(min_length), min_length)
+
+
+def apply_form(song: Song, sections: list[ProposedSection]):
+    # Makes a section of the first instance of each repeated label. Later instances become references
+    # to it only if their chords are the same, which they may not be with features other than chords.
+    label_to_section = {}
+    labels = [section.label for section in sections]
+    for proposed in sections:
+        if labels.count(proposed.label) < 2:
+            continue
+        if proposed.label not in label_to_section:
+            label_to_section[proposed.label] = song.add_section(proposed.label, proposed.start, proposed.end)
+        elif song.chords[proposed.start:proposed.end] == label_to_section[proposed.label].chords:
+            song.add_instance(proposed.label, proposed.start)
+
+
+@dataclass
+class SongForm:
+    path: str
+    sections: list[ProposedSection]
+
+    def to_string(self):
+        return ' '.join(section.label for section in self.sections)
+
+
+def detect_form_file(args) -> SongForm:
+    path, features, min_length, apply = args
+    song = Song.load(path)
+    sections = detect_form(song, features, min_length)
+    if apply and not song.form:
+        apply_form(song, sections)
+        song.save(path)
+    return SongForm(str(path), sections)
+
+
+@traced()
+def detect_corpus_forms(
+        corpus_dir: Path,
+        report_path: Path,
+        features: str = 'chords',
+        min_length: int = DEFAULT_MIN_LENGTH,
+        apply: bool = False,
+        context: Optional[SettingsContext] = None,
+        workers: Optional[int] = None,
+) -> list[SongForm]:
+    # writes a CSV report of the sections proposed for every JSON song in corpus_dir. With apply, songs
+    # without sections are saved with them.
+    args = [(path, features, min_length, apply) for path in iter_song_paths(corpus_dir)]
+    forms = list(parallel_map(detect_form_file, args, context, workers))
+
+    with open(report_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['path', 'label', 'start', 'end'])
+        for form in forms:
+            path = Path(form.path).relative_to(corpus_dir)
+            for section in form.sections:
+                writer.writerow([path, section.label, section.start + 1, section.end])
+
+    return forms
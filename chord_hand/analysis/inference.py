@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Optional
+
+from chord_hand.analysis import AnalyticType, analyze, get_default_analysis_key, get_default_analytic_type
+from chord_hand.chord.chord import Chord
+from chord_hand.chord.quality import ChordQuality
+from chord_hand.corpus import iter_song_paths, parallel_map
+from chord_hand.settings import SettingsContext, get_context
+from chord_hand.song import Song
+from chord_hand.trace import traced
+
+# Where the next chord's root is, in (diatonic steps, semitones) above the target of the analytic type,
+# e.g. a II is followed by the V (or the SubV) of its target.
+TYPE_TO_NEXT_ROOT_OFFSETS = {
+    'V': [(0, 0)],
+    'SubV': [(0, 0)],
+    'aSubV': [(0, 0)],
+    'Vº': [(0, 0)],
+    'aNp': [(0, 0)],
+    'II': [(4, 7), (1, 1)],
+    'Np': [(4, 7), (0, 0)],
+}
+
+# qualities each analytic type applies to, as ChordQuality.match_string patterns
+DOMINANT_PATTERNS = ['M*m******', 'M*_******', '__m******']
+TYPE_TO_QUALITY_PATTERNS = {
+    'V': DOMINANT_PATTERNS,
+    'SubV': DOMINANT_PATTERNS,
+    'aSubV': DOMINANT_PATTERNS,
+    'II': ['m*m******', 'm*_******'],
+    'Vº': ['md*******'],
+    'Np': ['Mp_******', 'MpM******'],
+    'aNp': ['Mp_******', 'MpM******'],
+}
+
+# tried in this order when more than one type fits
+TYPE_PREFERENCE = ['V', 'SubV', 'II', 'Vº', 'aSubV', 'Np', 'aNp']
+# types a chord whose root is in the scale may be given when it is analyzed as diatonic by default
+DIATONIC_ROOT_TYPES = {'V', 'II'}
+
+
+def get_interval_index(chord: Chord, next_chord: Chord) -> int:
+    steps = (next_chord.root.step - chord.root.step) % 7
+    semitones = (next_chord.root.to_pitch_class() - chord.root.to_pitch_class()) % 12
+    return steps * 12 + semitones
+
+
+def get_resolution_masks(context: Optional[SettingsContext] = None) -> dict[str, int]:
+    # 84-bit masks of the intervals, as indexed by get_interval_index, from the chord's root
+    # to the next chord's root that resolve each analytic type
+    result = {}
+    for name, analytic_type in (context or get_context()).name_to_analytic_type.items():
+        if name not in TYPE_TO_NEXT_ROOT_OFFSETS:
+            continue
+        mask = 0
+        for step_offset, semitone_offset in TYPE_TO_NEXT_ROOT_OFFSETS[name]:
+            steps = (analytic_type.relative_step + step_offset) % 7
+            semitones = (analytic_type.relative_pci + semitone_offset) % 12
+            mask |= 1 << (steps * 12 + semitones)
+        result[name] = mask
+    return result
+
+
+def is_quality_compatible(name: str, quality: ChordQuality) -> bool:
+    return any(quality.match_string(pattern) for pattern in TYPE_TO_QUALITY_PATTERNS.get(name, []))
+
+
+def infer_analytic_type(chord: Chord, next_chord, region, masks: dict[str, int], context=None) -> AnalyticType:
+    # The default type is kept when it resolves to the next chord. Otherwise, the first type that does
+    # is used. Chords with roots in the scale are only reinterpreted as V or II of a degree other than
+    # the tonic.
+    context = context or get_context()
+    step, chroma, quality = get_default_analysis_key(chord, region)
+    default = get_default_analytic_type(step, chroma, quality, context)
+    if not isinstance(next_chord, Chord) or next_chord.root.step < 0:
+        return default
+
+    interval = get_interval_index(chord, next_chord)
+    if default.name in masks and masks[default.name] >> interval & 1:
+        return default
+
+    is_diatonic = default.name == 'Aut.' and chroma == 0
+    for name in TYPE_PREFERENCE:
+        if name not in masks or not masks[name] >> interval & 1 or not is_quality_compatible(name, quality):
+            continue
+        if is_diatonic and name not in DIATONIC_ROOT_TYPES:
+            continue
+        analytic_type = context.name_to_analytic_type[name]
+        if default.name == 'Aut.':
+            analysis = analyze(chord, region, analytic_type, context)
+            if analysis.relative_to_step == 0 and analysis.relative_to_chroma == 0:
+                return default
+        return analytic_type
+
+    return default
+
+
+@traced()
+def infer_song(song: Song, context: Optional[SettingsContext] = None) -> int:
+    # Re-analyzes the measures of song whose analytic types are not locked, looking at the chord that
+    # follows each chord. Measures whose analyses change are locked, so that analyzing the song again
+    # doesn't undo them. Returns the number of analyses that changed.
+    context = context or get_context()
+    masks = get_resolution_masks(context)
+    locations = [
+        (i, j, chord)
+        for i, measure in enumerate(song.chords)
+        for j, chord in enumerate(measure)
+    ]
+
+    n_changed = 0
+    changed_measures = set()
+    for k, (i, j, chord) in enumerate(locations):
+        region = song.regions[i]
+        if song.analytic_type_locked[i] or not region:
+            continue
+        if not isinstance(chord, Chord) or not isinstance(chord.quality, ChordQuality) or chord.root.step < 0:
+            continue
+
+        next_chord = locations[k + 1][2] if k + 1 < len(locations) else None
+        analytic_type = infer_analytic_type(chord, next_chord, region, masks, context)
+        analysis = analyze(chord, region, analytic_type, context)
+
+        analyses = song.analyses[i]
+        if len(analyses) < len(song.chords[i]):
+            analyses.extend([None] * (len(song.chords[i]) - len(analyses)))
+        if analyses[j] != analysis:
+            analyses[j] = analysis
+            n_changed += 1
+            changed_measures.add(i)
+
+    for i in changed_measures:
+        song.analytic_type_locked[i] = True
+    return n_changed
+
+
+def infer_song_file(path):
+    song = Song.load(path)
+    n_changed = infer_song(song)
+    if n_changed:
+        song.save(path)
+    return n_changed
+
+
+def infer_corpus(corpus_dir: Path, context: Optional[SettingsContext] = None, workers: Optional[int] = None):
+    paths = list(iter_song_paths(corpus_dir))
+    n_changed = list(parallel_map(infer_song_file, paths, context, workers))
+    return sum(1 for n in n_changed if n), sum(n_changed)
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import operator
+from array import array
+from typing import Optional
+
+from chord_hand.analysis import get_default_analysis_key, get_default_analytic_type, str_to_note
+from chord_hand.analysis.harmonic_region import HarmonicRegion
+from chord_hand.analysis.modality import Modality
+from chord_hand.chord.chord import Chord
+from chord_hand.chord.quality import ChordQuality
+from chord_hand.settings import SettingsContext
+from chord_hand.trace import traced
+
+# the tonics of the region combobox, without accidentals first so that they win ties
+TONICS = sorted(
+    ['C', 'C#', 'Db', 'D', 'D#', 'Eb', 'E', 'F', 'F#', 'Gb', 'G', 'G#', 'Ab', 'A', 'A#', 'Bb', 'B'],
+    key=lambda name: len(name)
+)
+CANDIDATE_REGIONS = [HarmonicRegion(str_to_note(tonic), modality) for modality in Modality for tonic in TONICS]
+
+# (step, chroma) keys as in get_default_analysis_key, i.e. relative to the major scale of the tonic,
+# mapped to the (third, fifth) of the diatonic triads on that degree
+MAJOR_TRIADS = {
+    (0, 0): {('M', 'p')},
+    (1, 0): {('m', 'p')},
+    (2, 0): {('m', 'p')},
+    (3, 0): {('M', 'p')},
+    (4, 0): {('M', 'p')},
+    (5, 0): {('m', 'p')},
+    (6, 0): {('m', 'd')},
+}
+MINOR_TRIADS = {  # natural and harmonic minor
+    (0, 0): {('m', 'p')},
+    (1, 0): {('m', 'd')},
+    (2, -1): {('M', 'p')},
+    (3, 0): {('m', 'p')},
+    (4, 0): {('M', 'p'), ('m', 'p')},
+    (5, -1): {('M', 'p')},
+    (6, -1): {('M', 'p')},
+    (6, 0): {('m', 'd')},
+}
+
+SCALE_ROOT_SCORE = 1.0
+DIATONIC_TRIAD_SCORE = 2.0
+TONIC_SCORE = 1.0
+DOMINANT_SCORE = 1.0  # a dominant chord on the fifth degree, which tells relative keys apart
+APPLIED_SCORE = 1.0  # a chord the default analyses table gives a function to, e.g. a secondary dominant
+CHROMATIC_SCORE = -2.0
+MODULATION_PENALTY = 6.0
+
+
+def score_chord(chord, region: HarmonicRegion, context: Optional[SettingsContext] = None) -> float:
+    if not isinstance(chord, Chord) or not isinstance(chord.quality, ChordQuality) or chord.root.step < 0:
+        return 0.0
+
+    step, chroma, quality = get_default_analysis_key(chord, region)
+    is_applied = get_default_analytic_type(step, chroma, quality, context).name != 'Aut.'
+    triads = (MAJOR_TRIADS if region.modality == Modality.MAJOR else MINOR_TRIADS).get((step, chroma))
+    if triads is None:
+        return APPLIED_SCORE if is_applied else CHROMATIC_SCORE
+
+    score = SCALE_ROOT_SCORE
+    if (quality.third, quality.fifth) in triads:
+        score += DIATONIC_TRIAD_SCORE
+        if step == 0:
+            score += TONIC_SCORE
+        elif step == 4 and quality.third == 'M' and quality.seventh != 'M':
+            score += DOMINANT_SCORE
+    elif is_applied:
+        score += APPLIED_SCORE
+    return score
+
+
+@traced()
+def detect_regions(
+        chords: list[list[Chord]],
+        fixed_regions: Optional[list[Optional[HarmonicRegion]]] = None,
+        modulation_penalty: float = MODULATION_PENALTY,
+        context: Optional[SettingsContext] = None,
+) -> list[HarmonicRegion]:
+    # Most likely region of each measure (Viterbi). Each measure scores the sum of its chords' scores in each
+    # candidate region, and every change of region costs modulation_penalty. Measures in fixed_regions keep
+    # their region.
+    n_measures = len(chords)
+    if not n_measures:
+        return []
+
+    fixed_regions = (list(fixed_regions or []) + [None] * n_measures)[:n_measures]
+    candidates = list(CANDIDATE_REGIONS)
+    for region in fixed_regions:
+        if region and region not in candidates:
+            candidates.append(region)
+    n_candidates = len(candidates)
+
+    key_to_scores = {}
+
+    def get_scores(chord):
+        if not isinstance(chord, Chord) or not isinstance(chord.quality, ChordQuality):
+            return None
+        key = chord.root.step, chord.root.chroma, chord.quality.to_string()
+        if key not in key_to_scores:
+            key_to_scores[key] = [score_chord(chord, region, context) for region in candidates]
+        return key_to_scores[key]
+
+    scores = None
+    backpointers = []
+    for measure, fixed_region in zip(chords, fixed_regions):
+        emission = [0.0] * n_candidates
+        for chord in measure:
+            if (chord_scores := get_scores(chord)) is not None:
+                emission = list(map(operator.add, emission, chord_scores))
+        if fixed_region:
+            fixed_index = candidates.index(fixed_region)
+            emission = [0.0 if i == fixed_index else float('-inf') for i in range(n_candidates)]
+
+        if scores is None:
+            scores = emission
+            continue
+
+        # staying in a region competes only with switching from the best region, so each step is O(regions)
+        best = max(range(n_candidates), key=scores.__getitem__)
+        switch_score = scores[best] - modulation_penalty
+        backpointers.append(array('h', [i if score >= switch_score else best for i, score in enumerate(scores)]))
+        scores = [e + max(score, switch_score) for e, score in zip(emission, scores)]
+
+    index = max(range(n_candidates), key=scores.__getitem__)
+    path = [index]
+    for pointers in reversed(backpointers):
+        index = pointers[index]
+        path.append(index)
+
+    return [candidates[i] for i in reversed(path)]
+
+
+def suggest_regions(
+        chords: list[list[Chord]],
+        explicit_regions: list[Optional[HarmonicRegion]],
+        modulation_penalty: float = MODULATION_PENALTY,
+        context: Optional[SettingsContext] = None,
+) -> list[Optional[HarmonicRegion]]:
+    # Regions to set explicitly where detection finds a change of region. Measures whose region was set by
+    # the user are kept as they are and get no suggestion.
+    explicit_regions = (list(explicit_regions) + [None] * len(chords))[:len(chords)]
+    detected = detect_regions(chords, explicit_regions, modulation_penalty, context)
+    suggestions = []
+    for i, region in enumerate(detected):
+        if explicit_regions[i] or (i > 0 and region == detected[i - 1]):
+            suggestions.append(None)
+        else:
+            suggestions.append(region)
+    return suggestions
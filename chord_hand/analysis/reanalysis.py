@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import dataclasses
+import json
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional
+
+from chord_hand.analysis import HarmonicAnalysis, analyze, get_default_analysis_key, get_default_analytic_type
+from chord_hand.chord.chord import Chord
+from chord_hand.chord.quality import ChordQuality
+from chord_hand.corpus import iter_song_paths, parallel_map
+from chord_hand.settings import SettingsContext, get_context
+from chord_hand.settings.diff import diff_default_analyses
+from chord_hand.song import Song
+
+
+def index_song(path):
+    # Locations of the chords whose analysis came from the default analyses table of the current context
+    song = Song.load(path)
+    result = []
+    for i, (chords, region, analyses) in enumerate(zip(song.chords, song.regions, song.analyses)):
+        if not region or song.analytic_type_locked[i]:
+            continue
+        for j, (chord, analysis) in enumerate(zip(chords, analyses)):
+            if not isinstance(chord, Chord) or not isinstance(chord.quality, ChordQuality):
+                continue
+            if not isinstance(analysis, HarmonicAnalysis):
+                continue
+            step, chroma, quality = get_default_analysis_key(chord, region)
+            if analysis.type.name == get_default_analytic_type(step, chroma, quality).name:
+                result.append((step, chroma, quality.to_string(), i, j))
+    return result
+
+
+def reanalyze_song(args):
+    path, locations = args
+    song = Song.load(path)
+    for i, j in locations:
+        song.analyses[i][j] = analyze(song.chords[i][j], song.regions[i])
+    song.save(path)
+    return path, Path(path).stat().st_mtime_ns
+
+
+class DefaultAnalysisIndex:
+    # Maps (chord_step, chord_chroma, quality) keys of the default analyses table to the chords
+    # of a corpus whose analysis came from that key, so only those need rewriting when it changes.
+    FILENAME = '.default_analyses_index.json'
+
+    def __init__(self, corpus_dir: Path, default_analyses: dict, key_to_locations=None, mtimes=None):
+        self.corpus_dir = Path(corpus_dir)
+        self.default_analyses = default_analyses
+        self.key_to_locations = key_to_locations or defaultdict(list)
+        self.mtimes = mtimes or {}
+
+    @property
+    def path(self):
+        return self.corpus_dir / self.FILENAME
+
+    @classmethod
+    def load(cls, corpus_dir: Path) -> Optional[DefaultAnalysisIndex]:
+        path = Path(corpus_dir) / cls.FILENAME
+        if not path.exists():
+            return None
+
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+
+        default_analyses = defaultdict(dict)
+        for step, chroma, quality_string, name in data['default_analyses']:
+            default_analyses[(step, chroma)][ChordQuality.from_string(quality_string)] = name
+
+        key_to_locations = defaultdict(list)
+        for step, chroma, quality_string, song, measure, index in data['locations']:
+            key_to_locations[(step, chroma, ChordQuality.from_string(quality_string))].append((song, measure, index))
+
+        return cls(corpus_dir, dict(default_analyses), key_to_locations, data['mtimes'])
+
+    def save(self):
+        data = {
+            'default_analyses': [
+                [step, chroma, quality.to_string(), name]
+                for (step, chroma), quality_to_name in self.default_analyses.items()
+                for quality, name in quality_to_name.items()
+            ],
+            'locations': [
+                [step, chroma, quality.to_string(), song, measure, index]
+                for (step, chroma, quality), locations in self.key_to_locations.items()
+                for song, measure, index in locations
+            ],
+            'mtimes': self.mtimes,
+        }
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    def update(self, context: Optional[SettingsContext] = None, workers: Optional[int] = None):
+        # Re-indexes songs added or modified since the index was last saved. Their analyses are
+        # checked against the table snapshot the index was built with, not the current one.
+        context = dataclasses.replace(context or get_context(), default_analyses_major=self.default_analyses)
+
+        mtimes = {
+            path.relative_to(self.corpus_dir).as_posix(): path.stat().st_mtime_ns
+            for path in iter_song_paths(self.corpus_dir)
+        }
+        stale = {song for song in self.mtimes.keys() | mtimes.keys() if self.mtimes.get(song) != mtimes.get(song)}
+        if not stale:
+            return 0
+
+        for key, locations in self.key_to_locations.items():
+            self.key_to_locations[key] = [location for location in locations if location[0] not in stale]
+
+        to_index = sorted(song for song in stale if song in mtimes)
+        song_paths = [self.corpus_dir / song for song in to_index]
+        for song, song_locations in zip(to_index, parallel_map(index_song, song_paths, context, workers)):
+            for step, chroma, quality_string, measure, index in song_locations:
+                key = step, chroma, ChordQuality.from_string(quality_string)
+                self.key_to_locations[key].append((song, measure, index))
+
+        self.mtimes = mtimes
+        return len(stale)
+
+    def get_affected_locations(self, default_analyses: dict) -> dict[str, list[tuple[int, int]]]:
+        song_to_locations = defaultdict(list)
+        for key in diff_default_analyses(self.default_analyses, default_analyses):
+            for song, measure, index in self.key_to_locations.get(key, []):
+                song_to_locations[song].append((measure, index))
+        return song_to_locations
+
+    def reanalyze(self, context: Optional[SettingsContext] = None, workers: Optional[int] = None):
+        # Rewrites the analyses affected by changes in the default analyses table since the index was built
+        context = context or get_context()
+        song_to_locations = self.get_affected_locations(context.default_analyses_major)
+
+        args = [(self.corpus_dir / song, locations) for song, locations in song_to_locations.items()]
+        for path, mtime in parallel_map(reanalyze_song, args, context, workers):
+            self.mtimes[Path(path).relative_to(self.corpus_dir).as_posix()] = mtime
+
+        self.default_analyses = context.default_analyses_major
+        return len(song_to_locations), sum(len(locations) for locations in song_to_locations.values())
+
+    @classmethod
+    def build(cls, corpus_dir: Path, context: Optional[SettingsContext] = None, workers: Optional[int] = None):
+        context = context or get_context()
+        index = cls(corpus_dir, context.default_analyses_major)
+        index.update(context, workers)
+        return index
+
+
+def reanalyze_corpus(corpus_dir: Path, context: Optional[SettingsContext] = None, workers: Optional[int] = None):
+    index = DefaultAnalysisIndex.load(corpus_dir)
+    if index is None:
+        # nothing to compare with yet: assume stored analyses follow the current table
+        index = DefaultAnalysisIndex.build(corpus_dir, context, workers)
+        index.save()
+        return 0, 0
+
+    index.update(context, workers)
+    result = index.reanalyze(context, workers)
+    index.save()
+    return result
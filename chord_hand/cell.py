@@ -2,20 +2,25 @@ import functools
 from enum import Enum, auto
 from typing import Union
 
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QStringListModel, QTimer
 from PyQt6.QtGui import QFont
-from PyQt6.QtWidgets import QFrame, QSizePolicy, QLabel, QLineEdit, QComboBox, QGridLayout, QCheckBox, QHBoxLayout
+from PyQt6.QtWidgets import (
+    QFrame, QSizePolicy, QLabel, QLineEdit, QComboBox, QGridLayout, QCheckBox, QHBoxLayout, QCompleter
+)
 
 import chord_hand.analysis
-import chord_hand.settings
-from chord_hand import settings
+from chord_hand.settings import get_context
+from chord_hand.trace import traced, span
 from chord_hand.analysis import Modality, HarmonicAnalysis
+from chord_hand.analysis.alternatives import get_alternatives
+from chord_hand.encoding.correction import get_corrector
 from chord_hand.chord.chord import Chord
 from chord_hand.analysis.harmonic_region import HarmonicRegion
 from chord_hand.chord.note import Note
 
 CELL_WIDTH = 150
 CELL_HEIGHT = 140
+SUGGESTIONS_DELAY = 1000  # ms without typing before code suggestions are shown
 
 
 class Cell:
@@ -34,16 +39,21 @@ class Cell:
             update_other_cell_regions,
             field_types,
             chords=list[Chord],
+            on_chords_edited=None,
+            get_next_chord=None,
     ):
-        from chord_hand.settings import encoder
-
         self.n = n
         self.chords = chords
-        self.chord_codes = encoder.encode_measure(self.chords)
+        self.chord_codes = get_context().encoder.encode_measure(self.chords)
         self.analysis_code = ''
         self.region_code = ''
         self.on_next_measure = functools.partial(on_next_measure, self)
+        # called when the user changes the chords, e.g. so that other instances of a section follow
+        self.on_chords_edited = functools.partial(on_chords_edited, self) if on_chords_edited else lambda: None
+        # the chord after the measure, that its last chord may resolve to
+        self.get_next_chord = functools.partial(get_next_chord, self) if get_next_chord else lambda: None
         self.field_types = field_types
+        self.alternatives = []
 
         self._init_widgets()
         self.proxy = None
@@ -90,6 +100,17 @@ class Cell:
         self.chord_codes_line_edit.setFixedHeight(self.LINE_EDIT_HEIGHT)
         self.layout.addWidget(self.chord_codes_line_edit, 1, 0, 1, 2, Qt.AlignmentFlag.AlignHCenter)
 
+        # shown by hand on enter or once the user stops typing, so that codes still being typed are not corrected
+        self.code_suggestions_model = QStringListModel()
+        self.code_suggestions_completer = QCompleter(self.code_suggestions_model, self.chord_codes_line_edit)
+        self.code_suggestions_completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self.code_suggestions_completer.setWidget(self.chord_codes_line_edit)
+        self.code_suggestions_completer.activated.connect(self.on_code_suggestion_activated)
+        self.code_suggestions_timer = QTimer(self.chord_codes_line_edit)
+        self.code_suggestions_timer.setSingleShot(True)
+        self.code_suggestions_timer.timeout.connect(self.show_code_suggestions)
+        self.chord_codes_line_edit.returnPressed.connect(self.show_code_suggestions)
+
         self.chord_symbol_label = QLabel(" ".join([c.to_symbol() for c in self.chords]))
         self.chord_symbol_label.setFixedHeight(self.LINE_EDIT_HEIGHT)
         self.chord_symbol_label.setFont(
@@ -125,14 +146,48 @@ class Cell:
 
     def _init_analytical_type_field(self):
         self.analytic_type_combobox = QComboBox()
-        for name, analytic_type in chord_hand.settings.name_to_analytic_type.items():
-            self.analytic_type_combobox.addItem(name, analytic_type)
-        self.analytic_type_combobox.currentTextChanged.connect(self.on_analytic_type_combobox_edited)
+        self._populate_analytic_type_combobox()
+        self.analytic_type_combobox.currentIndexChanged.connect(self.on_analytic_type_combobox_edited)
         self.layout.addWidget(self.analytic_type_combobox, 4, 1, Qt.AlignmentFlag.AlignHCenter)
 
         self.analytical_type_lock_checkbox = QCheckBox('Lock')
         self.layout.addWidget(self.analytical_type_lock_checkbox, 5, 1, Qt.AlignmentFlag.AlignHCenter)
 
+    def _populate_analytic_type_combobox(self, current_name=None):
+        # lists the alternative analyses of the first chord, most plausible first, or the type names
+        # when the chord can't be analyzed
+        if current_name is None and (current_type := self.analytic_type_combobox.currentData()):
+            current_name = current_type.name
+        self.analytic_type_combobox.blockSignals(True)
+        self.analytic_type_combobox.clear()
+        if self.alternatives and self.alternatives[0]:
+            for analysis in self.alternatives[0].ranked:
+                self.analytic_type_combobox.addItem(f'{analysis.to_symbol()} ({analysis.type.name})', analysis.type)
+        else:
+            for name, analytic_type in get_context().name_to_analytic_type.items():
+                self.analytic_type_combobox.addItem(name, analytic_type)
+        self._set_current_analytic_type(current_name)
+        self.analytic_type_combobox.blockSignals(False)
+
+    def _set_current_analytic_type(self, name):
+        for i in range(self.analytic_type_combobox.count()):
+            if self.analytic_type_combobox.itemData(i).name == name:
+                self.analytic_type_combobox.setCurrentIndex(i)
+                return
+
+    def apply_settings_change(self, change):
+        if change.changed_analytic_types:
+            self._populate_analytic_type_combobox()
+
+        if change.encoding_changed:
+            self.set_chords(self.chords)
+        elif change.affects_chord_codes(self.chord_codes):
+            self.on_chord_symbol_code_edited(self.chord_codes)
+        elif change.affects_symbols(self.chords):
+            self._set_chord_symbol_label(self.chords)
+        elif change.affects_analyses(self.chords, self.region, self.harmonic_analysis):
+            self.analyze_harmonies()
+
     def set_n(self, n):
         self.n = n
         self.n_label.setText(str(n))
@@ -149,21 +204,27 @@ class Cell:
             return analysis.to_symbol()
 
         self.harmonic_analysis = analyses
-        self.analysis_label.setText(' '.join([get_label(x) for x in analyses]))
-        if analyses and analyses[0]:
-            self.analytic_type_combobox.setCurrentText(analyses[0].type.name)
+        with span('QLabel.setText'):
+            self.analysis_label.setText(' '.join([get_label(x) for x in analyses]))
+        if analyses and isinstance(analyses[0], HarmonicAnalysis):
+            # shows the type of the first chord without re-analyzing the others with it
+            self.analytic_type_combobox.blockSignals(True)
+            self._set_current_analytic_type(analyses[0].type.name)
+            self.analytic_type_combobox.blockSignals(False)
 
     def set_is_analytic_type_locked(self, value):
         self.analytical_type_lock_checkbox.setChecked(value)
 
     def set_chords(self, chords):
-        from chord_hand.settings import encoder
-
         self.chords = chords
-        self.chord_codes = encoder.encode_measure(self.chords)
+        self.chord_codes = get_context().encoder.encode_measure(self.chords)
         self.chord_codes_line_edit.setText(self.chord_codes)
         self._set_chord_symbol_label(chords)
 
+    def add_chord(self, chord: Chord):
+        self.set_chords(self.chords + [chord])
+        self.on_chords_edited()
+
     def set_region(self, region: Union[HarmonicRegion, None], inherited: bool):
         self.region = region
         self.is_region_inherited = inherited
@@ -184,33 +245,63 @@ class Cell:
                 return '?'
             else:
                 return symbol
-        self.chord_symbol_label.setText(" ".join(list(map(to_label, chords))))
-        self.chord_symbol_label.setToolTip(self.chord_symbol_label.text())
+        with span('QLabel.setText'):
+            self.chord_symbol_label.setText(" ".join(list(map(to_label, chords))))
+            self.chord_symbol_label.setToolTip(self.chord_symbol_label.text())
         if self.region:
             self.analyze_harmonies()
 
+    @traced()
     def on_chord_symbol_code_edited(self, text):
+        self.code_suggestions_timer.stop()
         if not text:
             self.chord_codes = ""
             self.chord_symbol_label.setText("")
             self.chord_symbol_label.setToolTip("")
             self.chord_codes_line_edit.setText("")
+            self.code_suggestions_model.setStringList([])
+            self.chords = []
+            self.on_chords_edited()
             return
         elif text and text[-1] == " ":
             self.chord_codes_line_edit.setText(text[:-1])
             self.on_next_measure()
             return
 
+        self.code_suggestions_model.setStringList([])
         self.chord_codes = text
         try:
-            self.chords = chord_hand.settings.decoder.decode_measure(text)
-        except ValueError:
+            self.chords = get_context().decoder.decode_measure(text)
+        except (ValueError, KeyError):
             self.chords = []
             self.chord_symbol_label.setText("ERROR")
             self.chord_symbol_label.setToolTip("ERROR")
+            self.suggest_codes(text)
+            self.on_chords_edited()
             return
 
         self._set_chord_symbol_label(self.chords)
+        if not all(self.chords):
+            self.suggest_codes(text)
+        else:
+            self.chord_codes_line_edit.setToolTip('')
+        self.on_chords_edited()
+
+    def suggest_codes(self, text):
+        suggestions = get_corrector().suggest_measure(text)
+        self.chord_codes_line_edit.setToolTip('Did you mean: ' + ', '.join(suggestions) if suggestions else '')
+        self.code_suggestions_model.setStringList(suggestions)
+        if suggestions:
+            self.code_suggestions_timer.start(SUGGESTIONS_DELAY)
+
+    def show_code_suggestions(self):
+        self.code_suggestions_timer.stop()
+        if self.code_suggestions_model.stringList():
+            self.code_suggestions_completer.complete()
+
+    def on_code_suggestion_activated(self, text):
+        self.chord_codes_line_edit.setText(text)
+        self.on_chord_symbol_code_edited(text)
 
     def on_region_tonic_activated(self, _):
         text = self.region_tonic_combobox.currentText()
@@ -252,23 +343,53 @@ class Cell:
         self.set_region(HarmonicRegion(self.region.tonic, modality), inherited=False)
         self.update_other_cell_regions()
 
-    def on_analytic_type_combobox_edited(self, value):
-        if self.harmonic_analysis:
-            self.analyze_harmonies(settings.name_to_analytic_type[value])
+    def on_analytic_type_combobox_edited(self, index):
+        if self.harmonic_analysis and index >= 0:
+            self.analyze_harmonies(self.analytic_type_combobox.itemData(index))
 
     @property
     def is_analytic_type_locked(self):
             return self.analytical_type_lock_checkbox.checkState() == Qt.CheckState.Checked
 
+    @traced()
     def analyze_harmonies(self, analytic_type=None):
-        if self.is_analytic_type_locked:
-            analytic_type = self.analytic_type_combobox.currentData()
+        # unless a type is given, each chord of a locked measure keeps the type of its analysis, e.g. as inferred
+        analytic_types = [analytic_type] * len(self.chords)
+        if self.is_analytic_type_locked and not analytic_type:
+            current_type = self.analytic_type_combobox.currentData()
+            name_to_analytic_type = get_context().name_to_analytic_type
+            stored_types = [
+                name_to_analytic_type.get(analysis.type.name, current_type)
+                if isinstance(analysis, HarmonicAnalysis) else current_type
+                for analysis in self.harmonic_analysis
+            ]
+            analytic_types = (stored_types + [current_type] * len(self.chords))[:len(self.chords)]
         analyses = []
         if not self.region:
+            self.alternatives = []
             self.set_analysis(None)
             return
-        for chord in self.chords:
-            analysis = chord_hand.analysis.analyze(chord, self.region, analytic_type)
+
+        # alternatives are cached, so switching types doesn't analyze the chords again
+        next_chords = self.chords[1:] + [self.get_next_chord()] if self.chords else []
+        alternatives = [
+            get_alternatives(chord, self.region, next_chord) for chord, next_chord in zip(self.chords, next_chords)
+        ]
+        if alternatives[:1] != self.alternatives[:1]:
+            self.alternatives = alternatives
+            first_type = analytic_types[0] if analytic_types else None
+            self._populate_analytic_type_combobox(first_type.name if first_type else None)
+        self.alternatives = alternatives
+
+        for chord, chord_alternatives, analytic_type in zip(self.chords, alternatives, analytic_types):
+            if not chord_alternatives:
+                analysis = chord_hand.analysis.analyze(chord, self.region, analytic_type)
+            elif analytic_type:
+                analysis = chord_alternatives.get(analytic_type.name) or chord_hand.analysis.analyze(
+                    chord, self.region, analytic_type
+                )
+            else:
+                analysis = chord_alternatives.default
             analyses.append(analysis)
 
         self.set_analysis(analyses)
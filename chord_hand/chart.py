@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import copy
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from chord_hand import diagnostics
+from chord_hand.chord.chord import Chord
+from chord_hand.chord.symbol_parser import get_parser
+from chord_hand.corpus import SONG_SUFFIX, iter_song_paths, parallel_map
+from chord_hand.encoding.common import to_encodable
+from chord_hand.encoding.correction import CODES_SUFFIX
+from chord_hand.settings import SettingsContext, get_context
+from chord_hand.song import Song
+from chord_hand.trace import traced
+
+CHART_SUFFIXES = ('.cho', '.chopro', '.chordpro', '.crd', '.pro', '.txt')
+# [C7] markers of ChordPro, bar lines (with repeat signs, e.g. "|:" or "||") and words
+TOKEN_PATTERN = re.compile(r'\[([^\]]*)\]|([|:]*\|[|:]*)|(\S+)')
+DIRECTIVE_START = '{'
+COMMENT_START = '#'
+REPEAT_MEASURE = '%'
+NO_CHORD = {'N.C.', 'N.C', 'NC'}
+BEAT_MARKS = {'.', '/'}  # of grids, e.g. "| C . . . |"
+
+
+def parse_chart(text: str, context: Optional[SettingsContext] = None) -> list[list[Chord]]:
+    # Measures of a ChordPro or plain chart. Bar lines delimit measures. ChordPro lines without bars give
+    # a measure per chord, as they don't say where measures start. Plain lines are taken to be chords
+    # only if all their words are chord symbols, so lyrics and titles are skipped.
+    # Measures without chords, and "%", repeat the chords of the measure before.
+    # Unknown symbols inside [] are reported with their measure.
+    parser = get_parser(context)
+    collector = diagnostics.get_collector()
+    measures = []
+    previous = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith(DIRECTIVE_START) or line.startswith(COMMENT_START):
+            continue
+
+        tokens = TOKEN_PATTERN.findall(line)
+        is_chordpro = any(bracket for bracket, _, _ in tokens)
+        if not is_chordpro and not all(is_chart_word(word, parser) for _, _, word in tokens if word):
+            continue
+
+        segments = [[]]
+        for bracket, bar, word in tokens:
+            if bar:
+                segments.append([])
+            elif is_chordpro and bracket:
+                segments[-1].append(bracket.strip())
+            elif not is_chordpro and word not in BEAT_MARKS:
+                segments[-1].append(word)
+
+        if len(segments) == 1:
+            segments = [[symbol] for symbol in segments[0]] if is_chordpro else segments
+        else:
+            # bars at the start and end of lines don't open measures
+            segments = segments[bool(not segments[0]):len(segments) - bool(not segments[-1])]
+
+        for symbols in segments:
+            if collector is not None:
+                collector.measure = len(measures)
+            chords = []
+            for symbol in symbols:
+                if symbol == REPEAT_MEASURE:
+                    chords += [copy.copy(chord) for chord in previous]
+                elif symbol not in NO_CHORD and (chord := parser.parse(symbol)):
+                    chords.append(chord)
+            if not symbols:
+                chords = [copy.copy(chord) for chord in previous]
+            measures.append(chords)
+            previous = chords
+
+    return measures
+
+
+def is_chart_word(word: str, parser) -> bool:
+    return word == REPEAT_MEASURE or word in NO_CHORD or word in BEAT_MARKS or parser.is_known(word)
+
+
+def encode_chart(measures: list[list[Chord]], context: Optional[SettingsContext] = None) -> str:
+    # Chord codes as in File > Load text. Qualities without codes are written as custom qualities, as
+    # when charts are loaded into cells, and other chords that the encoder can't write are reported
+    # and left out.
+    encoder = (context or get_context()).encoder
+    measures = to_encodable(measures, context)
+    measure_codes = []
+    collector = diagnostics.get_collector()
+    for i, chords in enumerate(measures):
+        try:
+            measure_codes.append(encoder.encode_measure(chords))
+            continue
+        except KeyError:
+            pass
+        if collector is not None:
+            collector.measure = i
+        codes = []
+        for chord in chords:
+            try:
+                codes.append(encoder.encode_measure([chord]))
+            except KeyError:
+                diagnostics.report(diagnostics.ENCODE_ERROR, chord.to_symbol())
+        measure_codes.append(''.join(codes))
+    return ' '.join(measure_codes)
+
+
+@dataclass
+class ChartImport:
+    path: str
+    output_path: str
+    n_measures: int
+    diagnostics: list[diagnostics.Diagnostic]
+
+
+def import_chart(args) -> ChartImport:
+    path, output_path, to_codes = args
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with diagnostics.collecting(str(path)) as collector:
+        measures = parse_chart(Path(path).read_text(encoding='utf-8', errors='replace'))
+        if to_codes:
+            output_path.write_text(encode_chart(measures), encoding='utf-8')
+        else:
+            Song(measures).save(output_path)
+    return ChartImport(str(path), str(output_path), len(measures), collector.diagnostics)
+
+
+@traced()
+def import_charts(
+        input_dir: Path,
+        output_dir: Path,
+        to_codes: bool = False,
+        suffixes: tuple[str, ...] = CHART_SUFFIXES,
+        context: Optional[SettingsContext] = None,
+        workers: Optional[int] = None,
+) -> list[ChartImport]:
+    # Writes a JSON song, or a file of chord codes, for each chart in input_dir, keeping the directory
+    # structure. Charts are parsed in worker processes.
+    input_dir, output_dir = Path(input_dir), Path(output_dir)
+    output_suffix = CODES_SUFFIX if to_codes else SONG_SUFFIX
+    paths = sorted({path for suffix in suffixes for path in iter_song_paths(input_dir, suffix)})
+    args = [
+        (path, (output_dir / path.relative_to(input_dir)).with_suffix(output_suffix), to_codes)
+        for path in paths
+    ]
+    return list(parallel_map(import_chart, args, context, workers))
@@ -15,9 +15,9 @@ class Chord:
         if not self.bass:
             self.bass = self.root
 
-    def to_symbol(self):
+    def to_symbol(self, context=None):
         root_symbol = self.root.to_symbol()
-        quality_symbol = self.quality.to_symbol()
+        quality_symbol = self.quality.to_symbol(context)
         bass_symbol = f"/{self.bass.to_symbol()}" if self.is_inverted() else ""
         if root_symbol is None or quality_symbol is None or bass_symbol is None:
             return None
@@ -53,9 +53,6 @@ class NoChord:
 
 
 class RepeatChord:
-    def __init__(self):
-        print()
-
     def __str__(self):
         return "%"
 
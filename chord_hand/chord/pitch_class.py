@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import functools
+
+from chord_hand.chord.chord import Chord
+from chord_hand.chord.quality import ChordQuality
+
+# semitones above the root of each value of the interval fields of ChordQuality
+FIELD_TO_SEMITONES = {
+    'third': {'d': 2, 'm': 3, 'M': 4, 'A': 5},
+    'fifth': {'d': 6, 'p': 7, 'A': 8},
+    'seventh': {'d': 9, 'm': 10, 'M': 11},
+    'ninth': {'m': 1, 'M': 2, 'A': 3},
+    'eleventh': {'p': 5, 'A': 6},
+    'thirteenth': {'m': 8, 'M': 9},
+    'second': {'M': 2, 'p': 2},  # the default chord symbols write sus2 with 'p'
+    'fourth': {'p': 5},
+    'sixth': {'m': 8, 'M': 9, 'A': 10},
+}
+FULL_MASK = 0xFFF
+
+
+@functools.lru_cache(maxsize=None)
+def get_quality_mask(quality: ChordQuality) -> int:
+    # 12-bit mask of the pitch classes of the quality above a root on C, so bit 0 is the root.
+    # Qualities that only have a name have no known pitch classes and get 0.
+    if not isinstance(quality, ChordQuality) or quality.is_name_only():
+        return 0
+    mask = 1
+    for field, value_to_semitones in FIELD_TO_SEMITONES.items():
+        if (semitones := value_to_semitones.get(getattr(quality, field))) is not None:
+            mask |= 1 << semitones
+    return mask
+
+
+def rotate(mask: int, semitones: int) -> int:
+    semitones %= 12
+    return (mask << semitones | mask >> (12 - semitones)) & FULL_MASK
+
+
+def is_maskable(chord) -> bool:
+    return isinstance(chord, Chord) and chord.root.step >= 0 and get_quality_mask(chord.quality) != 0
+
+
+def get_chord_mask(chord) -> int:
+    if not is_maskable(chord):
+        return 0
+    return rotate(get_quality_mask(chord.quality), chord.root.to_pitch_class())
+
+
+def get_bass_mask(chord) -> int:
+    if not is_maskable(chord):
+        return 0
+    return 1 << chord.bass.to_pitch_class() % 12
+
+
+def to_pitch_classes(mask: int) -> list[int]:
+    return [pc for pc in range(12) if mask >> pc & 1]
@@ -1,7 +1,8 @@
 from dataclasses import dataclass
 from typing import Literal
 
-import chord_hand.settings
+from chord_hand import diagnostics
+from chord_hand.settings import get_context
 
 THIRD = Literal["", "M", "m", "d", "A"]
 FIFTH = Literal["", "p", "d", "A"]
@@ -61,20 +62,20 @@ class ChordQuality:
             hash_str += getattr(self, attr) if getattr(self, attr) else "_"
         return hash_str
 
-    def to_symbol(self):
+    def to_symbol(self, context=None):
         if self.is_name_only():
             return self.name
         try:
-            return chord_hand.settings.chord_quality_to_symbol[self]
+            return (context or get_context()).chord_quality_to_symbol[self]
         except KeyError:
-            print(f"No symbol found for {self}")
+            diagnostics.report(diagnostics.MISSING_SYMBOL, self.to_string())
             return None
 
-    def to_chordal_type(self):
+    def to_chordal_type(self, context=None):
         try:
-            return chord_hand.settings.chord_quality_to_chordal_type[self]
+            return (context or get_context()).chord_quality_to_chordal_type[self]
         except KeyError:
-            print(f"No chordal type found for {self}")
+            diagnostics.report(diagnostics.MISSING_CHORDAL_TYPE, self.to_string())
             return None
 
     def to_dict(self):
@@ -114,10 +115,10 @@ class CustomChordQuality:
     def to_string(self):
         return self.name
 
-    def to_symbol(self):
+    def to_symbol(self, context=None):
         return self.name
 
-    def to_chordal_type(self):
+    def to_chordal_type(self, context=None):
         return None
 
     def to_dict(self):
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from chord_hand import diagnostics
+from chord_hand.chord.chord import Chord
+from chord_hand.chord.note import CHROMA_TO_SIGN, STEP_TO_NAME, Note
+from chord_hand.settings import SettingsContext, cached_per_context, get_context
+
+END = ''  # key of the value of a node, can't be mistaken for a character
+BASS_SEPARATOR = '/'
+MEASURE_SEPARATOR = '|'
+PLACEHOLDER_SYMBOL = '???'  # symbol of the empty quality, not a chord anyone writes
+# spellings of accidentals besides those of Note.to_symbol
+EXTRA_SIGN_TO_CHROMA = {'##': 2, 'bb': -2, '♯': 1, '♭': -1}
+
+
+def add_to_trie(trie: dict, key: str, value):
+    node = trie
+    for char in key:
+        node = node.setdefault(char, {})
+    node.setdefault(END, value)
+
+
+def iter_trie_matches(trie: dict, text: str, start: int = 0):
+    # (end, value) of every key that text has at start, shortest first
+    node = trie
+    if END in node:
+        yield start, node[END]
+    for i in range(start, len(text)):
+        node = node.get(text[i])
+        if node is None:
+            return
+        if END in node:
+            yield i + 1, node[END]
+
+
+def get_exact_match(trie: dict, text: str, start: int):
+    node = trie
+    for i in range(start, len(text)):
+        node = node.get(text[i])
+        if node is None:
+            return None
+    return node.get(END)
+
+
+def get_note_names() -> dict[str, tuple[int, int]]:
+    sign_to_chroma = {sign: chroma for chroma, sign in CHROMA_TO_SIGN.items()}
+    sign_to_chroma.update(EXTRA_SIGN_TO_CHROMA)
+    return {
+        name + sign: (step, chroma)
+        for step, name in STEP_TO_NAME.items() if step >= 0
+        for sign, chroma in sign_to_chroma.items()
+    }
+
+
+class ChordSymbolParser:
+    # Inverse of the chord symbols of the settings. Roots and qualities are matched against tries
+    # and the longest match that leaves nothing but a bass wins, so e.g. "7.9(#11)" isn't read as "7".
+    # The qualities of parsed chords are those of the settings, not copies.
+    def __init__(self, context: Optional[SettingsContext] = None):
+        context = context or get_context()
+        self.note_trie = {}
+        for name, step_chroma in get_note_names().items():
+            add_to_trie(self.note_trie, name, step_chroma)
+
+        # of qualities with the same symbol, those that have a key come first
+        self.quality_trie = {}
+        qualities = sorted(context.chord_quality_to_symbol, key=lambda q: q not in context.chord_quality_to_key)
+        for quality in qualities:
+            symbol = context.chord_quality_to_symbol[quality]
+            if symbol != PLACEHOLDER_SYMBOL:
+                add_to_trie(self.quality_trie, symbol, quality)
+
+        self.symbol_to_parts = {}  # lead sheets use a few dozen symbols over and over
+
+    def get_parts(self, symbol: str) -> Optional[tuple]:
+        # (root, quality, bass) with notes as (step, chroma), or None if the symbol is not known
+        try:
+            return self.symbol_to_parts[symbol]
+        except KeyError:
+            parts = self.symbol_to_parts[symbol] = self._parse(symbol)
+            return parts
+
+    def get_quality(self, symbol: str):
+        # the quality with exactly this symbol, e.g. "7M", or None
+        return get_exact_match(self.quality_trie, symbol, 0)
+
+    def is_known(self, symbol: str) -> bool:
+        return self.get_parts(symbol) is not None
+
+    def parse(self, symbol: str) -> Optional[Chord]:
+        # None if the symbol is not known, which is reported
+        parts = self.get_parts(symbol)
+        if parts is None:
+            diagnostics.report(diagnostics.UNKNOWN_SYMBOL, symbol, (0, len(symbol)))
+            return None
+        (root_step, root_chroma), quality, (bass_step, bass_chroma) = parts
+        return Chord(Note(root_step, root_chroma), quality, Note(bass_step, bass_chroma))
+
+    def _parse(self, symbol: str) -> Optional[tuple]:
+        for root_end, root in reversed(list(iter_trie_matches(self.note_trie, symbol))):
+            for quality_end, quality in reversed(list(iter_trie_matches(self.quality_trie, symbol, root_end))):
+                if quality_end == len(symbol):
+                    return root, quality, root
+                if symbol[quality_end] != BASS_SEPARATOR:
+                    continue
+                bass = get_exact_match(self.note_trie, symbol, quality_end + 1)
+                if bass is not None:
+                    return root, quality, bass
+        return None
+
+    def parse_sheet(self, text: str) -> list[list[Chord]]:
+        # Measures are separated by bars and chords by whitespace, e.g. "| C7M A7 | Dm7 G7/B |".
+        # Unknown symbols are reported with the measure they are in and left out.
+        collector = diagnostics.get_collector()
+        measures = []
+        for measure_text in text.split(MEASURE_SEPARATOR):
+            if not measure_text.strip():
+                continue
+            if collector is not None:
+                collector.measure = len(measures)
+            measures.append([chord for chord in map(self.parse, measure_text.split()) if chord is not None])
+        return measures
+
+
+# built again when the settings change
+get_parser = cached_per_context(ChordSymbolParser)
+
+
+def parse_chord_symbol(symbol: str, context: Optional[SettingsContext] = None) -> Optional[Chord]:
+    return get_parser(context).parse(symbol.strip())
+
+
+def parse_chord_symbol_sheet(text: str, context: Optional[SettingsContext] = None) -> list[list[Chord]]:
+    return get_parser(context).parse_sheet(text)
@@ -0,0 +1,336 @@
+import argparse
+from pathlib import Path
+
+from chord_hand import trace
+from chord_hand.main import init_settings
+
+
+def reanalyze(args):
+    from chord_hand.analysis.reanalysis import reanalyze_corpus
+
+    n_songs, n_chords = reanalyze_corpus(args.corpus_dir, workers=args.workers)
+    print(f'Re-analyzed {n_chords} chords in {n_songs} songs.')
+
+
+def infer(args):
+    from chord_hand.analysis.inference import infer_corpus
+
+    n_songs, n_chords = infer_corpus(args.corpus_dir, workers=args.workers)
+    print(f'Changed the analyses of {n_chords} chords in {n_songs} songs.')
+
+
+def transpose(args):
+    from chord_hand.analysis import str_to_note
+    from chord_hand.corpus import iter_song_paths
+    from chord_hand.song import Song
+    from chord_hand.transpose import normalize_songs
+
+    paths = list(iter_song_paths(args.corpus_dir))
+    songs = normalize_songs(map(Song.load, paths), str_to_note(args.to))
+    output_dir = args.output_dir or args.corpus_dir
+    for path, song in zip(paths, songs):
+        output_path = output_dir / path.relative_to(args.corpus_dir)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        song.save(output_path)
+    print(f'Transposed {len(songs)} songs to {args.to}.')
+
+
+def search(args):
+    from chord_hand.search import get_updated_index
+
+    index = get_updated_index(args.corpus_dir, workers=args.workers)
+    hits = index.search(args.query, args.kind)
+    for hit in hits:
+        print(f'{hit.song}\t{hit.measure + 1}\t{hit.offset + 1}')
+    print(f'{len(hits)} hits.')
+
+
+def stats(args):
+    from chord_hand.stats import get_corpus_stats
+
+    corpus_stats = get_corpus_stats(args.corpus_dir, args.max_n, workers=args.workers)
+    corpus_stats.write_csv(args.output_dir)
+    print(f'Wrote statistics of {corpus_stats.n_songs} songs to {args.output_dir}.')
+
+
+def similar(args):
+    from chord_hand.encoding.common import decode_chord_code_sequence
+    from chord_hand.similarity import get_similarity_index
+
+    index = get_similarity_index(args.corpus_dir, workers=args.workers)
+    chords = [chord for measure in decode_chord_code_sequence(args.codes) for chord in measure]
+    if args.kind == 'chords':
+        neighbours = index.nearest_chords(chords[0], args.n, args.metric, use_bass=not args.ignore_bass)
+    else:
+        neighbours = index.nearest_measures(chords, args.n, args.metric)
+    for distance, hit in neighbours:
+        print(f'{distance:g}\t{hit.song}\t{hit.measure + 1}\t{hit.offset + 1}')
+
+
+def fixup(args):
+    from chord_hand.encoding.correction import fix_up_corpus
+
+    corrections = fix_up_corpus(args.corpus_dir, args.report, args.apply, workers=args.workers)
+    n_files = len({correction.path for correction in corrections})
+    print(f'Found {len(corrections)} invalid chord codes in {n_files} files. Report written to {args.report}.')
+
+
+def validate(args):
+    from chord_hand.validation import validate_corpus
+
+    kind_counts = validate_corpus(args.corpus_dir, args.report, workers=args.workers)
+    for kind, n in kind_counts.most_common():
+        print(f'{kind}\t{n}')
+    print(f'Found {sum(kind_counts.values())} problems. Report written to {args.report}.')
+
+
+def import_charts(args):
+    from collections import Counter
+
+    from chord_hand.chart import import_charts
+
+    imports = import_charts(args.input_dir, args.output_dir, args.codes, workers=args.workers)
+    kind_to_details = Counter(
+        (diagnostic.kind, diagnostic.detail) for chart_import in imports for diagnostic in chart_import.diagnostics
+    )
+    for (kind, detail), n in kind_to_details.most_common():
+        print(f'{kind}\t{detail}\t{n}')
+    n_measures = sum(chart_import.n_measures for chart_import in imports)
+    print(f'Imported {n_measures} measures from {len(imports)} charts to {args.output_dir}.')
+
+
+def humdrum(args):
+    from chord_hand.humdrum import export_corpus
+
+    n_songs = export_corpus(args.corpus_dir, args.output_path, workers=args.workers)
+    print(f'Wrote {n_songs} songs to {args.output_path}.')
+
+
+def import_mpb(args):
+    from chord_hand.projeto_mpb import import_projeto_mpb_csvs
+
+    imported = import_projeto_mpb_csvs(args.csv_paths, args.output_dir, workers=args.workers)
+    n_problems = 0
+    for imported_song in imported:
+        for diagnostic in imported_song.diagnostics:
+            measure = '' if diagnostic.measure is None else diagnostic.measure + 1
+            print(f'{diagnostic.song}\t{measure}\t{diagnostic.kind}\t{diagnostic.detail}')
+            n_problems += 1
+    print(f'Imported {len(imported)} songs to {args.output_dir}, with {n_problems} problems.')
+
+
+def transcode(args):
+    from chord_hand.encoding.transcode import transcode_files
+
+    transcoded = transcode_files(args.input_path, args.output_path, args.source, args.target, workers=args.workers)
+    n_problems = 0
+    for transcoded_file in transcoded:
+        for diagnostic in transcoded_file.diagnostics:
+            print(f'{diagnostic.song}\t{diagnostic.measure + 1}\t{diagnostic.kind}\t{diagnostic.detail}')
+            n_problems += 1
+    n_measures = sum(transcoded_file.n_measures for transcoded_file in transcoded)
+    print(f'Transcoded {n_measures} measures in {len(transcoded)} files, with {n_problems} problems.')
+
+
+def form(args):
+    from chord_hand.analysis.form import detect_corpus_forms
+
+    forms = detect_corpus_forms(
+        args.corpus_dir, args.report, args.features, args.min_length, args.apply, workers=args.workers
+    )
+    for song_form in forms:
+        print(f'{song_form.path}\t{song_form.to_string()}')
+    print(f'Proposed forms for {len(forms)} songs. Report written to {args.report}.')
+
+
+def timestamps(args):
+    import csv
+
+    from chord_hand.export import get_audio_labels_data, get_tilia_csv_data
+    from chord_hand.song import Song
+    from chord_hand.timeline import Timeline
+
+    song = Song.load(args.song_path)
+    timeline = song.timeline or Timeline()
+    if args.tempo:
+        timeline.tempo_changes[0.0] = args.tempo
+    if args.format == 'labels':
+        args.output_path.write_text(get_audio_labels_data(song.chords, timeline), encoding='utf-8')
+    else:
+        with open(args.output_path, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(get_tilia_csv_data(song.chords, song.regions, song.analyses, timeline))
+    print(f'Wrote the times of {sum(map(len, song.chords))} chords to {args.output_path}.')
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog='chord_hand')
+    parser.add_argument(
+        '--trace', type=Path, default=None,
+        help='Write a Chrome trace of the run to this path (spans in worker processes are not recorded)'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    reanalyze_parser = subparsers.add_parser(
+        'reanalyze',
+        help='Update the analyses of a directory of JSON songs after changes to default_analyses.csv',
+    )
+    reanalyze_parser.add_argument('corpus_dir', type=Path)
+    reanalyze_parser.add_argument('--workers', type=int, default=None)
+    reanalyze_parser.set_defaults(func=reanalyze)
+
+    infer_parser = subparsers.add_parser(
+        'infer',
+        help='Infer analytic types from the chords that follow, in the unlocked measures of a directory of JSON songs',
+    )
+    infer_parser.add_argument('corpus_dir', type=Path)
+    infer_parser.add_argument('--workers', type=int, default=None)
+    infer_parser.set_defaults(func=infer)
+
+    transpose_parser = subparsers.add_parser(
+        'transpose',
+        help='Transpose every JSON song in a directory so that its first region is on the given tonic',
+    )
+    transpose_parser.add_argument('corpus_dir', type=Path)
+    transpose_parser.add_argument('--to', default='C', help='Tonic name, e.g. C, Eb or F#')
+    transpose_parser.add_argument(
+        '--output-dir', type=Path, default=None, help='Write transposed songs here instead of overwriting them'
+    )
+    transpose_parser.set_defaults(func=transpose)
+
+    search_parser = subparsers.add_parser(
+        'search',
+        help='Find a progression in a directory of JSON songs, e.g. "II V I" or "2:m7 * 0:*"',
+    )
+    search_parser.add_argument('corpus_dir', type=Path)
+    search_parser.add_argument('query', help='Space-separated tokens. Tokens may use *, ? and [] wildcards')
+    search_parser.add_argument(
+        '--kind', choices=['analysis', 'roots'], default='analysis',
+        help='Search analysis symbols or roots relative to the tonic with quality symbols'
+    )
+    search_parser.add_argument('--workers', type=int, default=None)
+    search_parser.set_defaults(func=search)
+
+    stats_parser = subparsers.add_parser(
+        'stats',
+        help='Write n-gram counts and transition matrices of a directory of JSON songs as CSV files',
+    )
+    stats_parser.add_argument('corpus_dir', type=Path)
+    stats_parser.add_argument('output_dir', type=Path)
+    stats_parser.add_argument('--max-n', type=int, default=3)
+    stats_parser.add_argument('--workers', type=int, default=None)
+    stats_parser.set_defaults(func=stats)
+
+    similar_parser = subparsers.add_parser(
+        'similar',
+        help='Find the chords or measures of a directory of JSON songs with the closest pitch class sets',
+    )
+    similar_parser.add_argument('corpus_dir', type=Path)
+    similar_parser.add_argument('codes', help='Chord codes. With --kind chords, only the first chord is used')
+    similar_parser.add_argument('--kind', choices=['chords', 'measures'], default='chords')
+    similar_parser.add_argument('--metric', choices=['jaccard', 'hamming'], default='jaccard')
+    similar_parser.add_argument('-n', type=int, default=10, help='Number of results')
+    similar_parser.add_argument('--ignore-bass', action='store_true', help='Compare chords regardless of inversion')
+    similar_parser.add_argument('--workers', type=int, default=None)
+    similar_parser.set_defaults(func=similar)
+
+    fixup_parser = subparsers.add_parser(
+        'fixup',
+        help='Report invalid chord codes in a directory of .txt code files, with suggested corrections',
+    )
+    fixup_parser.add_argument('corpus_dir', type=Path)
+    fixup_parser.add_argument('report', type=Path, help='Path of the CSV report')
+    fixup_parser.add_argument('--apply', action='store_true', help='Rewrite measures with their first suggestion')
+    fixup_parser.add_argument('--workers', type=int, default=None)
+    fixup_parser.set_defaults(func=fixup)
+
+    validate_parser = subparsers.add_parser(
+        'validate',
+        help='Check every JSON song and .txt code file in a directory and write the problems found to a CSV report',
+    )
+    validate_parser.add_argument('corpus_dir', type=Path)
+    validate_parser.add_argument('report', type=Path, help='Path of the CSV report')
+    validate_parser.add_argument('--workers', type=int, default=None)
+    validate_parser.set_defaults(func=validate)
+
+    import_charts_parser = subparsers.add_parser(
+        'import-charts',
+        help='Convert a directory of ChordPro and plain-text chord charts to JSON songs or chord codes',
+    )
+    import_charts_parser.add_argument('input_dir', type=Path)
+    import_charts_parser.add_argument('output_dir', type=Path)
+    import_charts_parser.add_argument(
+        '--codes', action='store_true', help='Write .txt files of chord codes instead of JSON songs'
+    )
+    import_charts_parser.add_argument('--workers', type=int, default=None)
+    import_charts_parser.set_defaults(func=import_charts)
+
+    humdrum_parser = subparsers.add_parser(
+        'humdrum',
+        help='Write every JSON song in a directory to a single Humdrum file of chord, analysis and region spines',
+    )
+    humdrum_parser.add_argument('corpus_dir', type=Path)
+    humdrum_parser.add_argument('output_path', type=Path)
+    humdrum_parser.add_argument('--workers', type=int, default=None)
+    humdrum_parser.set_defaults(func=humdrum)
+
+    import_mpb_parser = subparsers.add_parser(
+        'import-mpb',
+        help='Convert Projeto MPB database CSVs, in the new or old layout, to JSON songs',
+    )
+    import_mpb_parser.add_argument('csv_paths', type=Path, nargs='+')
+    import_mpb_parser.add_argument('output_dir', type=Path)
+    import_mpb_parser.add_argument('--workers', type=int, default=None)
+    import_mpb_parser.set_defaults(func=import_mpb)
+
+    transcode_parser = subparsers.add_parser(
+        'transcode',
+        help='Convert a .txt file, or a directory of them, of chord codes from one encoding to another',
+    )
+    transcode_parser.add_argument('input_path', type=Path)
+    transcode_parser.add_argument('output_path', type=Path)
+    transcode_parser.add_argument('--from', dest='source', default='standard', help='Encoding in settings.toml')
+    transcode_parser.add_argument('--to', dest='target', default='projeto_mpb', help='Encoding in settings.toml')
+    transcode_parser.add_argument('--workers', type=int, default=None)
+    transcode_parser.set_defaults(func=transcode)
+
+    form_parser = subparsers.add_parser(
+        'form',
+        help='Propose sections for every JSON song in a directory from its repeated measures',
+    )
+    form_parser.add_argument('corpus_dir', type=Path)
+    form_parser.add_argument('report', type=Path, help='Path of the CSV report')
+    form_parser.add_argument(
+        '--features', choices=['chords', 'masks', 'analyses'], default='chords',
+        help='Compare measures by their chords, their pitch classes or their analyses'
+    )
+    form_parser.add_argument('--min-length', type=int, default=4, help='Measures of the shortest repeat')
+    form_parser.add_argument('--apply', action='store_true', help='Save songs with the sections proposed')
+    form_parser.add_argument('--workers', type=int, default=None)
+    form_parser.set_defaults(func=form)
+
+    timestamps_parser = subparsers.add_parser(
+        'timestamps',
+        help="Write the time of every chord of a JSON song, from its timeline, as TiLiA CSV or audio labels",
+    )
+    timestamps_parser.add_argument('song_path', type=Path)
+    timestamps_parser.add_argument('output_path', type=Path)
+    timestamps_parser.add_argument('--format', choices=['tilia', 'labels'], default='tilia')
+    timestamps_parser.add_argument('--tempo', type=float, default=None, help='Quarter notes per minute at the start')
+    timestamps_parser.set_defaults(func=timestamps)
+
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    if args.trace:
+        trace.enable()
+    init_settings()
+    args.func(args)
+    if args.trace:
+        trace.save(args.trace)
+        print(trace.format_summary())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+from chord_hand.settings import SettingsContext, get_context, set_default_context, use_context
+
+SONG_SUFFIX = '.json'
+
+
+def iter_song_paths(corpus_dir: Path, suffix: str = SONG_SUFFIX) -> Iterator[Path]:
+    for path in sorted(Path(corpus_dir).rglob(f'*{suffix}')):
+        if not path.name.startswith('.'):  # skip index files
+            yield path
+
+
+def parallel_map(
+        func: Callable,
+        items: Iterable,
+        context: Optional[SettingsContext] = None,
+        workers: Optional[int] = None,
+        chunksize: int = 16,
+) -> Iterator:
+    # func must be picklable (i.e. defined at module level). The settings context is sent
+    # once to each worker process, where it becomes the default context.
+    context = context or get_context()
+    items = list(items)
+    workers = min(workers or os.cpu_count() or 1, len(items))
+
+    if workers <= 1:
+        for item in items:
+            with use_context(context):
+                result = func(item)
+            yield result
+        return
+
+    with ProcessPoolExecutor(workers, initializer=set_default_context, initargs=(context,)) as executor:
+        yield from executor.map(func, items, chunksize=chunksize)
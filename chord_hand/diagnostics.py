@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import contextlib
+import contextvars
+from dataclasses import dataclass
+from typing import Optional
+
+# kinds of diagnostics
+LOAD_ERROR = 'load'
+DECODE_ERROR = 'decode'
+ENCODE_ERROR = 'encode'
+INCOMPLETE_CHORD = 'incomplete'
+MISSING_SYMBOL = 'symbol'
+UNKNOWN_SYMBOL = 'unknown_symbol'
+MISSING_CHORDAL_TYPE = 'chordal_type'
+ANALYSIS_ERROR = 'analysis'
+
+
+@dataclass(frozen=True)
+class Diagnostic:
+    song: Optional[str]
+    measure: Optional[int]
+    span: Optional[tuple[int, int]]  # characters of the measure code
+    kind: str
+    detail: str
+
+
+class Collector:
+    # Records are plain tuples appended to a list, so reporting costs about as much as a function call.
+    # The song and measure being processed are set by whoever iterates over them.
+    __slots__ = ('song', 'measure', 'records')
+
+    def __init__(self, song: Optional[str] = None):
+        self.song = song
+        self.measure = None
+        self.records = []
+
+    def report(self, kind: str, detail: str, span: Optional[tuple[int, int]] = None):
+        self.records.append((self.song, self.measure, span, kind, detail))
+
+    @property
+    def diagnostics(self) -> list[Diagnostic]:
+        return [Diagnostic(*record) for record in self.records]
+
+
+_current_collector = contextvars.ContextVar('diagnostics_collector', default=None)
+
+
+def get_collector() -> Optional[Collector]:
+    return _current_collector.get()
+
+
+@contextlib.contextmanager
+def collecting(song: Optional[str] = None):
+    collector = Collector(song)
+    token = _current_collector.set(collector)
+    try:
+        yield collector
+    finally:
+        _current_collector.reset(token)
+
+
+def report(kind: str, detail, span: Optional[tuple[int, int]] = None) -> bool:
+    # Returns whether a collector recorded the diagnostic. Without a collector, problems are ignored.
+    collector = _current_collector.get()
+    if collector is None:
+        return False
+    collector.report(kind, str(detail), span)
+    return True
@@ -14,10 +14,11 @@ class Decoder(Protocol):
         ...
 
 
-def decode_chord_code_sequence(text):
-    # delay import so decoder is available
-    from chord_hand.settings import decoder
+def decode_chord_code_sequence(text, context=None):
+    # delay import so settings are available
+    from chord_hand.settings import get_context
 
+    decoder = (context or get_context()).decoder
     codes = text.replace("\n", "").split(" ")
     result = []
     for measure in codes:
@@ -28,6 +29,25 @@ def decode_chord_code_sequence(text):
     return result
 
 
+def to_encodable(measures, context=None):
+    # Chords whose quality has no code in the active encoding get a custom quality with their
+    # symbol, so that they can be entered into cells.
+    from chord_hand.chord.quality import CustomChordQuality
+    from chord_hand.settings import get_context
+
+    context = context or get_context()
+    result = []
+    for chords in measures:
+        measure = []
+        for chord in chords:
+            if isinstance(chord, Chord) and not context.encoder.can_encode_quality(chord.quality, context):
+                name = chord.quality.to_symbol(context) or chord.quality.to_string()
+                chord = Chord(chord.root, CustomChordQuality(name), chord.bass)
+            measure.append(chord)
+        result.append(measure)
+    return result
+
+
 def split_measure_codes_into_chord_codes(code):
     if code == "":
         return ['']
@@ -63,3 +83,16 @@ def split_measure_codes_into_chord_codes(code):
             result.append(root_code + quality_code)
 
     return result
+
+
+def iter_chord_code_spans(code, chord_codes):
+    # (start, end) of each of the codes given by split_measure_codes_into_chord_codes in code,
+    # which drops the slashes of inverted chords
+    start = 0
+    for chord_code in chord_codes:
+        end = start + len(chord_code)
+        if len(chord_code) == 3 and chord_code[1] != '{' and code[start + 2:start + 3] == SLASH:
+            end += 1
+        end = min(end, len(code))
+        yield start, end
+        start = end
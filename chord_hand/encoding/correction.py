@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import csv
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional
+
+from chord_hand.chord.keymap import CODE_TO_NOTE, REPEAT_CHORD_CODE, SLASH, TEXT_MODE
+from chord_hand.corpus import iter_song_paths, parallel_map
+from chord_hand.encoding.common import split_measure_codes_into_chord_codes
+from chord_hand.encoding.projeto_mpb import ProjetoMPBDecoder
+from chord_hand.encoding.projeto_mpb.maps import code_to_quality
+from chord_hand.settings import SettingsContext, cached_per_context, get_context
+from chord_hand.trace import traced
+
+MAX_DISTANCE = 1
+N_SUGGESTIONS = 5
+CODES_SUFFIX = '.txt'
+
+KEYBOARD_ROWS = ['1234567890', 'qwertyuiop', 'asdfghjkl;', 'zxcvbnm,./']
+KEY_TO_POSITION = {
+    key: (i, j) for i, row in enumerate(KEYBOARD_ROWS) for j, char in enumerate(row) for key in (char, char.upper())
+}
+ROOT_CODES = [code for code in CODE_TO_NOTE if len(code) == 1 and CODE_TO_NOTE[code].step >= 0]
+
+
+def get_edit_distance(a: str, b: str) -> int:
+    # optimal string alignment distance, i.e. Levenshtein with transpositions of adjacent characters
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def are_neighbours(key: str, other: str) -> bool:
+    # keys next to each other on a QWERTY keyboard, or the same key with and without shift
+    if key not in KEY_TO_POSITION or other not in KEY_TO_POSITION:
+        return False
+    (row, column), (other_row, other_column) = KEY_TO_POSITION[key], KEY_TO_POSITION[other]
+    return abs(row - other_row) <= 1 and abs(column - other_column) <= 1
+
+
+def get_slip_cost(code: str, candidate: str) -> int:
+    # substitutions of keys that are far apart are less likely to be typos
+    if len(code) != len(candidate):
+        return 1
+    return sum(1 for a, b in zip(code, candidate) if a != b and not are_neighbours(a, b))
+
+
+def iter_deletions(code: str, max_distance: int):
+    variants = {code}
+    for _ in range(max_distance):
+        variants |= {variant[:i] + variant[i + 1:] for variant in variants for i in range(len(variant))}
+    return variants
+
+
+def get_valid_chord_codes(context: Optional[SettingsContext] = None) -> list[str]:
+    # codes of single chords without bass that decode with the decoder of context, simplest first
+    context = context or get_context()
+    if isinstance(context.decoder, ProjetoMPBDecoder):
+        qualities = list(code_to_quality)
+        qualities += [code[0] for code in code_to_quality if len(code) == 2 and code[1] == '0']
+    else:
+        qualities = [key for key in context.key_to_chord_quality if key != TEXT_MODE]
+    return ROOT_CODES + [root + quality for quality in qualities for root in ROOT_CODES]
+
+
+class CodeCorrector:
+    # Every valid code is indexed under the strings left by deleting up to max_distance of its characters.
+    # A code is then looked up by its own deletions, so a correction costs a few dict lookups whatever
+    # the number of valid codes.
+    def __init__(self, codes: Iterable[str], max_distance: int = MAX_DISTANCE, is_projeto_mpb: bool = False):
+        self.codes = list(dict.fromkeys(codes))
+        self.code_to_rank = {code: i for i, code in enumerate(self.codes)}
+        self.max_distance = max_distance
+        self.is_projeto_mpb = is_projeto_mpb
+        self.deletion_to_codes = defaultdict(list)
+        self.head_to_suggestions = {}  # the same typos come up again and again
+        for code in self.codes:
+            for deletion in iter_deletions(code, max_distance):
+                self.deletion_to_codes[deletion].append(code)
+
+    @classmethod
+    def from_context(cls, context: Optional[SettingsContext] = None, max_distance: int = MAX_DISTANCE):
+        context = context or get_context()
+        is_projeto_mpb = isinstance(context.decoder, ProjetoMPBDecoder)
+        return cls(get_valid_chord_codes(context), max_distance, is_projeto_mpb)
+
+    def split_measure(self, measure_code: str) -> list[str]:
+        if self.is_projeto_mpb:
+            return ProjetoMPBDecoder._split_code_into_chords(measure_code) if measure_code else []
+        return [code for code in split_measure_codes_into_chord_codes(measure_code) if code]
+
+    def join_measure(self, chord_codes: list[str]) -> str:
+        # the standard splitter drops slashes, so they are written back
+        if self.is_projeto_mpb:
+            return ''.join(chord_codes)
+        return ''.join(code[:2] + SLASH + code[2:] if len(code) == 3 else code for code in chord_codes)
+
+    def split_bass(self, code: str) -> tuple[str, str]:
+        if SLASH in code:
+            head, bass = code.split(SLASH, 1)
+            return head, bass
+        if not self.is_projeto_mpb and len(code) == 3:
+            return code[:2], code[2]
+        return code, ''
+
+    def join_bass(self, head: str, bass: str) -> str:
+        if not bass:
+            return head
+        return head + SLASH + bass if self.is_projeto_mpb else head + bass
+
+    def is_valid(self, code: str) -> bool:
+        if code == REPEAT_CHORD_CODE or '{' in code or len(code) > 2 and code[1] == TEXT_MODE:
+            return True
+        head, bass = self.split_bass(code)
+        return head in self.code_to_rank and (not bass or bass in ROOT_CODES)
+
+    def suggest_head(self, code: str, n: int = N_SUGGESTIONS) -> list[str]:
+        if code not in self.head_to_suggestions:
+            self.head_to_suggestions[code] = self._rank_candidates(code)
+        return self.head_to_suggestions[code][:n]
+
+    def _rank_candidates(self, code: str) -> list[str]:
+        candidates = {
+            candidate
+            for deletion in iter_deletions(code, self.max_distance)
+            for candidate in self.deletion_to_codes.get(deletion, [])
+        }
+        scored = []
+        for candidate in candidates:
+            distance = get_edit_distance(code, candidate)
+            if distance <= self.max_distance:
+                scored.append((distance, get_slip_cost(code, candidate), self.code_to_rank[candidate], candidate))
+        return [candidate for *_, candidate in sorted(scored)]
+
+    def suggest(self, code: str, n: int = N_SUGGESTIONS) -> list[str]:
+        # ranked corrections of a chord code. Valid codes are their own only suggestion.
+        if self.is_valid(code):
+            return [code]
+        head, bass = self.split_bass(code)
+        heads = [head] if head in self.code_to_rank else self.suggest_head(head, n)
+        if not bass:
+            return heads
+        basses = [bass] if bass in ROOT_CODES else [b for b in self.suggest_head(bass, n) if b in ROOT_CODES]
+        return [self.join_bass(h, b) for h in heads for b in basses][:n]
+
+    def suggest_measure(self, measure_code: str, n: int = N_SUGGESTIONS) -> list[str]:
+        # the i-th suggestion replaces every invalid chord code with its i-th correction.
+        # Empty if the measure is valid or some code has no correction.
+        chord_codes = self.split_measure(measure_code)
+        code_to_suggestions = {code: self.suggest(code, n) for code in chord_codes if not self.is_valid(code)}
+        if not code_to_suggestions or not all(code_to_suggestions.values()):
+            return []
+
+        result = []
+        for i in range(max(len(suggestions) for suggestions in code_to_suggestions.values())):
+            corrected = [
+                code_to_suggestions[code][min(i, len(code_to_suggestions[code]) - 1)]
+                if code in code_to_suggestions else code
+                for code in chord_codes
+            ]
+            result.append(self.join_measure(corrected))
+        return list(dict.fromkeys(result))
+
+
+# built again when the settings change
+get_corrector = cached_per_context(CodeCorrector.from_context)
+
+
+@dataclass
+class Correction:
+    path: str
+    measure: int
+    code: str
+    suggestions: list[str]
+
+
+def fix_up_codes_file(path: Path) -> list[Correction]:
+    # text files of chord codes, with measures separated by spaces, as in File > Load text
+    corrector = get_corrector()
+    text = Path(path).read_text(encoding='utf-8').replace('\n', '')
+    corrections = []
+    for i, measure_code in enumerate(text.split(' ')):
+        for code in corrector.split_measure(measure_code):
+            if not corrector.is_valid(code):
+                corrections.append(Correction(str(path), i, code, corrector.suggest(code)))
+    return corrections
+
+
+def apply_corrections(path: Path, corrections: list[Correction]) -> int:
+    # replaces each measure with its first suggestion. Returns the number of measures changed.
+    corrector = get_corrector()
+    path = Path(path)
+    measures = path.read_text(encoding='utf-8').replace('\n', '').split(' ')
+    fixable = {correction.measure for correction in corrections if correction.suggestions}
+    n_changed = 0
+    for i in sorted(fixable):
+        if suggestions := corrector.suggest_measure(measures[i], 1):
+            measures[i] = suggestions[0]
+            n_changed += 1
+    if n_changed:
+        path.write_text(' '.join(measures), encoding='utf-8')
+    return n_changed
+
+
+@traced()
+def fix_up_corpus(
+        corpus_dir: Path,
+        report_path: Path,
+        apply: bool = False,
+        context: Optional[SettingsContext] = None,
+        workers: Optional[int] = None,
+) -> list[Correction]:
+    # writes a CSV report of the invalid chord codes of every codes file in corpus_dir, with their
+    # ranked corrections. With apply, measures are rewritten with their first corrections.
+    paths = list(iter_song_paths(corpus_dir, CODES_SUFFIX))
+    corrections = [
+        correction
+        for file_corrections in parallel_map(fix_up_codes_file, paths, context, workers)
+        for correction in file_corrections
+    ]
+
+    with open(report_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['path', 'measure', 'code', 'suggestions'])
+        for correction in corrections:
+            path = Path(correction.path).relative_to(corpus_dir)
+            writer.writerow([path, correction.measure + 1, correction.code, ' '.join(correction.suggestions)])
+
+    if apply:
+        path_to_corrections = defaultdict(list)
+        for correction in corrections:
+            path_to_corrections[correction.path].append(correction)
+        for path, file_corrections in path_to_corrections.items():
+            apply_corrections(path, file_corrections)
+
+    return corrections
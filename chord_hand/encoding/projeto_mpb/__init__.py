@@ -1,15 +1,27 @@
+from chord_hand import diagnostics
 from chord_hand.chord.chord import RepeatChord, Chord, NoChord
 from chord_hand.chord.keymap import REPEAT_CHORD_CODE, CODE_TO_NOTE, SLASH, NOTE_TO_CODE
 from chord_hand.chord.quality import ChordQuality
 from chord_hand.chord.note import Note
+from chord_hand.trace import traced, count
 from .maps import code_to_quality, quality_to_code
 
 
 class ProjetoMPBDecoder:
+    @traced()
     def decode_measure(self, code):
         if not code:
             return ''
-        return list(map(self._decode_chord, self._split_code_into_chords(code)))
+        result = []
+        start = 0
+        for chord_code in self._split_code_into_chords(code):
+            chord = self._decode_chord(chord_code)
+            if chord is None:
+                diagnostics.report(diagnostics.DECODE_ERROR, chord_code, (start, start + len(chord_code)))
+            result.append(chord)
+            start += len(chord_code)
+        count('chords decoded', len(result))
+        return result
 
     @staticmethod
     def _decode_quality(code):
@@ -61,7 +73,6 @@ class ProjetoMPBDecoder:
             else:
                 return self._decode_three_or_more_chars(code)
         except (ValueError, KeyError, IndexError):
-            print(f"Error decoding {code}")
             return None
 
     def _decode_one_char(self, char):
@@ -82,16 +93,17 @@ class ProjetoMPBDecoder:
         elif code[-1] == SLASH:
             code = code[:-1]
 
-        try:
-            root = self._decode_note(code[0])
-            quality = self._decode_quality(code[1:])
-            return Chord(root, quality, bass)
-        except (ValueError, KeyError, IndexError):
-            print(f"Error decoding {code}")
-            return None
+        root = self._decode_note(code[0])
+        quality = self._decode_quality(code[1:])
+        return Chord(root, quality, bass)
 
 
 class ProjetoMPBEncoder:
+    @staticmethod
+    def can_encode_quality(quality, context=None):
+        return not isinstance(quality, ChordQuality) or quality in quality_to_code
+
+    @traced()
     def encode_measure(self, chords):
         return ''.join([self._encode_chord(chord) for chord in chords])
 
@@ -1,23 +1,28 @@
 from asyncio import Protocol
 
-from chord_hand.encoding.common import split_measure_codes_into_chord_codes
+from chord_hand import diagnostics
+from chord_hand.encoding.common import iter_chord_code_spans, split_measure_codes_into_chord_codes
 from chord_hand.chord.keymap import CODE_TO_NOTE, SLASH, TEXT_MODE, NOTE_TO_CODE
 from chord_hand.chord.chord import Chord, NoChord, RepeatChord
 from chord_hand.chord.note import Note
 from chord_hand.chord.quality import ChordQuality, CustomChordQuality
-from chord_hand.settings import key_to_chord_quality
+from chord_hand.settings import get_context
+from chord_hand.trace import traced, count
 
 
 class StandardEncoder:
+    @staticmethod
+    def can_encode_quality(quality, context=None):
+        return not isinstance(quality, ChordQuality) or quality in (context or get_context()).chord_quality_to_key
+
+    @traced()
     def encode_measure(self, chords):
         return ''.join([self._encode_chord(chord) for chord in chords])
 
     @staticmethod
     def _encode_chord_quality(chord):
-        from chord_hand.settings import chord_quality_to_key
-
         if isinstance(chord, ChordQuality):
-            return chord_quality_to_key[chord]
+            return get_context().chord_quality_to_key[chord]
         else:
             # custom chord quality
             return chord.to_code()
@@ -45,10 +50,18 @@ class StandardEncoder:
 
 
 class StandardDecoder:
+    @traced()
     def decode_measure(self, code):
         if not code:
             return []
-        return [self._decode_into_chord(c) for c in split_measure_codes_into_chord_codes(code)]
+        chord_codes = split_measure_codes_into_chord_codes(code)
+        result = [self._decode_into_chord(c) for c in chord_codes]
+        if diagnostics.get_collector() and not all(result):
+            for chord_code, chord, span in zip(chord_codes, result, iter_chord_code_spans(code, chord_codes)):
+                if chord is None:
+                    diagnostics.report(diagnostics.DECODE_ERROR, chord_code, span)
+        count('chords decoded', len(result))
+        return result
 
     def _decode_into_chord(self, code):
         if len(code) == 1:
@@ -74,15 +87,17 @@ class StandardDecoder:
 
     def _decode_three_chars(self, code):
         root = self._decode_one_char(code[0])
-        quality = key_to_chord_quality[code[1]]
+        quality = get_context().key_to_chord_quality.get(code[1])
         bass = self._decode_one_char(code[2])
+        if root is None or quality is None or bass is None:
+            return None
         return Chord(root, quality, bass)
 
     def _decode_three_or_more_chars(self, code):
         if code[2] == SLASH:
             root = CODE_TO_NOTE[code[0]]
             try:
-                quality = key_to_chord_quality[code[1]]
+                quality = get_context().key_to_chord_quality[code[1]]
             except KeyError:
                 return None
             try:
@@ -103,7 +118,7 @@ class StandardDecoder:
     @staticmethod
     def _decode_two_chars(code):
         try:
-            return Chord(CODE_TO_NOTE[code[0]], key_to_chord_quality[code[1]])
+            return Chord(CODE_TO_NOTE[code[0]], get_context().key_to_chord_quality[code[1]])
         except (ValueError, KeyError, IndexError):
             return None
 
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import dataclasses
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, TextIO
+
+from chord_hand import diagnostics
+from chord_hand.chord.chord import Chord
+from chord_hand.corpus import iter_song_paths, parallel_map
+from chord_hand.encoding.correction import CODES_SUFFIX
+from chord_hand.settings import SettingsContext, cached_per_context, get_context, load_decoder_and_encoder, use_context
+from chord_hand.trace import count, traced
+
+MEASURE_SEPARATOR = ' '
+CHUNK_SIZE = 1 << 16
+
+
+@cached_per_context
+def get_encoding_to_context(context: SettingsContext) -> dict[str, SettingsContext]:
+    # contexts that only differ from context in their encoding, filled as they are asked for
+    return {context.encoding: context}
+
+
+def get_encoding_context(encoding: str, context: Optional[SettingsContext] = None) -> SettingsContext:
+    context = context or get_context()
+    encoding_to_context = get_encoding_to_context(context)
+    if encoding not in encoding_to_context:
+        encoding, encoder, decoder = load_decoder_and_encoder(encoding=encoding)
+        encoding_to_context[encoding] = dataclasses.replace(context, encoding=encoding, encoder=encoder, decoder=decoder)
+    return encoding_to_context[encoding]
+
+
+def iter_measure_codes(f: TextIO) -> Iterator[str]:
+    # the measure codes of a text file as in File > Load text, read a chunk at a time
+    rest = ''
+    while chunk := f.read(CHUNK_SIZE):
+        *measure_codes, rest = (rest + chunk.replace('\n', '')).split(MEASURE_SEPARATOR)
+        yield from measure_codes
+    yield rest
+
+
+class Transcoder:
+    # Decodes measures with the decoder of one encoding and encodes them with the encoder of another.
+    # Chords that the target encoding has no code for are reported and left out. Codes that
+    # don't decode are reported by the source decoder and written as "?".
+    def __init__(self, source: str, target: str, context: Optional[SettingsContext] = None):
+        self.source_context = get_encoding_context(source, context)
+        self.target_context = get_encoding_context(target, context)
+
+    def transcode_measure(self, measure_code: str) -> str:
+        with use_context(self.source_context):
+            chords = self.source_context.decoder.decode_measure(measure_code) or []
+        with use_context(self.target_context):
+            encoder = self.target_context.encoder
+            try:
+                return encoder.encode_measure(chords)
+            except KeyError:
+                pass
+            codes = []
+            for chord in chords:
+                try:
+                    codes.append(encoder.encode_measure([chord]))
+                except KeyError:
+                    detail = chord.to_symbol() if isinstance(chord, Chord) else str(chord)
+                    diagnostics.report(diagnostics.ENCODE_ERROR, detail)
+            return ''.join(codes)
+
+    def iter_transcoded(self, measure_codes: Iterable[str]) -> Iterator[str]:
+        collector = diagnostics.get_collector()
+        for i, measure_code in enumerate(measure_codes):
+            if collector is not None:
+                collector.measure = i
+            yield self.transcode_measure(measure_code)
+            count('measures transcoded')
+
+    def transcode(self, text: str) -> str:
+        return MEASURE_SEPARATOR.join(self.iter_transcoded(text.replace('\n', '').split(MEASURE_SEPARATOR)))
+
+
+def transcode(text: str, source: str, target: str, context: Optional[SettingsContext] = None) -> str:
+    return Transcoder(source, target, context).transcode(text)
+
+
+@dataclass
+class TranscodedFile:
+    path: str
+    output_path: str
+    n_measures: int
+    diagnostics: list[diagnostics.Diagnostic]
+
+
+def transcode_file(args) -> TranscodedFile:
+    path, output_path, source, target = args
+    transcoder = Transcoder(source, target)
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    n_measures = 0
+    with diagnostics.collecting(str(path)) as collector:
+        with open(path, encoding='utf-8') as f, open(output_path, 'w', encoding='utf-8') as output:
+            for i, measure_code in enumerate(transcoder.iter_transcoded(iter_measure_codes(f))):
+                if i:
+                    output.write(MEASURE_SEPARATOR)
+                output.write(measure_code)
+                n_measures += 1
+    return TranscodedFile(str(path), str(output_path), n_measures, collector.diagnostics)
+
+
+@traced()
+def transcode_files(
+        input_path: Path,
+        output_path: Path,
+        source: str,
+        target: str,
+        context: Optional[SettingsContext] = None,
+        workers: Optional[int] = None,
+) -> list[TranscodedFile]:
+    # a file of chord codes to output_path, or every .txt file in a directory to the same place in
+    # the directory output_path, in worker processes
+    input_path, output_path = Path(input_path), Path(output_path)
+    if input_path.is_dir():
+        args = [
+            (path, output_path / path.relative_to(input_path), source, target)
+            for path in iter_song_paths(input_path, CODES_SUFFIX)
+        ]
+    else:
+        args = [(input_path, output_path, source, target)]
+    return list(parallel_map(transcode_file, args, context, workers))
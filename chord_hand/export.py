@@ -6,6 +6,9 @@ from pathlib import Path
 
 from PyQt6.QtWidgets import QFileDialog
 
+from chord_hand.timeline import Timeline, TimelineIndex
+from chord_hand.trace import traced
+
 
 def get_export_path(initial='Untitled', name_filter='*.txt'):
     return QFileDialog.getSaveFileName(
@@ -40,6 +43,7 @@ def export_tilia_csv(chords, regions, analyses):
     export_csv(get_tilia_csv_data(chords, regions, analyses))
 
 
+@traced()
 def get_standard_text_data(chords, regions, analyses):
     data = 'CHORDS: '
     for measure in chords:
@@ -66,6 +70,7 @@ def get_standard_text_data(chords, regions, analyses):
     return data
 
 
+@traced()
 def get_standard_csv_data(chords, regions, analyses):
     # each iteration is a measure
     data = [['root', 'bass', 'quality', 'tonic', 'mode', 'analysis', 'position']]
@@ -82,17 +87,39 @@ def get_standard_csv_data(chords, regions, analyses):
     return data
 
 
-def get_tilia_csv_data(chords, regions, analyses) -> list[list[str]]:
-    data = [['measure', 'fraction', 'label', 'region', 'analyses']]
+@traced()
+def get_tilia_csv_data(chords, regions, analyses, timeline=None) -> list[list[str]]:
+    # With a timeline, fractions follow its meters and durations, and the time of each chord
+    # in seconds is added.
+    index = TimelineIndex(chords, timeline) if timeline else None
+    data = [['measure', 'fraction', 'label', 'region', 'analyses'] + (['time'] if index else [])]
+    k = 0
     for i, (cs, region, ans) in enumerate(
             itertools.zip_longest(chords, regions, analyses)):
         for j, chord in enumerate(cs):
-            data.append([
+            row = [
                 i + 1,
                 str((j / len(cs)) % 1),
                 chord.to_symbol() if chord else '',
                 region.tonic.to_symbol() if region else '',
                 " ".join([a.to_symbol() for a in ans]) if (ans and region) else '',
-                ])
+                ]
+            if index:
+                measure_start, measure_end = index.measure_starts[i], index.get_measure_end(i)
+                row[1] = str((index.starts[k] - measure_start) / (measure_end - measure_start))
+                row.append(index.to_seconds(index.starts[k]))
+            data.append(row)
+            k += 1
     return data
 
+
+@traced()
+def get_audio_labels_data(chords, timeline: Timeline = None) -> str:
+    # start, end and symbol of each chord in seconds, as the label tracks of audio editors
+    index = TimelineIndex(chords, timeline)
+    lines = []
+    for chord_time in index.iter_chord_times():
+        chord = chords[chord_time.measure][chord_time.index]
+        symbol = chord.to_symbol() if chord else ''
+        lines.append(f'{chord_time.start_seconds:.6f}\t{chord_time.end_seconds:.6f}\t{symbol}\n')
+    return ''.join(lines)
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, TextIO, Union
+
+from chord_hand import diagnostics
+from chord_hand.analysis import HarmonicAnalysis
+from chord_hand.analysis.alternatives import get_alternatives
+from chord_hand.analysis.harmonic_region import HarmonicRegion
+from chord_hand.analysis.modality import Modality
+from chord_hand.chord.chord import Chord
+from chord_hand.chord.note import STEP_TO_NAME, Note
+from chord_hand.chord.symbol_parser import get_note_names, get_parser
+from chord_hand.corpus import iter_song_paths, parallel_map
+from chord_hand.export import get_export_path
+from chord_hand.settings import SettingsContext
+from chord_hand.song import Song
+from chord_hand.trace import traced
+
+CHORD_SPINE = '**mxhm'
+ANALYSIS_SPINE = '**harm'
+REGION_SPINE = '**region'
+SPINES = (CHORD_SPINE, ANALYSIS_SPINE, REGION_SPINE)
+TITLE_RECORD = '!!!OTL:'
+NULL_TOKEN = '.'
+BARLINE = '='
+FINAL_BARLINE = '=='
+SPINE_TERMINATOR = '*-'
+HUMDRUM_SUFFIX = '.krn'
+# Humdrum writes flats with "-" in key interpretations, e.g. *B-: for Bb major and *b-: for Bb minor
+CHROMA_TO_KEY_SIGN = {-2: '--', -1: '-', 0: '', 1: '#', 2: '##'}
+KEY_SIGN_TO_CHROMA = {sign: chroma for chroma, sign in CHROMA_TO_KEY_SIGN.items()}
+NOTE_NAME_TO_STEP_CHROMA = get_note_names()
+
+
+def region_to_key_interpretation(region: HarmonicRegion) -> str:
+    name = STEP_TO_NAME[region.tonic.step] + CHROMA_TO_KEY_SIGN[region.tonic.chroma]
+    return f'*{name.lower() if region.modality == Modality.MINOR else name}:'
+
+
+def symbol_to_region(symbol: str) -> Optional[HarmonicRegion]:
+    # inverse of HarmonicRegion.to_symbol, e.g. "Bbm"
+    modality = Modality.MINOR if symbol.endswith('m') else Modality.MAJOR
+    name = symbol[:-1] if modality == Modality.MINOR else symbol
+    if name not in NOTE_NAME_TO_STEP_CHROMA:
+        return None
+    return HarmonicRegion(Note(*NOTE_NAME_TO_STEP_CHROMA[name]), modality)
+
+
+def key_interpretation_to_region(token: str) -> Optional[HarmonicRegion]:
+    name = token[1:-1]
+    if not name or name[0].upper() not in NOTE_NAME_TO_STEP_CHROMA or name[1:] not in KEY_SIGN_TO_CHROMA:
+        return None
+    step, _ = NOTE_NAME_TO_STEP_CHROMA[name[0].upper()]
+    modality = Modality.MINOR if name[0].islower() else Modality.MAJOR
+    return HarmonicRegion(Note(step, KEY_SIGN_TO_CHROMA[name[1:]]), modality)
+
+
+def is_key_interpretation(token: str) -> bool:
+    return len(token) > 2 and token[0] == '*' and token[-1] == ':'
+
+
+# Export
+
+def iter_humdrum_lines(song: Song, title: str = '') -> Iterator[str]:
+    # A piece with a spine of chord symbols, one of analysis symbols and one of regions, with a
+    # barline for each measure and key interpretations where regions change. Measures without
+    # chords get a line of null chord and analysis, so that their region is kept.
+    def record(token):
+        return '\t'.join([token] * len(SPINES)) + '\n'
+
+    if title:
+        yield f'{TITLE_RECORD} {title}\n'
+    yield '\t'.join(SPINES) + '\n'
+    previous_region = None
+    for i, (chords, region, analyses) in enumerate(zip(song.chords, song.regions, song.analyses)):
+        yield record(f'{BARLINE}{i + 1}')
+        if region and region != previous_region:
+            yield record(region_to_key_interpretation(region))
+            previous_region = region
+        region_token = region.to_symbol() if region else NULL_TOKEN
+        chords = [chord for chord in chords if isinstance(chord, Chord)]
+        if not chords:
+            yield f'{NULL_TOKEN}\t{NULL_TOKEN}\t{region_token}\n'
+        for j, chord in enumerate(chords):
+            analysis = analyses[j] if j < len(analyses) else None
+            analysis_token = analysis.to_symbol() if isinstance(analysis, HarmonicAnalysis) else None
+            yield f'{chord.to_symbol() or NULL_TOKEN}\t{analysis_token or NULL_TOKEN}\t{region_token}\n'
+    yield record(FINAL_BARLINE)
+    yield record(SPINE_TERMINATOR)
+
+
+def write_humdrum(f: TextIO, songs: Iterable[tuple[str, Song]]):
+    # several pieces in a file, one after another
+    for title, song in songs:
+        f.writelines(iter_humdrum_lines(song, title))
+
+
+def export_humdrum(chords, regions, analyses):
+    path, success = get_export_path(name_filter=f'*{HUMDRUM_SUFFIX}')
+    if success:
+        with open(path, 'w', encoding='utf-8') as f:
+            write_humdrum(f, [(Path(path).stem, Song(chords, regions, analyses))])
+
+
+def get_song_lines(path: Path) -> str:
+    return ''.join(iter_humdrum_lines(Song.load(path), Path(path).stem))
+
+
+@traced()
+def export_corpus(
+        corpus_dir: Path,
+        output_path: Path,
+        context: Optional[SettingsContext] = None,
+        workers: Optional[int] = None,
+) -> int:
+    # writes every JSON song in corpus_dir to a single multi-piece file, in path order.
+    # Returns the number of songs.
+    n_songs = 0
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for text in parallel_map(get_song_lines, iter_song_paths(corpus_dir), context, workers):
+            f.write(text)
+            n_songs += 1
+    return n_songs
+
+
+# Import
+
+class _Piece:
+    def __init__(self, title: str, spines: list[str]):
+        self.title = title
+        self.columns = [spines.index(spine) if spine in spines else None for spine in SPINES]
+        self.chords = []
+        self.regions = []
+        self.analysis_tokens = []
+        self.region = None  # from key interpretations, for files without a region spine
+
+    def get_token(self, tokens: list[str], spine: int) -> str:
+        column = self.columns[spine]
+        if column is None or column >= len(tokens):
+            return NULL_TOKEN
+        return tokens[column]
+
+    def start_measure(self):
+        self.chords.append([])
+        self.regions.append(self.region)
+        self.analysis_tokens.append([])
+
+    def add_data(self, tokens: list[str], context: Optional[SettingsContext] = None):
+        if not self.chords:
+            self.start_measure()
+        if collector := diagnostics.get_collector():
+            collector.measure = len(self.chords) - 1
+
+        region_token = self.get_token(tokens, 2)
+        if region_token != NULL_TOKEN:
+            if region := symbol_to_region(region_token):
+                self.regions[-1] = region
+            else:
+                diagnostics.report(diagnostics.UNKNOWN_SYMBOL, region_token)
+
+        chord_token = self.get_token(tokens, 0)
+        if chord_token != NULL_TOKEN and (chord := get_parser(context).parse(chord_token)):
+            self.chords[-1].append(chord)
+            self.analysis_tokens[-1].append(self.get_token(tokens, 1))
+
+    def to_song(self, context: Optional[SettingsContext] = None) -> Song:
+        # Analyses are those of the analytic types whose symbols are in the analysis spine.
+        # Measures where they are not the default analyses are locked, so they aren't reanalyzed.
+        song = Song(self.chords, self.regions)
+        song.analyze(context)
+        for i, (chords, tokens) in enumerate(zip(song.chords, self.analysis_tokens)):
+            for j, (chord, token) in enumerate(zip(chords, tokens)):
+                if token == NULL_TOKEN:
+                    continue
+                alternatives = get_alternatives(chord, song.regions[i], context=context)
+                if alternatives is None or alternatives.default.to_symbol() == token:
+                    continue
+                matching = next((a for a in alternatives.ranked if a.to_symbol() == token), None)
+                if matching is None:
+                    diagnostics.report(diagnostics.ANALYSIS_ERROR, f'{chord.to_symbol()} {token}')
+                    continue
+                song.analyses[i][j] = matching
+                song.analytic_type_locked[i] = True
+        return song
+
+
+def iter_humdrum_songs(lines: Iterable[str], context: Optional[SettingsContext] = None) -> Iterator[tuple[str, Song]]:
+    # (title, song) of each piece, as soon as its spines are terminated. Spines other than those
+    # of iter_humdrum_lines are ignored, and key interpretations give the regions of files
+    # without a region spine.
+    title = ''
+    piece = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line:
+            continue
+        if line.startswith(TITLE_RECORD):
+            title = line[len(TITLE_RECORD):].strip()
+            continue
+        if line.startswith('!'):
+            continue
+
+        tokens = line.split('\t')
+        if tokens[0].startswith('**'):
+            piece = _Piece(title, tokens)
+            title = ''
+        elif piece is None:
+            continue
+        elif tokens[0] == SPINE_TERMINATOR:
+            yield piece.title, piece.to_song(context)
+            piece = None
+        elif tokens[0].startswith(BARLINE):
+            if not tokens[0].startswith(FINAL_BARLINE):
+                piece.start_measure()
+        elif tokens[0].startswith('*'):
+            if key := next((token for token in tokens if is_key_interpretation(token)), None):
+                piece.region = key_interpretation_to_region(key)
+                if piece.regions:
+                    piece.regions[-1] = piece.region
+        else:
+            piece.add_data(tokens, context)
+
+
+def read_humdrum(path: Union[str, Path], context: Optional[SettingsContext] = None) -> list[tuple[str, Song]]:
+    with open(path, encoding='utf-8') as f:
+        return list(iter_humdrum_songs(f, context))
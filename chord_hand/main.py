@@ -5,19 +5,15 @@ from PyQt6.QtWidgets import QApplication
 
 from chord_hand import ui
 from chord_hand.ui import MainWindow
-from chord_hand.settings import init_decoder_and_encoder, init_chord_symbols, init_chordal_type, init_keymap, \
-    init_default_analyses, init_analytic_types, init_projeto_mpb_function_codes, init_exporters
+from chord_hand.settings import load_context, set_default_context
+from chord_hand.trace import traced
 
 
+@traced()
 def init_settings():
-    init_decoder_and_encoder()
-    init_exporters()
-    init_chord_symbols()
-    init_chordal_type()
-    init_keymap()
-    init_default_analyses()
-    init_analytic_types()
-    init_projeto_mpb_function_codes()
+    context = load_context()
+    set_default_context(context)
+    return context
 
 
 def main():
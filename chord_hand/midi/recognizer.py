@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterable, Optional
+
+from chord_hand.chord.chord import Chord
+from chord_hand.chord.note import Note
+from chord_hand.chord.pitch_class import get_quality_mask, rotate
+from chord_hand.midi.smf import MidiFile, NoteEvent, read_midi_file
+from chord_hand.settings import SettingsContext, get_context
+from chord_hand.trace import traced
+
+N_PITCH_CLASS_SETS = 4096
+MAX_CANDIDATES = 12  # per pitch class set, enough to have one in each possible bass
+DRUM_CHANNEL = 9
+EXTENSION_FIELDS = ('ninth', 'eleventh', 'thirteenth', 'second', 'fourth', 'sixth')
+PITCH_CLASS_TO_NOTE = [
+    Note(0, 0), Note(1, -1), Note(1, 0), Note(2, -1), Note(2, 0), Note(3, 0),
+    Note(3, 1), Note(4, 0), Note(5, -1), Note(5, 0), Note(6, -1), Note(6, 0),
+]
+
+
+def get_simplicity(quality, symbol: str) -> tuple:
+    # lower is simpler: fewer extensions, then no altered fifth, then a shorter symbol
+    n_extensions = sum(1 for field in EXTENSION_FIELDS if getattr(quality, field))
+    return n_extensions, quality.fifth not in ('p', ''), len(symbol)
+
+
+class RecognitionTable:
+    # Candidates (root pitch class, quality) of each of the 4096 pitch class sets, simplest first.
+    # Sets that are not the pitch classes of any quality get the candidates of their largest subsets
+    # that are, so that e.g. a doubled or added note doesn't prevent recognition.
+    # Tables are built for a context and must be rebuilt when its settings change.
+    def __init__(self, context: Optional[SettingsContext] = None, require_key: bool = True):
+        # qualities need a code in the active encoding to be entered into a cell through the encoder
+        context = context or get_context()
+        self.context = context
+        ranked = []
+        for quality, symbol in context.chord_quality_to_symbol.items():
+            if require_key and not context.encoder.can_encode_quality(quality, context):
+                continue
+            if mask := get_quality_mask(quality):
+                ranked.append((get_simplicity(quality, symbol), mask, quality))
+        ranked.sort(key=lambda x: x[0])
+
+        # candidates are (rank, root, quality) while building, so that merged lists can be sorted again
+        candidates = [[] for _ in range(N_PITCH_CLASS_SETS)]
+        for rank, (_, mask, quality) in enumerate(ranked):
+            for root in range(12):
+                candidates[rotate(mask, root)].append((rank, root, quality))
+
+        for pitch_classes in sorted(range(N_PITCH_CLASS_SETS), key=int.bit_count):
+            if candidates[pitch_classes] or pitch_classes.bit_count() < 3:
+                continue
+            subsets = [pitch_classes & ~(1 << pc) for pc in range(12) if pitch_classes >> pc & 1]
+            merged = {c[:2]: c for subset in subsets for c in candidates[subset]}
+            candidates[pitch_classes] = sorted(merged.values(), key=lambda c: c[:2])[:MAX_CANDIDATES]
+
+        self.candidates = [[(root, quality) for _, root, quality in entry] for entry in candidates]
+
+    def lookup(self, pitch_classes: int, bass: Optional[int] = None) -> Optional[tuple[int, object]]:
+        # root position is preferred over simplicity
+        candidates = self.candidates[pitch_classes]
+        if not candidates:
+            return None
+        if bass is not None:
+            for root, quality in candidates:
+                if root == bass:
+                    return root, quality
+        return candidates[0]
+
+
+def to_pitch_class_set(notes: Iterable[int]) -> int:
+    mask = 0
+    for note in notes:
+        mask |= 1 << note % 12
+    return mask
+
+
+class ChordRecognizer:
+    # Turns MIDI notes into chords. Each event only updates the set of held notes and, at most, looks up
+    # one entry of the table, so the time per event doesn't depend on what was played before.
+    def __init__(self, table: Optional[RecognitionTable] = None):
+        self.table = table or RecognitionTable()
+        self.held = set()
+        self.gathered = set()  # every note held since all notes were last released
+
+    def recognize(self, notes: Iterable[int]) -> Optional[Chord]:
+        notes = list(notes)
+        if not notes:
+            return None
+        bass = min(notes) % 12
+        result = self.table.lookup(to_pitch_class_set(notes), bass)
+        if result is None:
+            return None
+        root, quality = result
+        # a bass that is not in the chord (i.e. from a subset match) is left out
+        if not rotate(get_quality_mask(quality), root) >> bass & 1:
+            bass = root
+        return Chord(PITCH_CLASS_TO_NOTE[root], quality, PITCH_CLASS_TO_NOTE[bass])
+
+    def feed(self, event: NoteEvent) -> Optional[Chord]:
+        # the chord is given when every note is released, so notes can be played one after another
+        if event.channel == DRUM_CHANNEL:
+            return None
+        if event.is_on:
+            self.held.add(event.note)
+            self.gathered.add(event.note)
+            return None
+
+        self.held.discard(event.note)
+        if self.held or not self.gathered:
+            return None
+        chord = self.recognize(self.gathered)
+        self.gathered = set()
+        return chord
+
+    def reset(self):
+        self.held = set()
+        self.gathered = set()
+
+
+@traced()
+def recognize_midi_file(midi_file: MidiFile, table: Optional[RecognitionTable] = None) -> list[list[Chord]]:
+    # The chord sounding at each onset, grouped in the measures of the file's time signatures.
+    # Onsets at the same tick are taken together and a chord repeated in a measure is merged.
+    # Measures without onsets repeat the chord before them.
+    recognizer = ChordRecognizer(table)
+    measures = []
+    held = set()
+    previous = None
+    has_onset = False
+    events = [event for event in midi_file.events if event.channel != DRUM_CHANNEL]
+    for i, event in enumerate(events):
+        if event.is_on:
+            held.add(event.note)
+            has_onset = True
+        else:
+            held.discard(event.note)
+
+        if i + 1 < len(events) and events[i + 1].tick == event.tick or not has_onset:
+            continue
+        has_onset = False
+
+        chord = recognizer.recognize(held)
+        measure = midi_file.get_measure(event.tick)
+        if chord is None or measure < len(measures) and measures[measure][-1:] == [chord]:
+            continue
+        while len(measures) <= measure:
+            measures.append([previous] if previous and len(measures) < measure else [])
+        measures[measure].append(chord)
+        previous = chord
+
+    return measures
+
+
+def read_chords(path: Path, table: Optional[RecognitionTable] = None) -> list[list[Chord]]:
+    return recognize_midi_file(read_midi_file(path), table)
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import bisect
+import heapq
+from dataclasses import dataclass
+from pathlib import Path
+
+DEFAULT_TEMPO = 500_000  # microseconds per quarter note, i.e. 120 bpm
+DEFAULT_TIME_SIGNATURE = (4, 4)
+
+# data bytes of channel messages, by the high nibble of the status byte
+STATUS_TO_N_DATA_BYTES = {0x80: 2, 0x90: 2, 0xA0: 2, 0xB0: 2, 0xC0: 1, 0xD0: 1, 0xE0: 2}
+
+META_END_OF_TRACK = 0x2F
+META_TEMPO = 0x51
+META_TIME_SIGNATURE = 0x58
+
+
+class MidiFileError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class NoteEvent:
+    time: float  # seconds
+    note: int  # MIDI note number
+    is_on: bool
+    velocity: int = 0
+    channel: int = 0
+    tick: int = 0
+
+
+@dataclass
+class MidiFile:
+    ticks_per_beat: int
+    events: list[NoteEvent]  # sorted by time
+    tempo_changes: list[tuple[int, int]]  # (tick, microseconds per quarter note)
+    time_signatures: list[tuple[int, int, int]]  # (tick, numerator, denominator)
+
+    def __post_init__(self):
+        # ticks at which each time signature starts, with the number of the measure it starts on
+        self._signature_ticks = []
+        self._signature_measures = []
+        measure = 0
+        previous_tick, previous_length = 0, None
+        for tick, numerator, denominator in self.time_signatures:
+            if previous_length:
+                measure += -(-(tick - previous_tick) // previous_length)
+            self._signature_ticks.append(tick)
+            self._signature_measures.append(measure)
+            previous_tick, previous_length = tick, self.get_measure_length(numerator, denominator)
+
+    def get_measure_length(self, numerator: int, denominator: int) -> int:
+        return self.ticks_per_beat * 4 * numerator // denominator
+
+    def get_measure(self, tick: int) -> int:
+        i = bisect.bisect_right(self._signature_ticks, tick) - 1
+        start, numerator, denominator = self.time_signatures[i]
+        return self._signature_measures[i] + (tick - start) // self.get_measure_length(numerator, denominator)
+
+
+class _Reader:
+    def __init__(self, data: bytes, position: int = 0, end: int = None):
+        self.data = data
+        self.position = position
+        self.end = len(data) if end is None else end
+
+    def read(self, n: int) -> bytes:
+        if self.position + n > self.end:
+            raise MidiFileError('Unexpected end of data')
+        result = self.data[self.position:self.position + n]
+        self.position += n
+        return result
+
+    def read_byte(self) -> int:
+        return self.read(1)[0]
+
+    def read_int(self, n: int) -> int:
+        return int.from_bytes(self.read(n), 'big')
+
+    def read_variable_length(self) -> int:
+        value = 0
+        for _ in range(4):
+            byte = self.read_byte()
+            value = value << 7 | byte & 0x7F
+            if not byte & 0x80:
+                return value
+        raise MidiFileError('Variable-length quantity is too long')
+
+    def at_end(self) -> bool:
+        return self.position >= self.end
+
+
+def _iter_chunks(data: bytes):
+    reader = _Reader(data)
+    while not reader.at_end():
+        chunk_type = reader.read(4)
+        length = reader.read_int(4)
+        yield chunk_type, _Reader(data, reader.position, reader.position + length)
+        reader.read(length)
+
+
+def _parse_track(reader: _Reader):
+    # yields (tick, kind, data) with kind 'note' (note, velocity, channel), 'tempo' or 'time_signature'
+    tick = 0
+    status = None
+    while not reader.at_end():
+        tick += reader.read_variable_length()
+        byte = reader.read_byte()
+        if byte == 0xFF:
+            meta_type = reader.read_byte()
+            data = reader.read(reader.read_variable_length())
+            if meta_type == META_END_OF_TRACK:
+                return
+            elif meta_type == META_TEMPO and len(data) == 3:
+                yield tick, 'tempo', int.from_bytes(data, 'big')
+            elif meta_type == META_TIME_SIGNATURE and len(data) >= 2:
+                yield tick, 'time_signature', (data[0], 2 ** data[1])
+            continue
+        if byte in (0xF0, 0xF7):  # sysex
+            reader.read(reader.read_variable_length())
+            continue
+
+        if byte & 0x80:
+            status = byte
+            data = []
+        elif status is None:
+            raise MidiFileError('Data byte without a status byte')
+        else:  # running status
+            data = [byte]
+
+        kind = status & 0xF0
+        if kind not in STATUS_TO_N_DATA_BYTES:
+            raise MidiFileError(f'Unknown status byte: {status:#x}')
+        data += list(reader.read(STATUS_TO_N_DATA_BYTES[kind] - len(data)))
+        if kind in (0x80, 0x90):
+            note, velocity = data
+            is_on = kind == 0x90 and velocity > 0
+            yield tick, 'note', (note, velocity if is_on else 0, status & 0x0F)
+
+
+def parse_midi(data: bytes) -> MidiFile:
+    chunks = list(_iter_chunks(data))
+    if not chunks or chunks[0][0] != b'MThd':
+        raise MidiFileError('Not a Standard MIDI File')
+
+    header = chunks[0][1]
+    midi_format, _, division = header.read_int(2), header.read_int(2), header.read_int(2)
+    if division & 0x8000:
+        raise MidiFileError('SMPTE time division is not supported')
+    if midi_format not in (0, 1):
+        raise MidiFileError(f'MIDI file format {midi_format} is not supported')
+
+    tracks = [list(_parse_track(reader)) for chunk_type, reader in chunks[1:] if chunk_type == b'MTrk']
+    # merges tracks by tick, keeping the order of events within each track
+    merged = heapq.merge(*[[(tick, i, j, kind, data) for j, (tick, kind, data) in enumerate(track)]
+                           for i, track in enumerate(tracks)])
+
+    tempo_changes = []
+    time_signatures = []
+    events = []
+    tempo, tempo_tick, tempo_time = DEFAULT_TEMPO, 0, 0.0
+    for tick, _, _, kind, data in merged:
+        time = tempo_time + (tick - tempo_tick) * tempo / division / 1_000_000
+        if kind == 'tempo':
+            tempo, tempo_tick, tempo_time = data, tick, time
+            tempo_changes.append((tick, data))
+        elif kind == 'time_signature':
+            if time_signatures and time_signatures[-1][0] == tick:
+                time_signatures.pop()
+            time_signatures.append((tick, *data))
+        else:
+            note, velocity, channel = data
+            events.append(NoteEvent(time, note, velocity > 0, velocity, channel, tick))
+
+    if not time_signatures or time_signatures[0][0] > 0:
+        time_signatures.insert(0, (0, *DEFAULT_TIME_SIGNATURE))
+    return MidiFile(division, events, tempo_changes, time_signatures)
+
+
+def read_midi_file(path: Path) -> MidiFile:
+    with open(path, 'rb') as f:
+        return parse_midi(f.read())
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import queue
+import time
+from pathlib import Path
+from typing import Callable, Protocol
+
+from chord_hand.midi.smf import NoteEvent, read_midi_file
+
+
+class EventSource(Protocol):
+    # Where live MIDI notes come from, e.g. a keyboard. poll is called from the UI thread and must not block.
+    def poll(self) -> list[NoteEvent]:
+        ...
+
+    def close(self):
+        ...
+
+
+class QueueEventSource:
+    # A source that other threads, or tests, put events into
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+
+    def put(self, event: NoteEvent):
+        self.queue.put(event)
+
+    def poll(self) -> list[NoteEvent]:
+        events = []
+        while True:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                return events
+
+    def close(self):
+        pass
+
+
+class FileEventSource:
+    # Plays the notes of a Standard MIDI File back in real time, standing in for a keyboard
+    def __init__(self, path: Path, clock: Callable[[], float] = time.monotonic):
+        self.events = read_midi_file(path).events
+        self.clock = clock
+        self.start = clock()
+        self.position = 0
+
+    def poll(self) -> list[NoteEvent]:
+        elapsed = self.clock() - self.start
+        end = self.position
+        while end < len(self.events) and self.events[end].time <= elapsed:
+            end += 1
+        events = self.events[self.position:end]
+        self.position = end
+        return events
+
+    def is_finished(self) -> bool:
+        return self.position == len(self.events)
+
+    def close(self):
+        self.position = len(self.events)
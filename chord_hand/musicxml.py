@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import contextlib
+import functools
+import math
+import xml.etree.ElementTree as ET
+import zipfile
+from pathlib import Path
+from typing import IO, Iterator, Optional, Union
+from xml.sax.saxutils import escape, quoteattr
+
+from chord_hand import diagnostics
+from chord_hand.chord.chord import Chord
+from chord_hand.chord.note import STEP_TO_NAME, Note
+from chord_hand.chord.quality import ChordQuality, CustomChordQuality
+from chord_hand.export import get_export_path
+from chord_hand.settings import SettingsContext, cached_per_context, get_context
+from chord_hand.trace import traced
+
+MUSICXML_VERSION = '4.0'
+BEATS_PER_MEASURE = 4  # exported measures are in 4/4, with the chords of a measure evenly spaced
+COMPRESSED_SUFFIX = '.mxl'
+CONTAINER_PATH = 'META-INF/container.xml'
+NAME_TO_STEP = {name: step for step, name in STEP_TO_NAME.items() if step >= 0}
+QUALITY_FIELDS = ('third', 'fifth', 'seventh', 'ninth', 'eleventh', 'thirteenth', 'second', 'fourth', 'sixth')
+
+# qualities of the values of <kind>, as in ChordQuality.to_string
+KIND_TO_QUALITY_STRING = {
+    'major': 'Mp_______',
+    'minor': 'mp_______',
+    'augmented': 'MA_______',
+    'diminished': 'md_______',
+    'dominant': 'Mpm______',
+    'major-seventh': 'MpM______',
+    'minor-seventh': 'mpm______',
+    'diminished-seventh': 'mdd______',
+    'augmented-seventh': 'MAm______',
+    'half-diminished': 'mdm______',
+    'major-minor': 'mpM______',
+    'major-sixth': 'Mp______M',
+    'minor-sixth': 'mp______M',
+    'dominant-ninth': 'MpmM_____',
+    'major-ninth': 'MpMM_____',
+    'minor-ninth': 'mpmM_____',
+    'dominant-11th': 'MpmMp____',
+    'major-11th': 'MpMMp____',
+    'minor-11th': 'mpmMp____',
+    'dominant-13th': 'MpmMpM___',
+    'major-13th': 'MpMMpM___',
+    'minor-13th': 'mpmMpM___',
+    'suspended-second': '______p__',  # the default chord symbols have no fifth in suspended chords
+    'suspended-fourth': '_______p_',
+    'power': '_p_______',
+}
+NO_CHORD_KIND = 'none'
+OTHER_KIND = 'other'
+
+# <degree-value> to field, and <degree-alter> to the value of the field
+DEGREE_TO_FIELD = {
+    2: 'second', 3: 'third', 4: 'fourth', 5: 'fifth', 6: 'sixth', 7: 'seventh',
+    9: 'ninth', 11: 'eleventh', 13: 'thirteenth',
+}
+PERFECT_DEGREES = {4, 5, 11}
+PERFECT_ALTER_TO_VALUE = {-1: 'd', 0: 'p', 1: 'A'}
+MAJOR_ALTER_TO_VALUE = {-2: 'd', -1: 'm', 0: 'M', 1: 'A'}
+SECOND_ALTER_TO_VALUE = {0: 'p'}  # the default chord symbols write sus2 with 'p'
+
+
+def get_value(degree: int, alter: int) -> Optional[str]:
+    if degree == 2:
+        return SECOND_ALTER_TO_VALUE.get(alter)
+    alter_to_value = PERFECT_ALTER_TO_VALUE if degree in PERFECT_DEGREES else MAJOR_ALTER_TO_VALUE
+    return alter_to_value.get(alter)
+
+
+def get_alter(degree: int, value: str) -> int:
+    if degree == 2:
+        return 0
+    alter_to_value = PERFECT_ALTER_TO_VALUE if degree in PERFECT_DEGREES else MAJOR_ALTER_TO_VALUE
+    return next(alter for alter, v in alter_to_value.items() if v == value)
+
+
+FIELD_TO_DEGREE = {field: degree for degree, field in DEGREE_TO_FIELD.items()}
+
+
+@cached_per_context
+def get_quality_to_quality(context: SettingsContext) -> dict:
+    # the qualities of the settings, so that imported chords share them
+    return {quality: quality for quality in context.chord_quality_to_symbol}
+
+
+# Import
+
+def harmony_to_chord(harmony: ET.Element, context: Optional[SettingsContext] = None) -> Optional[Chord]:
+    # None for "N.C." and for harmonies without a root, e.g. functional ones
+    root = harmony.find('root')
+    kind_element = harmony.find('kind')
+    kind = kind_element.text.strip() if kind_element is not None and kind_element.text else OTHER_KIND
+    if root is None or kind == NO_CHORD_KIND:
+        return None
+
+    try:
+        root_note = element_to_note(root, 'root')
+        bass = harmony.find('bass')
+        bass_note = element_to_note(bass, 'bass') if bass is not None else None
+    except (KeyError, ValueError):
+        diagnostics.report(diagnostics.UNKNOWN_SYMBOL, ET.tostring(harmony, encoding='unicode').strip())
+        return None
+
+    quality = get_quality(kind, harmony.findall('degree'), context)
+    if quality is None:
+        text = kind_element.get('text') if kind_element is not None else None
+        detail = text or kind
+        diagnostics.report(diagnostics.UNKNOWN_SYMBOL, detail)
+        quality = CustomChordQuality(detail)
+    return Chord(root_note, quality, bass_note)
+
+
+def element_to_note(element: ET.Element, prefix: str) -> Note:
+    step = NAME_TO_STEP[element.findtext(f'{prefix}-step', '').strip()]
+    alter = element.findtext(f'{prefix}-alter')
+    return Note(step, round(float(alter)) if alter else 0)
+
+
+def get_quality(kind: str, degrees: list[ET.Element], context: Optional[SettingsContext] = None):
+    # the quality of the settings with the fields of kind changed by degrees, or None
+    if kind not in KIND_TO_QUALITY_STRING:
+        return None
+    fields = dict(zip(QUALITY_FIELDS, KIND_TO_QUALITY_STRING[kind]))
+    for degree in degrees:
+        try:
+            number = int(degree.findtext('degree-value', '').strip())
+            alter = round(float(degree.findtext('degree-alter', '0').strip() or 0))
+        except ValueError:
+            return None
+        field = DEGREE_TO_FIELD.get(number)
+        if field is None:
+            return None
+        if degree.findtext('degree-type', '').strip() == 'subtract':
+            fields[field] = '_'
+        elif (value := get_value(number, alter)) is not None:
+            fields[field] = value
+        else:
+            return None
+    quality = ChordQuality.from_string(''.join(fields[field] for field in QUALITY_FIELDS))
+    return get_quality_to_quality(context).get(quality)
+
+
+@contextlib.contextmanager
+def open_score(source: Union[str, Path, IO[bytes]]) -> Iterator[IO[bytes]]:
+    # .mxl files are zip archives whose container names the score. Open files are left open.
+    if not isinstance(source, (str, Path)):
+        yield source
+        return
+    path = Path(source)
+    if path.suffix != COMPRESSED_SUFFIX:
+        with open(path, 'rb') as f:
+            yield f
+        return
+    with zipfile.ZipFile(path) as archive:
+        container = ET.fromstring(archive.read(CONTAINER_PATH))
+        rootfile = container.find('.//{*}rootfile')
+        with archive.open(rootfile.get('full-path')) as f:
+            yield f
+
+
+@traced()
+def read_musicxml(source: Union[str, Path, IO[bytes]], context: Optional[SettingsContext] = None) -> list[list[Chord]]:
+    # The chords of the <harmony> elements of the first part that has any, by measure.
+    # Elements are cleared as soon as they are read, so memory doesn't grow with the size of the score.
+    part_to_measures = {}
+    part = measures = None
+    chords = []
+    collector = diagnostics.get_collector()
+    with open_score(source) as f:
+        for event, element in ET.iterparse(f, events=('start', 'end')):
+            tag = element.tag.rpartition('}')[2]
+            if event == 'start':
+                if tag == 'part':
+                    part = element
+                    measures = part_to_measures.setdefault(element.get('id'), [])
+                elif tag == 'measure' and collector is not None:
+                    collector.measure = len(measures)
+                continue
+            if tag == 'harmony':
+                if chord := harmony_to_chord(element, context):
+                    chords.append(chord)
+                element.clear()
+            elif tag == 'measure':
+                measures.append(chords)
+                chords = []
+                part.clear()
+
+    for measures in part_to_measures.values():
+        if any(measures):
+            return measures
+    return next(iter(part_to_measures.values()), [])
+
+
+# Export
+
+@functools.lru_cache(maxsize=None)
+def get_kind_and_degrees(quality: ChordQuality) -> tuple[str, tuple[tuple[int, int, str], ...]]:
+    # The kind that needs the fewest <degree> elements to give quality, preferring additions and
+    # alterations to subtractions. Degrees are (value, alter, type).
+    fields = quality.to_string()
+    best = None
+    for kind, kind_fields in KIND_TO_QUALITY_STRING.items():
+        degrees = []
+        for field, value, kind_value in zip(QUALITY_FIELDS, fields, kind_fields):
+            if value == kind_value:
+                continue
+            degree = FIELD_TO_DEGREE[field]
+            if value == '_':
+                degrees.append((degree, 0, 'subtract'))
+            else:
+                degree_type = 'add' if kind_value == '_' else 'alter'
+                degrees.append((degree, get_alter(degree, value), degree_type))
+        cost = len(degrees), sum(1 for *_, degree_type in degrees if degree_type == 'subtract')
+        if best is None or cost < best[0]:
+            best = cost, kind, tuple(degrees)
+    return best[1], best[2]
+
+
+def iter_note_elements(prefix: str, note: Note) -> Iterator[str]:
+    yield f'<{prefix}><{prefix}-step>{STEP_TO_NAME[note.step]}</{prefix}-step>'
+    if note.chroma:
+        yield f'<{prefix}-alter>{note.chroma}</{prefix}-alter>'
+    yield f'</{prefix}>'
+
+
+def iter_harmony_elements(chord: Chord, context: Optional[SettingsContext] = None) -> Iterator[str]:
+    yield '<harmony>'
+    yield from iter_note_elements('root', chord.root)
+    if isinstance(chord.quality, ChordQuality) and not chord.quality.is_name_only():
+        kind, degrees = get_kind_and_degrees(chord.quality)
+        symbol = (context or get_context()).chord_quality_to_symbol.get(chord.quality)
+    else:
+        kind, degrees, symbol = OTHER_KIND, (), chord.quality.to_symbol()
+    text = f' text={quoteattr(symbol)}' if symbol is not None else ''
+    yield f'<kind{text}>{kind}</kind>'
+    if chord.is_inverted():
+        yield from iter_note_elements('bass', chord.bass)
+    for value, alter, degree_type in degrees:
+        yield (
+            f'<degree><degree-value>{value}</degree-value><degree-alter>{alter}</degree-alter>'
+            f'<degree-type>{degree_type}</degree-type></degree>'
+        )
+    yield '</harmony>'
+
+
+@traced()
+def iter_musicxml(chords: list[list[Chord]], title: str = '', context: Optional[SettingsContext] = None) -> Iterator[str]:
+    # A score with a single part of rests, one per chord, with the chords above them.
+    # Chords that aren't complete (e.g. a root being typed) are left out but keep their rest.
+    divisions = math.lcm(*(len(measure) for measure in chords if measure)) if any(chords) else 1
+    measure_duration = BEATS_PER_MEASURE * divisions
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield (
+        '<!DOCTYPE score-partwise PUBLIC "-//Recordare//DTD MusicXML 4.0 Partwise//EN" '
+        '"http://www.musicxml.org/dtds/partwise.dtd">\n'
+    )
+    yield f'<score-partwise version="{MUSICXML_VERSION}">\n'
+    if title:
+        yield f'<work><work-title>{escape(title)}</work-title></work>\n'
+    yield '<part-list><score-part id="P1"><part-name>Chords</part-name></score-part></part-list>\n'
+    yield '<part id="P1">\n'
+    for i, measure in enumerate(chords):
+        yield f'<measure number="{i + 1}">'
+        if i == 0:
+            yield (
+                f'<attributes><divisions>{divisions}</divisions>'
+                f'<time><beats>{BEATS_PER_MEASURE}</beats><beat-type>4</beat-type></time>'
+                f'<clef><sign>G</sign><line>2</line></clef></attributes>'
+            )
+        if not measure:
+            yield f'<note><rest measure="yes"/><duration>{measure_duration}</duration></note>'
+        for chord in measure:
+            if isinstance(chord, Chord):
+                yield from iter_harmony_elements(chord, context)
+            yield f'<note><rest/><duration>{measure_duration // len(measure)}</duration></note>'
+        yield '</measure>\n'
+    yield '</part>\n</score-partwise>\n'
+
+
+def write_musicxml(path: Union[str, Path], chords: list[list[Chord]], context: Optional[SettingsContext] = None):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(iter_musicxml(chords, Path(path).stem, context))
+
+
+def export_musicxml(chords, regions, analyses):
+    path, success = get_export_path(name_filter='*.musicxml')
+    if success:
+        write_musicxml(path, chords)
@@ -1,18 +1,46 @@
 from __future__ import annotations
 
 import csv
+import functools
 import itertools
+import re
+from collections import defaultdict
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
 
-import chord_hand.settings
+from chord_hand import diagnostics
+from chord_hand.settings import SettingsContext, cached_per_context, get_context
 from chord_hand.analysis import Modality
+from chord_hand.analysis.alternatives import get_alternatives
+from chord_hand.analysis.harmonic_region import HarmonicRegion
 from chord_hand.chord.chord import Chord
+from chord_hand.chord.note import STEP_TO_PITCH_CLASS, Note
+from chord_hand.chord.quality import ChordQuality, CustomChordQuality
+from chord_hand.chord.symbol_parser import get_parser
+from chord_hand.corpus import parallel_map
 from chord_hand.export import export_csv
+from chord_hand.song import Song
+from chord_hand.trace import traced
 
+LEX_FUNCTIONS_PATH = Path(__file__).parent / 'encoding' / 'projeto_mpb' / 'lex-functions.csv'
 
-def analysis_to_projeto_mpb_code(analysis, modality):
+
+@functools.lru_cache(maxsize=None)
+def get_function_code_to_symbol() -> dict[str, str]:
+    function_code_to_symbol = {}
+    with open(LEX_FUNCTIONS_PATH, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+
+        for code, symbol in reader:
+            function_code_to_symbol[code] = symbol
+
+    return function_code_to_symbol
+
+
+def analysis_to_projeto_mpb_code(analysis, modality, context=None):
     analytic_type = analysis.type.name, analysis.step, analysis.chroma
-    qualities_to_codes = chord_hand.settings.analytic_type_args_to_projeto_mpb_code[modality].get(analytic_type, None)
+    qualities_to_codes = (context or get_context()).analytic_type_args_to_projeto_mpb_code[modality].get(analytic_type, None)
     if not qualities_to_codes:
         return ''
     for quality_str, code in qualities_to_codes.items():
@@ -28,6 +56,7 @@ def export_projeto_mpb_old_csv(chords, regions, analyses):
     export_csv(get_projeto_mpb_old_db_data(chords, regions, analyses))
 
 
+@traced()
 def get_projeto_mpb_base_data(chords, regions, analyses):
     from chord_hand.chord.quality import CustomChordQuality
     from chord_hand.projeto_mpb import analysis_to_projeto_mpb_code
@@ -62,17 +91,9 @@ def get_projeto_mpb_base_data(chords, regions, analyses):
     return rows
 
 
+@traced()
 def get_projeto_mpb_new_db_data(chords, analyses, regions):
-    pmpb_path = Path(__file__).parent / 'encoding' / 'projeto_mpb'
-    lex_functions = pmpb_path / 'lex-functions.csv'
-
-    function_code_to_symbol = {}
-    with open(lex_functions, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-
-        for code, symbol in reader:
-            function_code_to_symbol[code] = symbol
-
+    function_code_to_symbol = get_function_code_to_symbol()
     base_data = get_projeto_mpb_base_data(chords, analyses, regions)
     new_db_data = [[
         '',
@@ -92,17 +113,9 @@ def get_projeto_mpb_new_db_data(chords, analyses, regions):
     return new_db_data
 
 
+@traced()
 def get_projeto_mpb_old_db_data(chords, analyses, regions):
-    pmpb_path = Path(__file__).parent / 'encoding' / 'projeto_mpb'
-    lex_functions = pmpb_path / 'lex-functions.csv'
-
-    function_code_to_symbol = {}
-    with open(lex_functions, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-
-        for code, symbol in reader:
-            function_code_to_symbol[code] = symbol
-
+    function_code_to_symbol = get_function_code_to_symbol()
     base_data = get_projeto_mpb_base_data(chords, analyses, regions)
     from chord_hand.chord.quality import CustomChordQuality
     old_db_data = [[
@@ -121,3 +134,255 @@ def get_projeto_mpb_old_db_data(chords, analyses, regions):
     old_db_data = [*zip(*old_db_data)]  # tranpose data
 
     return old_db_data
+
+
+# Import
+
+NEW_DB_HEADER_START = 'corpus'
+MODE_TO_MODALITY = {'1': Modality.MAJOR, '0': Modality.MINOR}
+SONGS_PER_BATCH = 256  # songs held in memory at once when importing large files
+# scale degree of each pitch class above the tonic, so that e.g. 10 is bVII and 6 is #IV in both modes
+RELATIVE_PITCH_CLASS_TO_DEGREE = [0, 1, 1, 2, 2, 3, 3, 4, 5, 5, 6, 6]
+MODALITY_TO_TONIC_SPELLINGS = {
+    Modality.MAJOR: [(0, 0), (1, -1), (1, 0), (2, -1), (2, 0), (3, 0), (3, 1), (4, 0), (5, -1), (5, 0), (6, -1), (6, 0)],
+    Modality.MINOR: [(0, 0), (0, 1), (1, 0), (2, -1), (2, 0), (3, 0), (3, 1), (4, 0), (4, 1), (5, 0), (6, -1), (6, 0)],
+}
+
+
+def spell_tonic(pitch_class: int, modality: Modality) -> Note:
+    return Note(*MODALITY_TO_TONIC_SPELLINGS[modality][pitch_class % 12])
+
+
+def spell_pitch_class(pitch_class: int, region: Optional[HarmonicRegion]) -> Note:
+    # The note on the scale degree of the pitch class in the region, e.g. Db rather than C# for
+    # the bII of C. Without a region, as the tonic of a major key.
+    if region is None:
+        return spell_tonic(pitch_class, Modality.MAJOR)
+    tonic_pitch_class = region.tonic.to_pitch_class()
+    step = (region.tonic.step + RELATIVE_PITCH_CLASS_TO_DEGREE[(pitch_class - tonic_pitch_class) % 12]) % 7
+    chroma = (pitch_class - STEP_TO_PITCH_CLASS[step] + 6) % 12 - 6
+    if abs(chroma) > 2:
+        return spell_tonic(pitch_class, Modality.MAJOR)
+    return Note(step, chroma)
+
+
+# lookups from the values of the databases back to those of the settings
+
+@cached_per_context
+def get_chordal_type_to_quality(context: SettingsContext) -> dict[tuple[int, int], ChordQuality]:
+    # of qualities with the same chordal type, those that have a key come first
+    chordal_type_to_quality = {}
+    qualities = sorted(context.chord_quality_to_chordal_type, key=lambda q: q not in context.chord_quality_to_key)
+    for quality in qualities:
+        chordal_type = context.chord_quality_to_chordal_type[quality]
+        if len(chordal_type) == 2:
+            chordal_type_to_quality.setdefault((ord(chordal_type[0]), int(chordal_type[1])), quality)
+    return chordal_type_to_quality
+
+
+@cached_per_context
+def get_code_to_analytic_type_names(context: SettingsContext) -> dict[Modality, dict[str, set[str]]]:
+    # inverse of analytic_type_args_to_projeto_mpb_code
+    code_to_analytic_type_names = {modality: defaultdict(set) for modality in Modality}
+    for modality, args_to_codes in context.analytic_type_args_to_projeto_mpb_code.items():
+        for (name, _, _), quality_to_code in args_to_codes.items():
+            for code in quality_to_code.values():
+                code_to_analytic_type_names[modality][str(code)].add(name)
+    return code_to_analytic_type_names
+
+
+@dataclass
+class MPBChord:
+    # a row of either database, with the chord's quality already looked up
+    measure: int
+    root: int
+    bass: int
+    quality: Union[ChordQuality, CustomChordQuality]
+    function_code: str
+    region: Optional[HarmonicRegion]
+
+
+def to_measure(position: str) -> int:
+    # posição is measure.fraction, from 1
+    return int(float(position)) - 1
+
+
+def to_region(tonic: str, mode: str) -> Optional[HarmonicRegion]:
+    if tonic == '' or mode not in MODE_TO_MODALITY:
+        return None
+    modality = MODE_TO_MODALITY[mode]
+    return HarmonicRegion(spell_tonic(int(tonic), modality), modality)
+
+
+def parse_new_db_row(row: list[str], context: Optional[SettingsContext] = None) -> Optional[MPBChord]:
+    # corpus, musica, fundamental, baixo, cifra, função, tonica, modo, posição
+    _, _, root, bass, symbol, function_symbol, tonic, mode, position = row
+    if root == '':
+        return None
+    quality = get_parser(context).get_quality(symbol)
+    if quality is None:
+        diagnostics.report(diagnostics.UNKNOWN_SYMBOL, symbol)
+        quality = CustomChordQuality(symbol)
+    function_code = get_function_symbol_to_code().get(function_symbol, '')
+    if function_symbol and not function_code:
+        diagnostics.report(diagnostics.ANALYSIS_ERROR, function_symbol)
+    return MPBChord(to_measure(position), int(root), int(bass), quality, function_code, to_region(tonic, mode))
+
+
+def parse_old_db_column(column: tuple[str, ...], context: Optional[SettingsContext] = None) -> Optional[MPBChord]:
+    # fundamental, baixo, chordal type letter (as its code point) and number, function code, tonica, modo, posição
+    root, bass, chordal_type_letter, chordal_type_number, function_code, tonic, mode, position = column
+    if root == '':
+        return None
+    chordal_type = (int(chordal_type_letter), int(chordal_type_number)) if chordal_type_letter else None
+    quality = get_chordal_type_to_quality(context).get(chordal_type)
+    if quality is None:
+        detail = f'{chr(chordal_type[0])}{chordal_type[1]}' if chordal_type else ''
+        diagnostics.report(diagnostics.UNKNOWN_SYMBOL, detail)
+        quality = CustomChordQuality(detail)
+    return MPBChord(to_measure(position), int(root), int(bass), quality, function_code, to_region(tonic, mode))
+
+
+@functools.lru_cache(maxsize=None)
+def get_function_symbol_to_code() -> dict[str, str]:
+    return {symbol: code for code, symbol in get_function_code_to_symbol().items()}
+
+
+def get_analysis(chord: Chord, region: HarmonicRegion, function_code: str, context: Optional[SettingsContext] = None):
+    # the most plausible analysis of chord whose Projeto MPB code is function_code, or None
+    context = context or get_context()
+    alternatives = get_alternatives(chord, region, context=context)
+    if alternatives is None:
+        return None
+    names = get_code_to_analytic_type_names(context)[region.modality].get(function_code, ())
+    for analysis in alternatives.ranked:
+        if analysis.type.name in names and analysis_to_projeto_mpb_code(analysis, region.modality, context) == function_code:
+            return analysis
+    return None
+
+
+def build_song(mpb_chords: list[MPBChord], context: Optional[SettingsContext] = None) -> Song:
+    # Measures without rows are left empty, and the region of a measure is that of its last chord.
+    # Analyses whose function code is not that of the default analysis are locked.
+    n_measures = max((mpb_chord.measure for mpb_chord in mpb_chords), default=-1) + 1
+    song = Song([[] for _ in range(n_measures)])
+    function_codes = [[] for _ in range(n_measures)]
+    for mpb_chord in mpb_chords:
+        region = mpb_chord.region
+        root = spell_pitch_class(mpb_chord.root, region)
+        bass = root if mpb_chord.bass == mpb_chord.root else spell_pitch_class(mpb_chord.bass, region)
+        song.chords[mpb_chord.measure].append(Chord(root, mpb_chord.quality, bass))
+        song.regions[mpb_chord.measure] = region
+        function_codes[mpb_chord.measure].append(mpb_chord.function_code)
+
+    song.analyze(context)
+    collector = diagnostics.get_collector()
+    for i, (chords, codes) in enumerate(zip(song.chords, function_codes)):
+        region = song.regions[i]
+        for j, (chord, code) in enumerate(zip(chords, codes)):
+            if not code or not region or song.analyses[i][j] is None:
+                continue
+            if analysis_to_projeto_mpb_code(song.analyses[i][j], region.modality, context) == code:
+                continue
+            if analysis := get_analysis(chord, region, code, context):
+                song.analyses[i][j] = analysis
+                song.analytic_type_locked[i] = True
+            else:
+                if collector is not None:
+                    collector.measure = i
+                diagnostics.report(diagnostics.ANALYSIS_ERROR, f'{chord.to_symbol()} {code}')
+    return song
+
+
+def iter_new_db_songs(rows: Iterator[list[str]]) -> Iterator[tuple[str, str, list[list[str]]]]:
+    # (corpus, musica, rows) of each song, i.e. of each run of rows with the same corpus and musica
+    for (corpus, song_name), song_rows in itertools.groupby(rows, key=lambda row: (row[0], row[1])):
+        yield corpus, song_name, list(song_rows)
+
+
+def import_new_db_song(args) -> ImportedSong:
+    rows, output_path = args
+    with diagnostics.collecting(str(output_path)) as collector:
+        mpb_chords = []
+        for row in rows:
+            collector.measure = to_measure(row[-1]) if row[-1] else None
+            if mpb_chord := parse_new_db_row(row):
+                mpb_chords.append(mpb_chord)
+        song = build_song(mpb_chords)
+        save_song(song, output_path)
+    return ImportedSong(str(output_path), len(song), collector.diagnostics)
+
+
+def import_old_db_song(args) -> ImportedSong:
+    columns, output_path = args
+    with diagnostics.collecting(str(output_path)) as collector:
+        mpb_chords = []
+        for column in columns:
+            collector.measure = to_measure(column[-1]) if column[-1] else None
+            if mpb_chord := parse_old_db_column(column):
+                mpb_chords.append(mpb_chord)
+        song = build_song(mpb_chords)
+        save_song(song, output_path)
+    return ImportedSong(str(output_path), len(song), collector.diagnostics)
+
+
+def save_song(song: Song, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    song.save(path)
+
+
+@dataclass
+class ImportedSong:
+    path: str
+    n_measures: int
+    diagnostics: list[diagnostics.Diagnostic]
+
+
+def to_file_name(name: str) -> str:
+    return re.sub(r'[\\/:*?"<>|]', '_', name).strip() or '_'
+
+
+@traced()
+def import_projeto_mpb_csv(
+        path: Path,
+        output_dir: Path,
+        context: Optional[SettingsContext] = None,
+        workers: Optional[int] = None,
+) -> list[ImportedSong]:
+    # Writes a JSON song to output_dir for each song of a CSV in the layout of the new database, in
+    # directories named after the corpus, or for the single song of a CSV in the layout of the old one.
+    # New databases are read a batch of songs at a time, so their size doesn't matter.
+    path, output_dir = Path(path), Path(output_dir)
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        first_row = next(reader, None)
+        if first_row is None:
+            return []
+
+        if first_row[0] != NEW_DB_HEADER_START:
+            # the old layout is transposed, so the whole song has to be read
+            columns = [column for column in zip(first_row, *reader)]
+            return list(parallel_map(import_old_db_song, [(columns, output_dir / f'{path.stem}.json')], context, 1))
+
+        imported = []
+        songs = iter_new_db_songs(reader)
+        for i, batch in enumerate(iter(lambda: list(itertools.islice(songs, SONGS_PER_BATCH)), [])):
+            args = []
+            for j, (corpus, song_name, rows) in enumerate(batch):
+                name = song_name or f'{path.stem}_{i * SONGS_PER_BATCH + j + 1}'
+                args.append((rows, output_dir / to_file_name(corpus or path.stem) / f'{to_file_name(name)}.json'))
+            imported += parallel_map(import_new_db_song, args, context, workers)
+        return imported
+
+
+def import_projeto_mpb_csvs(
+        paths: Iterable[Path],
+        output_dir: Path,
+        context: Optional[SettingsContext] = None,
+        workers: Optional[int] = None,
+) -> list[ImportedSong]:
+    return [
+        imported_song
+        for path in paths
+        for imported_song in import_projeto_mpb_csv(path, output_dir, context, workers)
+    ]
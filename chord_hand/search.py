@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import bisect
+import json
+from collections import defaultdict
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Iterator, Optional
+
+from chord_hand.analysis import HarmonicAnalysis
+from chord_hand.analysis.harmonic_region import HarmonicRegion
+from chord_hand.chord.chord import Chord
+from chord_hand.chord.quality import ChordQuality
+from chord_hand.corpus import iter_song_paths, parallel_map
+from chord_hand.settings import SettingsContext, get_context
+from chord_hand.song import Song
+from chord_hand.trace import traced
+
+MAX_N = 4
+KINDS = ('analysis', 'roots')
+WILDCARD_CHARS = frozenset('*?[')
+
+
+@dataclass(frozen=True)
+class Hit:
+    song: str
+    measure: int
+    offset: int  # index of the chord in the measure
+
+
+def get_analysis_token(analysis) -> Optional[str]:
+    if not isinstance(analysis, HarmonicAnalysis):
+        return None
+    return analysis.to_symbol()
+
+
+def get_root_token(chord, region: Optional[HarmonicRegion], context: Optional[SettingsContext] = None) -> Optional[str]:
+    # root as semitones above the tonic of the region, plus the quality symbol, e.g. '7:7' for V7
+    if not isinstance(chord, Chord) or not region or chord.root.step < 0:
+        return None
+    interval = (chord.root.to_pitch_class() - region.tonic.to_pitch_class()) % 12
+    if isinstance(chord.quality, ChordQuality):
+        quality = (context or get_context()).chord_quality_to_symbol.get(chord.quality, chord.quality.to_string())
+    else:
+        quality = chord.quality.to_string()
+    return f'{interval}:{quality}'
+
+
+def tokenize_song(song: Song, context: Optional[SettingsContext] = None) -> dict:
+    result = {kind: [] for kind in KINDS} | {'positions': []}
+    for i, (chords, region) in enumerate(zip(song.chords, song.regions)):
+        analyses = song.analyses[i]
+        for j, chord in enumerate(chords):
+            result['analysis'].append(get_analysis_token(analyses[j] if j < len(analyses) else None))
+            result['roots'].append(get_root_token(chord, region, context))
+            result['positions'].append((i, j))
+    return result
+
+
+def tokenize_song_file(path):
+    return tokenize_song(Song.load(path))
+
+
+def parse_query(query: str) -> list[str]:
+    # 'V/' is accepted for 'V', as analysis symbols drop the slash when there is no secondary target
+    return [token.rstrip('/') if token != '/' else token for token in query.split()]
+
+
+def is_wildcard(token: str) -> bool:
+    return not WILDCARD_CHARS.isdisjoint(token)
+
+
+def get_anchor(query: list[str], max_n: int = MAX_N) -> tuple[int, tuple[str, ...]]:
+    # longest run of exact tokens in the query, used to look up candidates in the postings
+    best_start, best = 0, ()
+    start = 0
+    while start < len(query):
+        end = start
+        while end < len(query) and not is_wildcard(query[end]):
+            end += 1
+        if min(end - start, max_n) > len(best):
+            best_start, best = start, tuple(query[start:min(end, start + max_n)])
+        start = end + 1
+    return best_start, best
+
+
+def match_at(tokens: list[Optional[str]], query: list[str], start: int) -> bool:
+    if start < 0 or start + len(query) > len(tokens):
+        return False
+    for token, pattern in zip(tokens[start:start + len(query)], query):
+        if token is None:
+            return False
+        if token != pattern and not (is_wildcard(pattern) and fnmatchcase(token, pattern)):
+            return False
+    return True
+
+
+class TokenStream:
+    # The tokens of every song of one kind concatenated in a single list, separated by None so
+    # that no n-gram spans two songs, with the start positions of its n-grams. Removed songs are
+    # only marked as dead; their tokens stay in the stream until it is rebuilt.
+    def __init__(self, max_n: int = MAX_N):
+        self.max_n = max_n
+        self.tokens = []
+        self.segment_starts = []
+        self.segment_songs = []
+        self.song_to_segment = {}
+        self.dead_segments = set()
+        self.grams = defaultdict(list)
+
+    def add(self, song: str, tokens: list[Optional[str]]):
+        self.remove(song)
+        self.tokens.append(None)
+        offset = len(self.tokens)
+        self.tokens.extend(tokens)
+        self.song_to_segment[song] = len(self.segment_starts)
+        self.segment_starts.append(offset)
+        self.segment_songs.append(song)
+
+        grams = self.grams
+        stream = self.tokens[offset - 1:]  # starts with the separator, so that it is never indexed
+        for n in range(1, self.max_n + 1):
+            for start, gram in enumerate(zip(*[stream[i:] for i in range(n)]), offset - 1):
+                if None not in gram:
+                    grams[gram].append(start)
+
+    def remove(self, song: str):
+        segment = self.song_to_segment.pop(song, None)
+        if segment is not None:
+            self.dead_segments.add(segment)
+
+    def get_location(self, position: int) -> Optional[tuple[str, int]]:
+        # song and index of its token at position of the stream, or None if the song was removed
+        segment = bisect.bisect_right(self.segment_starts, position) - 1
+        if segment in self.dead_segments:
+            return None
+        return self.segment_songs[segment], position - self.segment_starts[segment]
+
+    def iter_candidates(self, query: list[str]) -> Iterator[int]:
+        anchor_start, anchor = get_anchor(query, self.max_n)
+        if anchor:
+            for start in self.grams.get(anchor, []):
+                yield start - anchor_start
+            return
+
+        # only wildcards: expand the first token over the tokens in the stream
+        for gram, starts in list(self.grams.items()):
+            if len(gram) == 1 and fnmatchcase(gram[0], query[0]):
+                yield from starts
+
+    def search(self, query: list[str]) -> Iterator[tuple[str, int]]:
+        for start in self.iter_candidates(query):
+            if match_at(self.tokens, query, start) and (location := self.get_location(start)):
+                yield location
+
+
+class SearchIndex:
+    # n-gram index over two transposition-invariant token streams of a corpus of songs:
+    # 'analysis' (harmonic analysis symbols, e.g. II V I) and 'roots' (interval of the
+    # root above the tonic plus quality symbol, e.g. 2:m7 7:7 0:7M).
+    FILENAME = '.search_index.json'
+
+    def __init__(self, corpus_dir: Optional[Path] = None, max_n: int = MAX_N):
+        self.corpus_dir = Path(corpus_dir) if corpus_dir else None
+        self.max_n = max_n
+        self.song_to_tokens = {}
+        self.mtimes = {}
+        self._streams = {}  # kind -> TokenStream, built on the first search of that kind
+
+    @property
+    def path(self):
+        return self.corpus_dir / self.FILENAME
+
+    def get_stream(self, kind: str) -> TokenStream:
+        if kind not in self._streams:
+            stream = self._streams[kind] = TokenStream(self.max_n)
+            for song, tokens in self.song_to_tokens.items():
+                stream.add(song, tokens[kind])
+        return self._streams[kind]
+
+    def add_song(self, song: str, tokens: dict):
+        self.song_to_tokens[song] = tokens
+        for kind, stream in self._streams.items():
+            stream.add(song, tokens[kind])
+
+    def remove_song(self, song: str):
+        self.song_to_tokens.pop(song, None)
+        for stream in self._streams.values():
+            stream.remove(song)
+
+    @traced()
+    def search(self, query: str, kind: str = 'analysis') -> list[Hit]:
+        if kind not in KINDS:
+            raise ValueError(f'Unknown kind of search: {kind}. Must be one of {", ".join(KINDS)}')
+
+        query = parse_query(query)
+        if not query:
+            return []
+
+        hits = [
+            Hit(song, *self.song_to_tokens[song]['positions'][index])
+            for song, index in self.get_stream(kind).search(query)
+        ]
+        return sorted(hits, key=lambda hit: (hit.song, hit.measure, hit.offset))
+
+    def update(self, context: Optional[SettingsContext] = None, workers: Optional[int] = None):
+        # Re-tokenizes songs added or modified since the index was last saved
+        mtimes = {
+            path.relative_to(self.corpus_dir).as_posix(): path.stat().st_mtime_ns
+            for path in iter_song_paths(self.corpus_dir)
+        }
+        stale = {song for song in self.mtimes.keys() | mtimes.keys() if self.mtimes.get(song) != mtimes.get(song)}
+        for song in stale - mtimes.keys():
+            self.remove_song(song)
+
+        to_index = sorted(song for song in stale if song in mtimes)
+        song_paths = [self.corpus_dir / song for song in to_index]
+        for song, tokens in zip(to_index, parallel_map(tokenize_song_file, song_paths, context, workers)):
+            self.add_song(song, tokens)
+
+        self.mtimes = mtimes
+        return len(stale)
+
+    def update_song(self, path: Path, song: Optional[Song] = None):
+        # Re-indexes a single song after it was saved in the corpus
+        path = Path(path)
+        name = path.relative_to(self.corpus_dir).as_posix()
+        self.add_song(name, tokenize_song(song) if song else tokenize_song_file(path))
+        self.mtimes[name] = path.stat().st_mtime_ns
+
+    def save(self):
+        data = {
+            'max_n': self.max_n,
+            'mtimes': self.mtimes,
+            'songs': {
+                song: {kind: tokens[kind] for kind in KINDS} | {'positions': [list(p) for p in tokens['positions']]}
+                for song, tokens in self.song_to_tokens.items()
+            },
+        }
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    @classmethod
+    @traced('SearchIndex.load')
+    def load(cls, corpus_dir: Path) -> Optional[SearchIndex]:
+        path = Path(corpus_dir) / cls.FILENAME
+        if not path.exists():
+            return None
+
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+
+        index = cls(corpus_dir, data['max_n'])
+        for song, tokens in data['songs'].items():
+            tokens['positions'] = [tuple(p) for p in tokens['positions']]
+            index.song_to_tokens[song] = tokens
+        index.mtimes = data['mtimes']
+        return index
+
+    @classmethod
+    def build(cls, corpus_dir: Path, context: Optional[SettingsContext] = None, workers: Optional[int] = None):
+        index = cls(corpus_dir)
+        index.update(context, workers)
+        return index
+
+    @classmethod
+    def find(cls, path: Path) -> Optional[Path]:
+        # the corpus directory containing path that has a search index, if any
+        for directory in Path(path).resolve().parents:
+            if (directory / cls.FILENAME).exists():
+                return directory
+        return None
+
+
+def get_updated_index(corpus_dir: Path, context: Optional[SettingsContext] = None, workers: Optional[int] = None):
+    index = SearchIndex.load(corpus_dir)
+    if index is None:
+        index = SearchIndex.build(corpus_dir, context, workers)
+        index.save()
+    elif index.update(context, workers):
+        index.save()
+    return index
+
+
+def update_index_on_save(path: Path, song: Song):
+    # keeps the index of the corpus a song is saved in, if there is one, up to date
+    corpus_dir = SearchIndex.find(path)
+    if corpus_dir is None:
+        return
+    index = SearchIndex.load(corpus_dir)
+    index.update_song(Path(path).resolve(), song)
+    index.save()
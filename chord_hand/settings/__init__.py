@@ -7,18 +7,21 @@ import importlib
 import shutil
 
 from chord_hand.dirs import SETTINGS_DIR
+from chord_hand.settings.context import (
+    SettingsContext,
+    FrozenDict,
+    cached_per_context,
+    get_context,
+    set_context,
+    reset_context,
+    set_default_context,
+    use_context,
+)
+from chord_hand.trace import traced
 
-decoder = None
-encoder = None
-chord_quality_to_symbol = {}
-chord_quality_to_chordal_type = {}
-key_to_chord_quality = {}
-chord_quality_to_key = {}
-default_analyses_major = {}
-default_analyses_minor = {}
-name_to_analytic_type = {}
-analytic_type_args_to_projeto_mpb_code = {}
-name_to_exporter = {}
+
+class SettingsError(Exception):
+    pass
 
 
 def my_import(name):
@@ -30,31 +33,34 @@ def my_import(name):
     return mod
 
 
-def init_decoder_and_encoder():
-    with OpenSettingsBinaryFile('settings.toml') as f:
-        data = tomli.load(f)
+def load_settings_toml(settings_dir: Path = SETTINGS_DIR):
+    with OpenSettingsBinaryFile('settings.toml', settings_dir=settings_dir) as f:
+        return tomli.load(f)
+
+
+def load_decoder_and_encoder(settings_dir: Path = SETTINGS_DIR, encoding: str = None):
+    data = load_settings_toml(settings_dir)
 
-    active = data['encoding']['active']
+    active = encoding or data['encoding']['active']
     encoder_cls, decoder_cls = my_import(data['encoding'][active][0]), my_import(data['encoding'][active][1])
-    global encoder, decoder
-    encoder = encoder_cls()
-    decoder = decoder_cls()
+    return active, encoder_cls(), decoder_cls()
 
 
-def init_exporters():
-    with OpenSettingsBinaryFile('settings.toml') as f:
-        data = tomli.load(f)
+def load_exporters(settings_dir: Path = SETTINGS_DIR):
+    data = load_settings_toml(settings_dir)
 
-    global name_to_exporter
-    for name, (display_name, func_path)in data['exporters'].items():
+    name_to_exporter = {}
+    for name, (display_name, func_path) in data['exporters'].items():
         name_to_exporter[name] = (display_name, my_import(func_path))
 
+    return name_to_exporter
 
-def init_chord_symbols():
+
+def load_chord_symbols(settings_dir: Path = SETTINGS_DIR):
     from chord_hand.chord.quality import ChordQuality
 
-    # Should be called by main, hence 'settings' must be in the path
-    with OpenSettingsFile('chord_symbols.csv') as f:
+    chord_quality_to_symbol = {}
+    with OpenSettingsFile('chord_symbols.csv', settings_dir=settings_dir) as f:
         reader = csv.reader(f)
         next(reader, None)  # skip header
         for raw_quality, symbol in reader:
@@ -62,12 +68,14 @@ def init_chord_symbols():
             quality = ChordQuality.from_string(quality_string)
             chord_quality_to_symbol[quality] = symbol
 
+    return chord_quality_to_symbol
+
 
-def init_chordal_type():
+def load_chordal_types(settings_dir: Path = SETTINGS_DIR):
     from chord_hand.chord.quality import ChordQuality
 
-    # Should be called by main, hence 'settings' must be in the path
-    with OpenSettingsFile('chordal_types.csv') as f:
+    chord_quality_to_chordal_type = {}
+    with OpenSettingsFile('chordal_types.csv', settings_dir=settings_dir) as f:
         reader = csv.reader(f)
         next(reader, None)  # skip header
         for raw_quality, raw_chordal_type in reader:
@@ -76,12 +84,14 @@ def init_chordal_type():
             chordal_type = ast.literal_eval(raw_chordal_type)
             chord_quality_to_chordal_type[quality] = chordal_type
 
+    return chord_quality_to_chordal_type
 
-def init_keymap():
+
+def load_keymap(settings_dir: Path = SETTINGS_DIR):
     from chord_hand.chord.quality import ChordQuality
 
-    # Should be called by main, hence 'settings' must be in the path
-    with OpenSettingsFile('keymap.csv') as f:
+    key_to_chord_quality = {}
+    with OpenSettingsFile('keymap.csv', settings_dir=settings_dir) as f:
         reader = csv.reader(f)
         next(reader, None)  # skip header
         for key, raw_chord_quality in reader:
@@ -89,20 +99,21 @@ def init_keymap():
             quality = ChordQuality.from_string(quality_string)
             key_to_chord_quality[key] = quality
 
-    global chord_quality_to_key
     chord_quality_to_key = {v: k for k, v in key_to_chord_quality.items()}
+    return key_to_chord_quality, chord_quality_to_key
 
 
-def init_default_analyses():
+def load_default_analyses(settings_dir: Path = SETTINGS_DIR):
     from chord_hand.chord.quality import ChordQuality
 
-    # Should be called by main, hence 'settings' must be in the path
+    default_analyses_major = {}
+    default_analyses_minor = {}
     args = [
         ('default_analyses', default_analyses_major),
         # ('default_analyses_minor', default_analyses_minor)
     ]
     for filename, default_analyses in args:
-        with OpenSettingsFile(f'{filename}.csv') as f:
+        with OpenSettingsFile(f'{filename}.csv', settings_dir=settings_dir) as f:
             reader = csv.reader(f)
             next(reader, None)  # skip symbol line
             quality_strings = next(reader)[3:]
@@ -112,12 +123,14 @@ def init_default_analyses():
                 analyses = ['Aut.' if a == '' else a for a in analyses]
                 default_analyses[(int(step), int(chroma))] = dict(zip(qualities, analyses))
 
+    return default_analyses_major, default_analyses_minor
+
 
-def init_analytic_types():
+def load_analytic_types(settings_dir: Path = SETTINGS_DIR):
     from chord_hand.analysis import AnalyticType
 
-    # Should be called by main, hence 'settings' must be in the path
-    with OpenSettingsFile('analytic_types.csv') as f:
+    name_to_analytic_type = {}
+    with OpenSettingsFile('analytic_types.csv', settings_dir=settings_dir) as f:
         reader = csv.reader(f)
         next(reader, None)  # skip header
 
@@ -125,10 +138,14 @@ def init_analytic_types():
         for name, relative_step, relative_pci in reader:
             name_to_analytic_type[name] = AnalyticType(name, int(relative_step), int(relative_pci))
 
+    return name_to_analytic_type
+
 
-def init_projeto_mpb_function_codes():
+def load_projeto_mpb_function_codes(settings_dir: Path = SETTINGS_DIR):
     from chord_hand.analysis.modality import Modality
 
+    analytic_type_args_to_projeto_mpb_code = {}
+
     def init_code(key, qualities, modality):
         qualities = qualities.split(';')
 
@@ -143,7 +160,7 @@ def init_projeto_mpb_function_codes():
     analytic_type_args_to_projeto_mpb_code[Modality.MAJOR] = {}
     analytic_type_args_to_projeto_mpb_code[Modality.MINOR] = {}
 
-    with OpenSettingsFile('projeto_mpb_function_codes.csv') as f:
+    with OpenSettingsFile('projeto_mpb_function_codes.csv', settings_dir=settings_dir) as f:
         reader = csv.reader(f)
         next(reader, None)  # skip header
         for function, analytic_type_string, step, major_chroma, minor_chroma, major_qualities, minor_qualities, code in reader:
@@ -154,12 +171,46 @@ def init_projeto_mpb_function_codes():
                 key = (analytic_type_string, int(step), int(minor_chroma))
                 init_code(key, minor_qualities, Modality.MINOR)
 
+    return analytic_type_args_to_projeto_mpb_code
+
+
+@traced()
+def load_context(settings_dir: Path = SETTINGS_DIR, encoding: str = None) -> SettingsContext:
+    encoding, encoder, decoder = load_decoder_and_encoder(settings_dir, encoding)
+    key_to_chord_quality, chord_quality_to_key = load_keymap(settings_dir)
+    default_analyses_major, default_analyses_minor = load_default_analyses(settings_dir)
+    name_to_analytic_type = load_analytic_types(settings_dir)
+
+    for default_analyses in [default_analyses_major, default_analyses_minor]:
+        for (step, chroma), quality_to_name in default_analyses.items():
+            for quality, name in quality_to_name.items():
+                if name not in name_to_analytic_type:
+                    raise SettingsError(
+                        f'Unknown analytic type "{name}" for {quality} at step {step}, chroma {chroma} '
+                        f'in default_analyses.csv'
+                    )
+
+    return SettingsContext(
+        encoding=encoding,
+        encoder=encoder,
+        decoder=decoder,
+        chord_quality_to_symbol=load_chord_symbols(settings_dir),
+        chord_quality_to_chordal_type=load_chordal_types(settings_dir),
+        key_to_chord_quality=key_to_chord_quality,
+        chord_quality_to_key=chord_quality_to_key,
+        default_analyses_major=default_analyses_major,
+        default_analyses_minor=default_analyses_minor,
+        name_to_analytic_type=name_to_analytic_type,
+        analytic_type_args_to_projeto_mpb_code=load_projeto_mpb_function_codes(settings_dir),
+        name_to_exporter=load_exporters(settings_dir),
+    )
+
 
 class OpenSettingsFile:
-    def __init__(self, name: str, mode: str = 'r'):
+    def __init__(self, name: str, mode: str = 'r', settings_dir: Path = SETTINGS_DIR):
         self.name = name
         self.mode = mode
-        self.path = SETTINGS_DIR / name
+        self.path = settings_dir / name
 
     def open_file(self):
         self.file = open(self.path, self.mode, newline='', encoding='utf-8')
@@ -173,11 +224,13 @@ class OpenSettingsFile:
 
     def __exit__(self, type, value, traceback):
         self.file.close()
+        if value is not None and not isinstance(value, SettingsError):
+            raise SettingsError(f'Error reading {self.path}: {value!r}') from value
 
 
 class OpenSettingsBinaryFile(OpenSettingsFile):
-    def __init__(self, name: str, mode: str = 'rb'):
-        super().__init__(name, mode)
+    def __init__(self, name: str, mode: str = 'rb', settings_dir: Path = SETTINGS_DIR):
+        super().__init__(name, mode, settings_dir)
 
     def open_file(self):
         self.file = open(self.path, self.mode)
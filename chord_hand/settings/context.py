@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import functools
+from dataclasses import dataclass, field
+from typing import Any, Callable, Mapping, Optional, TypeVar
+
+
+class FrozenDict(dict):
+    """A read-only dict that can still be pickled and shared between threads."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError(f"'{type(self).__name__}' object is immutable")
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+    __ior__ = _readonly
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({dict.__repr__(self)})'
+
+
+def freeze(value):
+    if isinstance(value, FrozenDict):
+        return value
+    if isinstance(value, dict):
+        return FrozenDict({k: freeze(v) for k, v in value.items()})
+    return value
+
+
+@dataclass(frozen=True)
+class SettingsContext:
+    encoding: str
+    encoder: Any
+    decoder: Any
+    chord_quality_to_symbol: Mapping = field(default_factory=FrozenDict)
+    chord_quality_to_chordal_type: Mapping = field(default_factory=FrozenDict)
+    key_to_chord_quality: Mapping = field(default_factory=FrozenDict)
+    chord_quality_to_key: Mapping = field(default_factory=FrozenDict)
+    default_analyses_major: Mapping = field(default_factory=FrozenDict)
+    default_analyses_minor: Mapping = field(default_factory=FrozenDict)
+    name_to_analytic_type: Mapping = field(default_factory=FrozenDict)
+    analytic_type_args_to_projeto_mpb_code: Mapping = field(default_factory=FrozenDict)
+    name_to_exporter: Mapping = field(default_factory=FrozenDict)
+
+    def __post_init__(self):
+        for name in self.__dataclass_fields__:
+            object.__setattr__(self, name, freeze(getattr(self, name)))
+
+
+_current_context = contextvars.ContextVar('settings_context', default=None)
+_default_context: Optional[SettingsContext] = None
+
+
+def get_context() -> SettingsContext:
+    # the context set for the current thread or task takes precedence over the process-wide default
+    context = _current_context.get() or _default_context
+    if context is None:
+        raise RuntimeError('Settings have not been initialized. Call chord_hand.main.init_settings() first.')
+    return context
+
+
+def set_default_context(context: SettingsContext):
+    global _default_context
+    _default_context = context
+
+
+def set_context(context: SettingsContext) -> contextvars.Token:
+    return _current_context.set(context)
+
+
+def reset_context(token: contextvars.Token):
+    _current_context.reset(token)
+
+
+T = TypeVar('T')
+
+
+def cached_per_context(builder: Callable[[SettingsContext], T]) -> Callable[[Optional[SettingsContext]], T]:
+    # What builder makes of the settings, built again when called with a context other than the last
+    # one. The context and its value are swapped together, so threads never see one without the other.
+    cache = (None, None)
+
+    @functools.wraps(builder)
+    def get(context: Optional[SettingsContext] = None) -> T:
+        nonlocal cache
+        context = context or get_context()
+        cached_context, value = cache
+        if cached_context is not context:
+            value = builder(context)
+            cache = context, value
+        return value
+
+    return get
+
+
+@contextlib.contextmanager
+def use_context(context: SettingsContext):
+    token = set_context(context)
+    try:
+        yield context
+    finally:
+        reset_context(token)
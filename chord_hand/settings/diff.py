@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+from chord_hand.settings.context import SettingsContext
+
+
+def diff_mappings(old, new) -> set:
+    return {key for key in old.keys() | new.keys() if old.get(key) != new.get(key)}
+
+
+def diff_default_analyses(old, new) -> set:
+    # keys are (chord_step, chord_chroma, quality), as returned by analysis.get_default_analysis_key
+    result = set()
+    for step_and_chroma in old.keys() | new.keys():
+        old_row = old.get(step_and_chroma, {})
+        new_row = new.get(step_and_chroma, {})
+        for quality in old_row.keys() | new_row.keys():
+            if old_row.get(quality, 'Aut.') != new_row.get(quality, 'Aut.'):
+                result.add((*step_and_chroma, quality))
+    return result
+
+
+@dataclass
+class SettingsChange:
+    old: SettingsContext
+    new: SettingsContext
+    encoding_changed: bool = False
+    changed_keys: set = field(default_factory=set)
+    changed_symbol_qualities: set = field(default_factory=set)
+    changed_default_analyses: set = field(default_factory=set)
+    changed_analytic_types: set = field(default_factory=set)
+    exporters_changed: bool = False
+
+    @classmethod
+    def from_contexts(cls, old: SettingsContext, new: SettingsContext):
+        return cls(
+            old,
+            new,
+            encoding_changed=old.encoding != new.encoding or type(old.decoder) is not type(new.decoder),
+            changed_keys=diff_mappings(old.key_to_chord_quality, new.key_to_chord_quality),
+            changed_symbol_qualities=diff_mappings(old.chord_quality_to_symbol, new.chord_quality_to_symbol),
+            changed_default_analyses=diff_default_analyses(
+                old.default_analyses_major, new.default_analyses_major
+            ) | diff_default_analyses(old.default_analyses_minor, new.default_analyses_minor),
+            changed_analytic_types=diff_mappings(old.name_to_analytic_type, new.name_to_analytic_type),
+            exporters_changed=bool(diff_mappings(old.name_to_exporter, new.name_to_exporter)),
+        )
+
+    def __bool__(self):
+        return any([
+            self.encoding_changed,
+            self.changed_keys,
+            self.changed_symbol_qualities,
+            self.changed_default_analyses,
+            self.changed_analytic_types,
+            self.exporters_changed,
+        ])
+
+    def affects_chord_codes(self, chord_codes: str) -> bool:
+        from chord_hand.encoding.common import split_measure_codes_into_chord_codes
+        from chord_hand.encoding.standard import StandardDecoder
+
+        if not self.changed_keys or not isinstance(self.new.decoder, StandardDecoder):
+            return False
+
+        # the second character of a standard chord code is its quality key
+        return any(
+            len(code) > 1 and code[1] in self.changed_keys
+            for code in split_measure_codes_into_chord_codes(chord_codes)
+        )
+
+    def affects_symbols(self, chords) -> bool:
+        from chord_hand.chord.chord import Chord
+        from chord_hand.chord.quality import ChordQuality
+
+        return any(
+            chord.quality in self.changed_symbol_qualities
+            for chord in chords
+            if isinstance(chord, Chord) and isinstance(chord.quality, ChordQuality)
+        )
+
+    def affects_analyses(self, chords, region, analyses) -> bool:
+        from chord_hand.analysis import get_default_analysis_key, HarmonicAnalysis
+        from chord_hand.chord.chord import Chord
+        from chord_hand.chord.quality import ChordQuality
+
+        if not region:
+            return False
+
+        if any(
+                isinstance(analysis, HarmonicAnalysis) and analysis.type.name in self.changed_analytic_types
+                for analysis in analyses
+        ):
+            return True
+
+        return any(
+            get_default_analysis_key(chord, region) in self.changed_default_analyses
+            for chord in chords
+            if isinstance(chord, Chord) and isinstance(chord.quality, ChordQuality)
+        )
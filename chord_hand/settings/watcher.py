@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional
+
+from chord_hand.dirs import SETTINGS_DIR
+from chord_hand.settings import load_context
+from chord_hand.settings.context import SettingsContext, set_default_context
+from chord_hand.settings.diff import SettingsChange
+
+WATCHED_FILES = (
+    'settings.toml',
+    'keymap.csv',
+    'chord_symbols.csv',
+    'chordal_types.csv',
+    'default_analyses.csv',
+    'analytic_types.csv',
+    'projeto_mpb_function_codes.csv',
+)
+
+
+class SettingsWatcher:
+    # Settings are rebuilt in a background thread, but the new context is only swapped in
+    # by poll(), which should be called periodically from the UI thread.
+    def __init__(
+            self,
+            context: SettingsContext,
+            on_change: Callable[[SettingsChange], None] = lambda change: None,
+            on_error: Callable[[str], None] = lambda message: None,
+            settings_dir: Path = SETTINGS_DIR,
+    ):
+        self.context = context
+        self.on_change = on_change
+        self.on_error = on_error
+        self.settings_dir = settings_dir
+        self.mtimes = self.get_mtimes()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='settings-watcher')
+        self._pending: Optional[Future] = None
+
+    def get_mtimes(self):
+        result = {}
+        for name in WATCHED_FILES:
+            try:
+                result[name] = (self.settings_dir / name).stat().st_mtime_ns
+            except FileNotFoundError:
+                result[name] = None
+        return result
+
+    def poll(self) -> Optional[SettingsChange]:
+        if self._pending:
+            if not self._pending.done():
+                return None
+            return self._apply(self._pending)
+
+        mtimes = self.get_mtimes()
+        if mtimes != self.mtimes:
+            self.mtimes = mtimes
+            self._pending = self._executor.submit(load_context, self.settings_dir)
+        return None
+
+    def _apply(self, future: Future) -> Optional[SettingsChange]:
+        self._pending = None
+        try:
+            context = future.result()
+        except Exception:
+            self.on_error(traceback.format_exc(limit=0))
+            return None
+
+        change = SettingsChange.from_contexts(self.context, context)
+        self.context = context
+        set_default_context(context)
+        if change:
+            self.on_change(change)
+        return change
+
+    def stop(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import bisect
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional
+
+from chord_hand.chord.pitch_class import get_bass_mask, get_chord_mask
+from chord_hand.corpus import iter_song_paths, parallel_map
+from chord_hand.search import Hit
+from chord_hand.settings import SettingsContext
+from chord_hand.song import Song
+from chord_hand.trace import traced
+
+BASS_SHIFT = 12  # bits of a packed chord above the pitch class mask, which hold the bass pitch class
+
+
+def pack_chord(chord) -> int:
+    # 16 bits: the 12-bit pitch class mask of the chord, plus the pitch class of its bass.
+    # 0 if the chord has no known pitch classes.
+    mask = get_chord_mask(chord)
+    if not mask:
+        return 0
+    return mask | (get_bass_mask(chord).bit_length() - 1) << BASS_SHIFT
+
+
+def unpack_chord(packed: int, use_bass: bool = True) -> int:
+    # the pitch class mask, with the bass as 12 more bits when use_bass is True
+    mask = packed & 0xFFF
+    if use_bass and mask:
+        mask |= 1 << (packed >> BASS_SHIFT) << BASS_SHIFT
+    return mask
+
+
+def get_distance(mask: int, other: int, metric: str = 'jaccard') -> float:
+    if metric == 'hamming':
+        return (mask ^ other).bit_count()
+    if metric == 'jaccard':
+        union = (mask | other).bit_count()
+        return 1 - (mask & other).bit_count() / union if union else 0.0
+    raise ValueError(f'Unknown metric: {metric}')
+
+
+@dataclass
+class SongMasks:
+    chords: array  # packed chords, as in pack_chord
+    measure_starts: array  # index in chords of the first chord of each measure
+
+    @classmethod
+    def from_song(cls, song: Song):
+        chords = array('H')
+        measure_starts = array('l')
+        for measure in song.chords:
+            measure_starts.append(len(chords))
+            chords.extend(pack_chord(chord) for chord in measure)
+        return cls(chords, measure_starts)
+
+    def get_location(self, index: int) -> tuple[int, int]:
+        measure = bisect.bisect_right(self.measure_starts, index) - 1
+        return measure, index - self.measure_starts[measure]
+
+    def iter_measure_masks(self):
+        # union of the pitch classes of the chords of each measure
+        ends = list(self.measure_starts[1:]) + [len(self.chords)]
+        for start, end in zip(self.measure_starts, ends):
+            mask = 0
+            for packed in self.chords[start:end]:
+                mask |= packed
+            yield mask & 0xFFF
+
+
+def get_song_masks_file(path) -> SongMasks:
+    return SongMasks.from_song(Song.load(path))
+
+
+class SimilarityIndex:
+    # Locations are grouped by mask, so a query computes the distance to each distinct mask only once.
+    def __init__(self, songs: dict[str, SongMasks]):
+        self.songs = songs
+        self.chord_to_hits = defaultdict(list)
+        self.measure_to_hits = defaultdict(list)
+        for name, song_masks in songs.items():
+            for i, packed in enumerate(song_masks.chords):
+                if packed:
+                    self.chord_to_hits[packed].append(Hit(name, *song_masks.get_location(i)))
+            for i, mask in enumerate(song_masks.iter_measure_masks()):
+                if mask:
+                    self.measure_to_hits[mask].append(Hit(name, i, 0))
+
+    def nearest_chords(
+            self, chord, n: int = 10, metric: str = 'jaccard', use_bass: bool = True
+    ) -> list[tuple[float, Hit]]:
+        query = unpack_chord(pack_chord(chord), use_bass)
+        if not query:
+            return []
+        return self._nearest(query, self.chord_to_hits, lambda packed: unpack_chord(packed, use_bass), n, metric)
+
+    def nearest_measures(self, chords: Iterable, n: int = 10, metric: str = 'jaccard') -> list[tuple[float, Hit]]:
+        query = 0
+        for chord in chords:
+            query |= get_chord_mask(chord)
+        if not query:
+            return []
+        return self._nearest(query, self.measure_to_hits, lambda mask: mask, n, metric)
+
+    @staticmethod
+    def _nearest(query, key_to_hits, key_to_mask, n, metric):
+        distances = sorted((get_distance(query, key_to_mask(key), metric), key) for key in key_to_hits)
+        result = []
+        for distance, key in distances:
+            result.extend((distance, hit) for hit in key_to_hits[key][:n - len(result)])
+            if len(result) >= n:
+                break
+        return result
+
+
+@traced()
+def get_similarity_index(
+        corpus_dir: Path, context: Optional[SettingsContext] = None, workers: Optional[int] = None
+) -> SimilarityIndex:
+    paths = list(iter_song_paths(corpus_dir))
+    song_masks = parallel_map(get_song_masks_file, paths, context, workers)
+    return SimilarityIndex({
+        str(path.relative_to(corpus_dir)): masks for path, masks in zip(paths, song_masks)
+    })
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import bisect
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Union
+
+from chord_hand.analysis import HarmonicAnalysis, analyze
+from chord_hand.analysis.harmonic_region import HarmonicRegion
+from chord_hand.chord.chord import Chord, RepeatChord
+from chord_hand.chord.note import Note
+from chord_hand.settings import get_context
+from chord_hand.timeline import Timeline
+from chord_hand.trace import count, traced
+
+
+@dataclass
+class Section:
+    # Measures that a song plays several times, e.g. a chorus. Its instances in a song share its
+    # measure lists, so editing them in place edits every instance.
+    name: str
+    chords: list[list[Chord]] = field(default_factory=list)
+
+    def __post_init__(self):
+        # analyses of each measure by the regions of an instance, for the context they were made with
+        self.context = None
+        self.region_key_to_analyses = {}
+
+    def __len__(self):
+        return len(self.chords)
+
+    def get_analyses(self, regions: list[Optional[HarmonicRegion]], context=None) -> list[list[Optional[HarmonicAnalysis]]]:
+        context = context or get_context()
+        if context is not self.context:
+            self.clear_analyses()
+            self.context = context
+        key = tuple(map(get_region_key, regions))
+        if key not in self.region_key_to_analyses:
+            self.region_key_to_analyses[key] = [
+                [analyze(chord, region, context=context) for chord in chords] if region else []
+                for chords, region in zip(self.chords, regions)
+            ]
+            count('sections analyzed')
+        return self.region_key_to_analyses[key]
+
+    def clear_analyses(self):
+        self.region_key_to_analyses = {}
+
+
+@dataclass
+class SectionInstance:
+    section: str
+    start: int  # measure
+
+
+@dataclass
+class Song:
+    chords: list[list[Chord]] = field(default_factory=list)
+    regions: list[Optional[HarmonicRegion]] = field(default_factory=list)
+    analyses: list[list[Optional[HarmonicAnalysis]]] = field(default_factory=list)
+    analytic_type_locked: list[bool] = field(default_factory=list)
+    timeline: Optional[Timeline] = None  # songs without one are in 4/4, with evenly spaced chords
+    sections: dict[str, Section] = field(default_factory=dict)
+    form: list[SectionInstance] = field(default_factory=list)  # in order of their start
+
+    def __post_init__(self):
+        n_measures = max([len(self.chords)] + [self.get_instance_end(instance) for instance in self.form])
+        self.chords = list(self.chords) + [[] for _ in range(n_measures - len(self.chords))]
+        for instance in self.form:
+            self.expand(instance)
+        self.regions = (list(self.regions) + [None] * n_measures)[:n_measures]
+        self.analyses = (list(self.analyses) + [[] for _ in range(n_measures)])[:n_measures]
+        self.analytic_type_locked = (list(self.analytic_type_locked) + [False] * n_measures)[:n_measures]
+
+    def __len__(self):
+        return len(self.chords)
+
+    def get_instance_end(self, instance: SectionInstance) -> int:
+        return instance.start + len(self.sections[instance.section])
+
+    def expand(self, instance: SectionInstance):
+        # the measures of an instance are those of its section, not copies
+        for i, chords in enumerate(self.sections[instance.section].chords, instance.start):
+            self.chords[i] = chords
+
+    def get_instance_at(self, measure: int) -> Optional[SectionInstance]:
+        i = bisect.bisect_right([instance.start for instance in self.form], measure) - 1
+        if i >= 0 and measure < self.get_instance_end(self.form[i]):
+            return self.form[i]
+        return None
+
+    def add_section(self, name: str, start: int, end: int) -> Section:
+        # makes a section of measures start to end, which become its first instance
+        section = Section(name, self.chords[start:end])
+        self.sections[name] = section
+        self.add_instance(name, start)
+        return section
+
+    def add_instance(self, name: str, start: int):
+        # the measures from start on are replaced by the section's
+        instance = SectionInstance(name, start)
+        self.form.insert(bisect.bisect_right([i.start for i in self.form], start), instance)
+        self.expand(instance)
+
+    def set_chords(self, measure: int, chords: list[Chord]):
+        # Measures of sections are changed in place, so every instance changes.
+        self.chords[measure][:] = chords
+        if instance := self.get_instance_at(measure):
+            self.sections[instance.section].clear_analyses()
+
+    def analyze(self, context=None):
+        # Each section is analyzed once for each of the regions its instances are in.
+        is_analyzed = [False] * len(self)
+        for instance in self.form:
+            end = self.get_instance_end(instance)
+            analyses = self.sections[instance.section].get_analyses(self.regions[instance.start:end], context)
+            for i, measure_analyses in enumerate(analyses, instance.start):
+                if not self.analytic_type_locked[i]:
+                    self.analyses[i] = measure_analyses
+                is_analyzed[i] = True
+
+        for i, (chords, region) in enumerate(zip(self.chords, self.regions)):
+            if self.analytic_type_locked[i] or is_analyzed[i]:
+                continue
+            self.analyses[i] = [analyze(chord, region, context=context) for chord in chords] if region else []
+
+    def to_dict(self, expand_sections=False):
+        # The chords of sections are written once, unless expand_sections is set, for readers
+        # that don't know about them.
+        form = [] if expand_sections else self.form
+        in_section = [False] * len(self)
+        for instance in form:
+            in_section[instance.start:self.get_instance_end(instance)] = [True] * len(self.sections[instance.section])
+        return {
+            'chords': {i: serialize_chord_list(bar) for i, bar in enumerate(self.chords) if not in_section[i]},
+            'analyses': {
+                i: {
+                    'analyses': list(map(serialize_analysis, analyses)),
+                    'analytic_type_locked': locked
+                }
+                for i, (analyses, locked) in enumerate(zip(self.analyses, self.analytic_type_locked))
+            },
+            'regions': {i: serialize_region(region) for i, region in enumerate(self.regions)},
+            **({'timeline': self.timeline.to_dict()} if self.timeline else {}),
+            **({
+                'n_measures': len(self),
+                'sections': {name: list(map(serialize_chord_list, section.chords)) for name, section in self.sections.items()},
+                'form': [[instance.section, instance.start] for instance in form],
+            } if form else {}),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        n_to_chords = data['chords']
+        n_measures = data.get('n_measures', len(n_to_chords))
+
+        chords = [[] for _ in range(n_measures)]
+        for n, chord_data in n_to_chords.items():
+            chords[int(n)] = list(map(deserialize_chord, chord_data))
+
+        regions = [None] * n_measures
+        for n, region_data in data.get('regions', {}).items():
+            regions[int(n)] = HarmonicRegion.from_dict(region_data) if region_data else None
+
+        analyses = [[] for _ in range(n_measures)]
+        analytic_type_locked = [False] * n_measures
+        for n, analyses_data in data.get('analyses', {}).items():
+            if not analyses_data:
+                continue
+            analytic_type_locked[int(n)] = analyses_data['analytic_type_locked']
+            analyses[int(n)] = list(map(deserialize_analysis, analyses_data['analyses']))
+
+        timeline = Timeline.from_dict(data['timeline']) if 'timeline' in data else None
+
+        sections = {
+            name: Section(name, [list(map(deserialize_chord, chord_data)) for chord_data in measures])
+            for name, measures in data.get('sections', {}).items()
+        }
+        form = [SectionInstance(name, start) for name, start in data.get('form', [])]
+
+        return cls(chords, regions, analyses, analytic_type_locked, timeline, sections, form)
+
+    @classmethod
+    @traced('Song.load')
+    def load(cls, path: Union[str, Path]):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    @traced()
+    def save(self, path: Union[str, Path]):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+
+def propagate_regions(regions: list[Optional[HarmonicRegion]]) -> list[Optional[HarmonicRegion]]:
+    # measures without a region of their own inherit the last one set before them
+    result = []
+    current_region = None
+    for region in regions:
+        current_region = region or current_region
+        result.append(current_region)
+    return result
+
+
+def serialize_chord(chord):
+    if not chord or isinstance(chord, RepeatChord):
+        return "RepeatChord()"
+    return chord.to_dict()
+
+
+def get_region_key(region: Optional[HarmonicRegion]):
+    return (region.tonic.step, region.tonic.chroma, region.modality) if region else None
+
+
+def serialize_region(region):
+    return region.to_dict() if region else None
+
+
+def serialize_chord_list(chords):
+    return [serialize_chord(chord) for chord in chords]
+
+
+def serialize_analysis(analysis):
+    return analysis.to_dict() if isinstance(analysis, HarmonicAnalysis) else None
+
+
+def deserialize_chord(data):
+    if not isinstance(data, dict):
+        return None
+    if 'quality' not in data:
+        return Note.from_dict(data)  # incomplete code
+    return Chord.from_dict(data)
+
+
+def deserialize_analysis(data):
+    if not data:
+        return None
+    return HarmonicAnalysis.from_dict(data)
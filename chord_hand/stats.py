@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import csv
+import dataclasses
+import math
+import os
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Optional
+
+from chord_hand.analysis import HarmonicAnalysis, analyze
+from chord_hand.chord.chord import Chord
+from chord_hand.chord.quality import CustomChordQuality
+from chord_hand.corpus import iter_song_paths, parallel_map
+from chord_hand.projeto_mpb import analysis_to_projeto_mpb_code
+from chord_hand.settings import SettingsContext, get_context
+from chord_hand.song import Song
+from chord_hand.trace import traced
+
+KINDS = ('symbol', 'quality', 'analysis', 'function')
+MAX_N = 3
+ALL_REGIONS = '*'
+SONGS_PER_TASK = 32
+
+
+def get_tokens(chord, analysis, region, context: Optional[SettingsContext] = None) -> dict[str, Optional[str]]:
+    if not isinstance(chord, Chord):
+        return dict.fromkeys(KINDS)
+
+    is_analyzed = isinstance(analysis, HarmonicAnalysis)
+    function = None
+    if is_analyzed and not isinstance(chord.quality, CustomChordQuality):
+        function = analysis_to_projeto_mpb_code(analysis, region.modality, context) or None
+
+    return {
+        'symbol': chord.to_symbol(context),
+        'quality': chord.quality.to_string(),
+        'analysis': analysis.to_symbol() if is_analyzed else None,
+        'function': function,
+    }
+
+
+def iter_region_segments(song: Song):
+    # runs of consecutive chords in the same region, as lists of (chord, analysis)
+    segment = []
+    current_region = None
+    for chords, region, analyses in zip(song.chords, song.regions, song.analyses):
+        if region != current_region and segment:
+            yield current_region, segment
+            segment = []
+        current_region = region
+        segment.extend(zip(chords, analyses + [None] * (len(chords) - len(analyses))))
+    if segment:
+        yield current_region, segment
+
+
+def count_song(song: Song, max_n: int = MAX_N, context: Optional[SettingsContext] = None) -> Counter:
+    # n-grams are counted within a region, so that counts per region add up to the counts of the song.
+    # A chord without a token (e.g. an incomplete code or a chord without function code) breaks the n-gram.
+    # Stored analyses are counted as they are, e.g. those inferred from the chords that follow. Measures
+    # without any are analyzed, in a copy of the song.
+    counts = Counter()
+    song = dataclasses.replace(song, analyses=[
+        analyses if any(analyses) or not region else [analyze(chord, region, context=context) for chord in chords]
+        for chords, region, analyses in zip(song.chords, song.regions, song.analyses)
+    ])
+    for region, segment in iter_region_segments(song):
+        if not region:
+            continue
+        group = region.to_symbol()
+        kind_to_tokens = defaultdict(list)
+        for chord, analysis in segment:
+            for kind, token in get_tokens(chord, analysis, region, context).items():
+                kind_to_tokens[kind].append(token)
+        for kind, tokens in kind_to_tokens.items():
+            for n in range(1, max_n + 1):
+                for gram in zip(*[tokens[i:] for i in range(n)]):
+                    if None not in gram:
+                        counts[(kind, group, gram)] += 1
+    return counts
+
+
+def count_song_files(args) -> Counter:
+    paths, max_n = args
+    counts = Counter()
+    for path in paths:
+        counts.update(count_song(Song.load(path), max_n))
+    return counts
+
+
+@dataclass
+class NgramTable:
+    # Counts of one kind of token. Tokens are numbered by decreasing frequency. Unigram counts are
+    # dense arrays indexed by token id. Longer n-grams are sparse, as sorted packed ids with their counts.
+    kind: str
+    tokens: list[str]
+    group_to_counts: dict[str, dict[int, array]] = field(default_factory=dict)
+    group_to_keys: dict[str, dict[int, array]] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self.token_to_id = {token: i for i, token in enumerate(self.tokens)}
+
+    @property
+    def groups(self):
+        return list(self.group_to_counts)
+
+    def pack(self, gram: Iterable[str]) -> int:
+        key = 0
+        for token in gram:
+            key = key * len(self.tokens) + self.token_to_id[token]
+        return key
+
+    def unpack(self, key: int, n: int) -> tuple[str, ...]:
+        ids = []
+        for _ in range(n):
+            key, i = divmod(key, len(self.tokens))
+            ids.append(i)
+        return tuple(self.tokens[i] for i in reversed(ids))
+
+    def get_count(self, gram: Iterable[str], group: str = ALL_REGIONS) -> int:
+        gram = tuple(gram)
+        if any(token not in self.token_to_id for token in gram) or group not in self.group_to_counts:
+            return 0
+        key = self.pack(gram)
+        n = len(gram)
+        if n == 1:
+            return self.group_to_counts[group][n][key]
+        keys = self.group_to_keys[group][n]
+        i = bisect_left(keys, key)
+        return self.group_to_counts[group][n][i] if i < len(keys) and keys[i] == key else 0
+
+    def iter_counts(self, n: int, group: str = ALL_REGIONS):
+        counts = self.group_to_counts[group][n]
+        if n == 1:
+            keys = range(len(counts))
+        else:
+            keys = self.group_to_keys[group][n]
+        for key, count in zip(keys, counts):
+            if count:
+                yield self.unpack(key, n), count
+
+    def get_transition_probabilities(self, group: str = ALL_REGIONS) -> list[list[float]]:
+        size = len(self.tokens)
+        rows = [[0] * size for _ in range(size)]
+        for key, count in zip(self.group_to_keys[group][2], self.group_to_counts[group][2]):
+            rows[key // size][key % size] = count
+        for row in rows:
+            total = sum(row)
+            if total:
+                row[:] = [count / total for count in row]
+        return rows
+
+    @classmethod
+    def from_counts(cls, kind: str, group_to_gram_counts: dict[str, Counter], max_n: int = MAX_N):
+        unigram_totals = Counter()
+        for gram_counts in group_to_gram_counts.values():
+            for gram, count in gram_counts.items():
+                if len(gram) == 1:
+                    unigram_totals[gram[0]] += count
+        tokens = sorted(unigram_totals, key=lambda token: (-unigram_totals[token], token))
+        table = cls(kind, tokens)
+
+        all_regions = Counter()
+        for gram_counts in group_to_gram_counts.values():
+            all_regions.update(gram_counts)
+
+        for group, gram_counts in sorted(group_to_gram_counts.items()) + [(ALL_REGIONS, all_regions)]:
+            n_to_counts = {}
+            n_to_keys = {}
+            for n in range(1, max_n + 1):
+                if n == 1:
+                    counts = array('l', bytes(array('l').itemsize * len(tokens)))
+                    for gram, count in gram_counts.items():
+                        if len(gram) == n:
+                            counts[table.pack(gram)] = count
+                else:
+                    packed = sorted((table.pack(gram), count) for gram, count in gram_counts.items() if len(gram) == n)
+                    n_to_keys[n] = array('q', [key for key, _ in packed])
+                    counts = array('l', [count for _, count in packed])
+                n_to_counts[n] = counts
+            table.group_to_counts[group] = n_to_counts
+            table.group_to_keys[group] = n_to_keys
+
+        return table
+
+
+@dataclass
+class CorpusStats:
+    max_n: int
+    n_songs: int
+    kind_to_table: dict[str, NgramTable]
+
+    @classmethod
+    def from_counts(cls, counts: Counter, n_songs: int, max_n: int = MAX_N):
+        kind_to_group_to_gram_counts = defaultdict(lambda: defaultdict(Counter))
+        for (kind, group, gram), count in counts.items():
+            kind_to_group_to_gram_counts[kind][group][gram] = count
+        return cls(max_n, n_songs, {
+            kind: NgramTable.from_counts(kind, kind_to_group_to_gram_counts.get(kind, {}), max_n)
+            for kind in KINDS
+        })
+
+    def write_csv(self, output_dir: Path):
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        for kind, table in self.kind_to_table.items():
+            for n in range(1, self.max_n + 1):
+                with open(output_dir / f'{kind}_{n}grams.csv', 'w', newline='', encoding='utf-8') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(['region'] + [f'token_{i + 1}' for i in range(n)] + ['count'])
+                    for group in table.groups:
+                        rows = sorted(table.iter_counts(n, group), key=lambda x: (-x[1], x[0]))
+                        writer.writerows([group, *gram, count] for gram, count in rows)
+
+            with open(output_dir / f'{kind}_transitions.csv', 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow([''] + table.tokens)
+                for token, row in zip(table.tokens, table.get_transition_probabilities()):
+                    writer.writerow([token] + [round(p, 6) for p in row])
+
+
+@traced()
+def get_corpus_stats(
+        corpus_dir: Path,
+        max_n: int = MAX_N,
+        context: Optional[SettingsContext] = None,
+        workers: Optional[int] = None
+) -> CorpusStats:
+    # each task counts a chunk of songs, so that fewer partial counts are sent back to be merged
+    paths = list(iter_song_paths(corpus_dir))
+    chunk_size = max(1, min(SONGS_PER_TASK, math.ceil(len(paths) / (workers or os.cpu_count() or 1))))
+    tasks = [(paths[i:i + chunk_size], max_n) for i in range(0, len(paths), chunk_size)]
+    counts = Counter()
+    for partial_counts in parallel_map(count_song_files, tasks, context or get_context(), workers, chunksize=1):
+        counts.update(partial_counts)
+    return CorpusStats.from_counts(counts, len(paths), max_n)
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import bisect
+from array import array
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+# Times within a song are in quarter notes from its start, whatever the meter, so that tempos are
+# always in quarter notes per minute.
+DEFAULT_TEMPO = 120.0
+SECONDS_PER_MINUTE = 60.0
+
+
+@dataclass(frozen=True)
+class Meter:
+    beats: int = 4
+    beat_unit: int = 4
+
+    def get_length(self) -> float:
+        # in quarter notes
+        return self.beats * 4 / self.beat_unit
+
+    def to_string(self):
+        return f'{self.beats}/{self.beat_unit}'
+
+    @classmethod
+    def from_string(cls, string):
+        beats, beat_unit = string.split('/')
+        return cls(int(beats), int(beat_unit))
+
+
+DEFAULT_METER = Meter()
+
+
+@dataclass
+class Timeline:
+    # Everything is sparse, so that a song without a timeline is in 4/4 at DEFAULT_TEMPO with
+    # the chords of each measure evenly spaced, as positions were before timelines.
+    meter_changes: dict[int, Meter] = field(default_factory=dict)  # measure -> meter from it on
+    durations: dict[int, list[float]] = field(default_factory=dict)  # measure -> quarter notes of each chord
+    tempo_changes: dict[float, float] = field(default_factory=dict)  # quarter note -> tempo from it on
+    # quarter note -> seconds, e.g. measure starts tapped along a recording. With two or more,
+    # they replace tempos and times are interpolated between them.
+    anchors: dict[float, float] = field(default_factory=dict)
+
+    def __post_init__(self):
+        beats = sorted(self.anchors)
+        for beat, next_beat in zip(beats, beats[1:]):
+            if self.anchors[next_beat] <= self.anchors[beat]:
+                raise ValueError(
+                    f'Anchor seconds must increase with quarter notes, but {next_beat} is at '
+                    f'{self.anchors[next_beat]} s and {beat} at {self.anchors[beat]} s'
+                )
+
+    def to_dict(self):
+        return {
+            'meter_changes': {i: meter.to_string() for i, meter in self.meter_changes.items()},
+            'durations': {i: durations for i, durations in self.durations.items()},
+            'tempo_changes': {str(beat): tempo for beat, tempo in self.tempo_changes.items()},
+            'anchors': {str(beat): seconds for beat, seconds in self.anchors.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            meter_changes={int(i): Meter.from_string(meter) for i, meter in data.get('meter_changes', {}).items()},
+            durations={int(i): list(map(float, durations)) for i, durations in data.get('durations', {}).items()},
+            tempo_changes={float(beat): float(tempo) for beat, tempo in data.get('tempo_changes', {}).items()},
+            anchors={float(beat): float(seconds) for beat, seconds in data.get('anchors', {}).items()},
+        )
+
+    def get_meters(self, n_measures: int) -> list[Meter]:
+        meters = []
+        meter = DEFAULT_METER
+        for i in range(n_measures):
+            meter = self.meter_changes.get(i, meter)
+            meters.append(meter)
+        return meters
+
+    def get_offsets(self, measure: int, n_chords: int, length: float) -> list[float]:
+        # quarter notes from the start of the measure to each chord
+        durations = self.durations.get(measure)
+        if not durations or len(durations) != n_chords:
+            return [length * j / n_chords for j in range(n_chords)]
+        offsets = []
+        offset = 0.0
+        for duration in durations:
+            offsets.append(min(offset, length))
+            offset += duration
+        return offsets
+
+    def get_breakpoints(self) -> tuple[list[float], list[float], float]:
+        # (quarter notes, seconds) where the rate of time changes, and the seconds per quarter note
+        # after the last one
+        if len(self.anchors) >= 2:
+            beats = sorted(self.anchors)
+            seconds = [self.anchors[beat] for beat in beats]
+            return beats, seconds, (seconds[-1] - seconds[-2]) / (beats[-1] - beats[-2])
+
+        tempo_changes = sorted({0.0: DEFAULT_TEMPO, **self.tempo_changes}.items())
+        beats, seconds = [], []
+        elapsed = 0.0
+        for i, (beat, tempo) in enumerate(tempo_changes):
+            if i:
+                previous_beat, previous_tempo = tempo_changes[i - 1]
+                elapsed += (beat - previous_beat) * SECONDS_PER_MINUTE / previous_tempo
+            beats.append(beat)
+            seconds.append(elapsed)
+        if self.anchors:  # a single anchor only offsets the tempo map
+            [(beat, anchor_seconds)] = self.anchors.items()
+            offset = anchor_seconds - interpolate(beats, seconds, SECONDS_PER_MINUTE / tempo_changes[-1][1], beat)
+            seconds = [s + offset for s in seconds]
+        return beats, seconds, SECONDS_PER_MINUTE / tempo_changes[-1][1]
+
+
+def interpolate(xs: list[float], ys: list[float], last_rate: float, x: float) -> float:
+    # piecewise linear, continuing with the rate of the first or last segment outside of xs
+    i = bisect.bisect_right(xs, x) - 1
+    if i < 0:
+        i = 0
+    if i + 1 < len(xs):
+        rate = (ys[i + 1] - ys[i]) / (xs[i + 1] - xs[i])
+    elif len(xs) > 1 and x < xs[0]:
+        rate = (ys[1] - ys[0]) / (xs[1] - xs[0])
+    else:
+        rate = last_rate
+    return ys[i] + (x - xs[i]) * rate
+
+
+@dataclass
+class ChordTime:
+    measure: int
+    index: int
+    start: float  # quarter notes
+    end: float
+    start_seconds: float
+    end_seconds: float
+
+
+class TimelineIndex:
+    # Start and end of every chord of a song, in quarter notes and seconds. Time to chord lookups are
+    # binary searches, and queries just after the previous one, as when following playback, first
+    # check the chord found last.
+    def __init__(self, chords: list[list], timeline: Optional[Timeline] = None):
+        timeline = timeline or Timeline()
+        self.positions = []  # (measure, index) of each chord
+        self.starts = array('d')
+        self.ends = array('d')
+        self.measure_starts = array('d')
+
+        start = 0.0
+        for i, (measure, meter) in enumerate(zip(chords, timeline.get_meters(len(chords)))):
+            self.measure_starts.append(start)
+            length = meter.get_length()
+            offsets = timeline.get_offsets(i, len(measure), length)
+            for j, offset in enumerate(offsets):
+                self.positions.append((i, j))
+                self.starts.append(start + offset)
+                self.ends.append(start + (offsets[j + 1] if j + 1 < len(offsets) else length))
+            start += length
+        self.length = start
+
+        self.breakpoint_beats, self.breakpoint_seconds, self.last_rate = timeline.get_breakpoints()
+        self.last_beat_rate = 1 / self.last_rate
+        self.last_found = 0
+
+    def __len__(self):
+        return len(self.positions)
+
+    def to_seconds(self, beat: float) -> float:
+        return interpolate(self.breakpoint_beats, self.breakpoint_seconds, self.last_rate, beat)
+
+    def to_beat(self, seconds: float) -> float:
+        return interpolate(self.breakpoint_seconds, self.breakpoint_beats, self.last_beat_rate, seconds)
+
+    def find(self, beat: float) -> Optional[int]:
+        # index of the chord sounding at beat, None in measures without chords and outside the song
+        i = self.last_found
+        for candidate in (i, i + 1):
+            if candidate < len(self.starts) and self.starts[candidate] <= beat < self.ends[candidate]:
+                self.last_found = candidate
+                return candidate
+        i = bisect.bisect_right(self.starts, beat) - 1
+        if i < 0 or beat >= self.ends[i]:
+            return None
+        self.last_found = i
+        return i
+
+    def get_chord_at_beat(self, beat: float) -> Optional[tuple[int, int]]:
+        i = self.find(beat)
+        return None if i is None else self.positions[i]
+
+    def get_chord_at_seconds(self, seconds: float) -> Optional[tuple[int, int]]:
+        return self.get_chord_at_beat(self.to_beat(seconds))
+
+    def get_measure_end(self, measure: int) -> float:
+        return self.measure_starts[measure + 1] if measure + 1 < len(self.measure_starts) else self.length
+
+    def get_measure_at_beat(self, beat: float) -> Optional[int]:
+        if not 0 <= beat < self.length:
+            return None
+        return bisect.bisect_right(self.measure_starts, beat) - 1
+
+    def iter_chord_times(self) -> Iterator[ChordTime]:
+        for (measure, index), start, end in zip(self.positions, self.starts, self.ends):
+            yield ChordTime(measure, index, start, end, self.to_seconds(start), self.to_seconds(end))
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Union
+
+# Set to a file path to record a trace of the whole session and write it there on exit.
+ENV_VAR = 'CHORDHAND_TRACE'
+
+_enabled = False
+_spans = []  # (name, start_ns, duration_ns, thread_id)
+_counter_events = []  # (name, time_ns, value)
+_counters = defaultdict(int)
+_origin_ns = time.perf_counter_ns()
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def clear():
+    _spans.clear()
+    _counter_events.clear()
+    _counters.clear()
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        end = time.perf_counter_ns()
+        _spans.append((self.name, self.start, end - self.start, threading.get_ident()))
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str):
+    return _Span(name) if _enabled else _NULL_SPAN
+
+
+def traced(name: str = None):
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                end = time.perf_counter_ns()
+                _spans.append((span_name, start, end - start, threading.get_ident()))
+
+        return wrapper
+
+    return decorator
+
+
+def count(name: str, value: int = 1):
+    if not _enabled:
+        return
+    _counters[name] += value
+    _counter_events.append((name, time.perf_counter_ns(), _counters[name]))
+
+
+def get_chrome_trace():
+    pid = os.getpid()
+    events = [
+        {
+            'name': name,
+            'ph': 'X',
+            'ts': (start - _origin_ns) / 1000,
+            'dur': duration / 1000,
+            'pid': pid,
+            'tid': tid,
+        }
+        for name, start, duration, tid in _spans
+    ]
+    events += [
+        {
+            'name': name,
+            'ph': 'C',
+            'ts': (timestamp - _origin_ns) / 1000,
+            'pid': pid,
+            'args': {name: value},
+        }
+        for name, timestamp, value in _counter_events
+    ]
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def write_chrome_trace(path: Union[str, Path]):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(get_chrome_trace(), f)
+
+
+def get_summary():
+    # [name, calls, total ms, mean ms, max ms], slowest first
+    name_to_durations = defaultdict(list)
+    for name, _, duration, _ in _spans:
+        name_to_durations[name].append(duration)
+
+    rows = [
+        [name, len(durations), sum(durations) / 1e6, sum(durations) / len(durations) / 1e6, max(durations) / 1e6]
+        for name, durations in name_to_durations.items()
+    ]
+    return sorted(rows, key=lambda row: row[2], reverse=True)
+
+
+def format_summary():
+    lines = [f'{"span":<40} {"calls":>8} {"total ms":>12} {"mean ms":>10} {"max ms":>10}']
+    for name, calls, total, mean, maximum in get_summary():
+        lines.append(f'{name:<40} {calls:>8} {total:>12.3f} {mean:>10.4f} {maximum:>10.4f}')
+
+    if _counters:
+        lines.append('')
+        lines.append(f'{"counter":<40} {"value":>8}')
+        for name, value in sorted(_counters.items()):
+            lines.append(f'{name:<40} {value:>8}')
+
+    return '\n'.join(lines)
+
+
+def write_summary(path: Union[str, Path]):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(format_summary() + '\n')
+
+
+def save(path: Union[str, Path]):
+    path = Path(path)
+    write_chrome_trace(path)
+    write_summary(path.with_suffix('.summary.txt'))
+
+
+def _save_on_exit(path):
+    save(path)
+    print(format_summary(), file=sys.stderr)
+
+
+if os.environ.get(ENV_VAR):
+    enable()
+    atexit.register(_save_on_exit, os.environ[ENV_VAR])
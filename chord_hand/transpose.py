@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import copy
+import operator
+from array import array
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from chord_hand.analysis.harmonic_region import HarmonicRegion
+from chord_hand.chord.chord import Chord
+from chord_hand.chord.note import Note, STEP_TO_PITCH_CLASS
+from chord_hand.song import Section, SectionInstance, Song
+
+MAX_CHROMA = 2
+N_STEPS = 7
+N_CHROMAS = 2 * MAX_CHROMA + 1
+ERROR_NOTE_INDEX = N_STEPS * N_CHROMAS  # Note(-1, 0), left untouched
+N_NOTE_INDICES = ERROR_NOTE_INDEX + 1
+N_INTERVALS = N_STEPS * 12
+
+# every note the keymap can express, indexed by step * N_CHROMAS + chroma + MAX_CHROMA
+INDEX_TO_NOTE = tuple(
+    Note(step, chroma) for step in range(N_STEPS) for chroma in range(-MAX_CHROMA, MAX_CHROMA + 1)
+) + (Note(-1, 0),)
+
+
+@dataclass(frozen=True)
+class Interval:
+    steps: int  # diatonic steps, 0 to 6
+    semitones: int  # 0 to 11
+
+    def __post_init__(self):
+        object.__setattr__(self, 'steps', self.steps % N_STEPS)
+        object.__setattr__(self, 'semitones', self.semitones % 12)
+
+    @classmethod
+    def between(cls, start: Note, end: Note):
+        return cls(end.step - start.step, end.to_pitch_class() - start.to_pitch_class())
+
+    def to_index(self):
+        return self.steps * 12 + self.semitones
+
+
+def note_to_index(note: Note) -> int:
+    if note.step < 0 or abs(note.chroma) > MAX_CHROMA:
+        return ERROR_NOTE_INDEX
+    return note.step * N_CHROMAS + note.chroma + MAX_CHROMA
+
+
+def get_chroma(step: int, pitch_class: int) -> int:
+    # the accidental that spells pitch_class on step, between -6 and 5
+    chroma = (pitch_class - STEP_TO_PITCH_CLASS[step]) % 12
+    return chroma - 12 if chroma > 6 else chroma
+
+
+def transpose_note(note: Note, interval: Interval) -> Note:
+    if note.step < 0:
+        return note
+
+    step = (note.step + interval.steps) % N_STEPS
+    pitch_class = (note.to_pitch_class() + interval.semitones) % 12
+    chroma = get_chroma(step, pitch_class)
+    if abs(chroma) <= MAX_CHROMA:
+        return Note(step, chroma)
+
+    # respell enharmonically on the nearest step that can hold the pitch class,
+    # looking first in the direction of the overflow
+    direction = 1 if chroma > 0 else -1
+    for distance in range(1, 4):
+        for respelled_step in ((step + direction * distance) % N_STEPS, (step - direction * distance) % N_STEPS):
+            respelled_chroma = get_chroma(respelled_step, pitch_class)
+            if abs(respelled_chroma) <= MAX_CHROMA:
+                return Note(respelled_step, respelled_chroma)
+
+    raise ValueError(f'Could not spell pitch class {pitch_class}')
+
+
+def _build_transposition_table():
+    # flat table indexed by interval index * N_NOTE_INDICES + note index
+    table = array('b')
+    for interval_index in range(N_INTERVALS):
+        interval = Interval(interval_index // 12, interval_index % 12)
+        for note in INDEX_TO_NOTE:
+            table.append(note_to_index(transpose_note(note, interval)))
+    return table
+
+
+TRANSPOSITION_TABLE = _build_transposition_table()
+
+
+def transpose_note_indices(note_indices: array, table_offsets: array) -> array:
+    return array('b', map(TRANSPOSITION_TABLE.__getitem__, map(operator.add, table_offsets, note_indices)))
+
+
+def _get_measures(song: Song) -> list[list]:
+    # those of the song, then those of sections it doesn't play
+    played = {instance.section for instance in song.form}
+    return song.chords + [
+        measure for name, section in song.sections.items() if name not in played for measure in section.chords
+    ]
+
+
+def _iter_song_notes(song: Song):
+    for measure in _get_measures(song):
+        for chord in measure:
+            if isinstance(chord, Chord):
+                yield chord.root
+                yield chord.bass
+            elif isinstance(chord, Note):
+                yield chord
+    for region in song.regions:
+        if region:
+            yield region.tonic
+
+
+def _rebuild_song(song: Song, notes) -> Song:
+    # consumes transposed notes in the order they were yielded by _iter_song_notes
+    chords = []
+    for measure in _get_measures(song):
+        transposed_measure = []
+        for chord in measure:
+            if isinstance(chord, Chord):
+                root, bass = next(notes), next(notes)
+                transposed_measure.append(Chord(root, chord.quality, bass))
+            elif isinstance(chord, Note):
+                transposed_measure.append(next(notes))
+            else:
+                transposed_measure.append(chord)
+        chords.append(transposed_measure)
+
+    regions = [HarmonicRegion(next(notes), region.modality) if region else None for region in song.regions]
+
+    # sections are made of their transposed measures in their first instance, or after the song's
+    sections = {}
+    section_chords = iter(chords[len(song):])
+    for name, section in song.sections.items():
+        instance = next((instance for instance in song.form if instance.section == name), None)
+        if instance:
+            measures = chords[instance.start:instance.start + len(section)]
+        else:
+            measures = [next(section_chords) for _ in range(len(section))]
+        sections[name] = Section(name, measures)
+    chords = chords[:len(song)]
+
+    # analyses are relative to the region, and times don't depend on pitch, so they are unchanged
+    return Song(
+        chords,
+        regions,
+        [list(analyses) for analyses in song.analyses],
+        list(song.analytic_type_locked),
+        copy.deepcopy(song.timeline),
+        sections,
+        [SectionInstance(instance.section, instance.start) for instance in song.form],
+    )
+
+
+def transpose_songs(songs: Iterable[Song], intervals: Iterable[Interval]) -> list[Song]:
+    songs = list(songs)
+
+    # every note of every song goes in a single column, tagged with its song's slice of the table
+    note_indices = array('b')
+    table_offsets = array('l')
+    for song, interval in zip(songs, intervals):
+        song_note_indices = array('b', map(note_to_index, _iter_song_notes(song)))
+        note_indices.extend(song_note_indices)
+        table_offsets.extend(array('l', [interval.to_index() * N_NOTE_INDICES]) * len(song_note_indices))
+
+    notes = iter(map(INDEX_TO_NOTE.__getitem__, transpose_note_indices(note_indices, table_offsets)))
+    return [_rebuild_song(song, notes) for song in songs]
+
+
+def transpose_song(song: Song, interval: Interval) -> Song:
+    return transpose_songs([song], [interval])[0]
+
+
+def get_song_tonic(song: Song) -> Optional[Note]:
+    return next((region.tonic for region in song.regions if region), None)
+
+
+def normalize_songs(songs: Iterable[Song], tonic: Note = Note(0, 0)) -> list[Song]:
+    # transposes each song so that its first region is on tonic. Songs without regions are left as they are.
+    songs = list(songs)
+    intervals = []
+    for song in songs:
+        song_tonic = get_song_tonic(song)
+        intervals.append(Interval.between(song_tonic, tonic) if song_tonic else Interval(0, 0))
+    return transpose_songs(songs, intervals)
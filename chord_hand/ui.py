@@ -4,9 +4,11 @@ import json
 import subprocess
 import sys
 import traceback
+import xml.etree.ElementTree as ET
+import zipfile
 from pathlib import Path
 
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QPixmap, QPalette
 from PyQt6.QtWidgets import (
     QMainWindow,
@@ -20,19 +22,38 @@ from PyQt6.QtWidgets import (
     QMessageBox,
 )
 
-from chord_hand.analysis import HarmonicAnalysis
+from chord_hand.analysis import HarmonicAnalysis, str_to_note
 from chord_hand.cell import CELL_WIDTH, Cell
+from chord_hand.chart import CHART_SUFFIXES, parse_chart
 from chord_hand.chord.chord import Chord
+from chord_hand.chord.note import Note
+from chord_hand.chord.symbol_parser import parse_chord_symbol_sheet
 from chord_hand.dirs import SETTINGS_DIR
-from chord_hand.encoding.common import decode_chord_code_sequence
+from chord_hand.encoding.common import decode_chord_code_sequence, to_encodable
 from chord_hand.crash_dialog import CrashDialog
 
 from chord_hand.analysis.harmonic_region import HarmonicRegion
+from chord_hand.analysis.inference import infer_song
+from chord_hand.analysis.key_detection import suggest_regions
 from chord_hand.encoding.standard import StandardEncoder
-from chord_hand.settings import name_to_exporter
+from chord_hand.midi.recognizer import ChordRecognizer, RecognitionTable, read_chords
+from chord_hand.midi.smf import MidiFileError
+from chord_hand.midi.source import FileEventSource
+from chord_hand.humdrum import HUMDRUM_SUFFIX, iter_humdrum_songs
+from chord_hand.musicxml import read_musicxml
+from chord_hand.settings import get_context
+from chord_hand.search import update_index_on_save
+from chord_hand.settings.watcher import SettingsWatcher
+from chord_hand.timeline import Timeline
+from chord_hand.song import Section, SectionInstance, Song, serialize_chord_list, serialize_region, serialize_analysis
+from chord_hand.transpose import Interval, get_song_tonic, transpose_song
+from chord_hand import trace
 
 LINE_LENGTH = 4
 FIELD_HEIGHT = 40
+SETTINGS_POLL_INTERVAL = 1000  # ms
+MIDI_POLL_INTERVAL = 10  # ms
+TRANSPOSE_TONICS = ['C', 'C#', 'Db', 'D', 'D#', 'Eb', 'E', 'F', 'F#', 'Gb', 'G', 'G#', 'Ab', 'A', 'A#', 'Bb', 'B']
 
 
 def display_error(title, message):
@@ -55,6 +76,12 @@ class MainWindow(QMainWindow):
         self.field_types = field_types
         self.chord_quality_to_symbol = {}
         self.cells = []
+        self.midi_source = None
+        self.chord_recognizer = None
+        # sections of the song that was loaded, whose instances are edited together
+        self.sections = {}
+        self.form = []
+        self.timeline = None  # of the song that was loaded, saved with it
         self.scene = QGraphicsScene()
         self.view = QGraphicsView()
         self.view.setScene(self.scene)
@@ -65,6 +92,8 @@ class MainWindow(QMainWindow):
         self.add_widgets()
         self.position_widgets()
         self.set_background_color()
+        self.init_settings_watcher()
+        self.init_midi_timer()
         self.show()
 
     def init_menus(self):
@@ -79,6 +108,21 @@ class MainWindow(QMainWindow):
             load_text_action = file_menu.addAction("Load JSON...")
             load_text_action.triggered.connect(load_from_file_func)
 
+            load_midi_action = file_menu.addAction("Load MIDI...")
+            load_midi_action.triggered.connect(self.load_midi_file)
+
+            load_symbols_action = file_menu.addAction("Load chord symbols...")
+            load_symbols_action.triggered.connect(self.load_chord_symbol_sheet)
+
+            load_chart_action = file_menu.addAction("Load chart...")
+            load_chart_action.triggered.connect(self.load_chart)
+
+            load_musicxml_action = file_menu.addAction("Load MusicXML...")
+            load_musicxml_action.triggered.connect(self.load_musicxml_file)
+
+            load_humdrum_action = file_menu.addAction("Load Humdrum...")
+            load_humdrum_action.triggered.connect(self.load_humdrum_file)
+
             file_menu.addSeparator()
 
             save_action = file_menu.addAction("Save as JSON...")
@@ -91,11 +135,8 @@ class MainWindow(QMainWindow):
 
             file_menu.addSeparator()
 
-            export_menu = self.export_menu = file_menu.addMenu('Export as..')
-
-            for id, (name, func) in name_to_exporter.items():
-                action = export_menu.addAction(name + '...')
-                action.triggered.connect(functools.partial(self.export, id))
+            self.export_menu = file_menu.addMenu('Export as..')
+            self.populate_export_menu()
 
             file_menu.addSeparator()
 
@@ -116,11 +157,102 @@ class MainWindow(QMainWindow):
         remove_action = cell_menu.addAction("Remove")
         remove_action.triggered.connect(self.on_remove)
 
+        cell_menu.addSeparator()
+
+        midi_file_input_action = cell_menu.addAction("Play MIDI file into cells...")
+        midi_file_input_action.triggered.connect(self.on_midi_file_input)
+
+        stop_midi_input_action = cell_menu.addAction("Stop MIDI input")
+        stop_midi_input_action.triggered.connect(lambda: self.set_midi_source(None))
+
+        song_menu = self.menuBar().addMenu("Song")
+
+        transpose_action = song_menu.addAction("Transpose...")
+        transpose_action.triggered.connect(self.on_transpose)
+
+        suggest_regions_action = song_menu.addAction("Suggest regions...")
+        suggest_regions_action.triggered.connect(self.on_suggest_regions)
+
+        infer_analytic_types_action = song_menu.addAction("Infer analytic types")
+        infer_analytic_types_action.triggered.connect(self.infer_analytic_types)
+
         help_menu = self.menuBar().addMenu("Help")
 
         encoding_help_action = help_menu.addAction("Encoding")
         encoding_help_action.triggered.connect(self.on_encoding_help)
 
+        help_menu.addSeparator()
+
+        trace_action = help_menu.addAction("Record performance trace")
+        trace_action.setCheckable(True)
+        trace_action.setChecked(trace.is_enabled())
+        trace_action.toggled.connect(self.on_trace_toggled)
+
+    def populate_export_menu(self):
+        self.export_menu.clear()
+        for id, (name, func) in get_context().name_to_exporter.items():
+            action = self.export_menu.addAction(name + '...')
+            action.triggered.connect(functools.partial(self.export, id))
+
+    def init_settings_watcher(self):
+        self.settings_watcher = SettingsWatcher(
+            get_context(), self.on_settings_changed, self.on_settings_error
+        )
+        self.settings_watcher_timer = QTimer(self)
+        self.settings_watcher_timer.timeout.connect(self.settings_watcher.poll)
+        self.settings_watcher_timer.start(SETTINGS_POLL_INTERVAL)
+
+    def on_settings_changed(self, change):
+        if change.exporters_changed:
+            self.populate_export_menu()
+        self.chord_recognizer = None  # qualities or keys may have changed
+        for cell in self.cells:
+            cell.apply_settings_change(change)
+
+    def init_midi_timer(self):
+        self.midi_timer = QTimer(self)
+        self.midi_timer.timeout.connect(self.poll_midi_source)
+
+    def set_midi_source(self, source):
+        # source follows chord_hand.midi.source.EventSource. Recognized chords are added to the focused cell.
+        if self.midi_source:
+            self.midi_source.close()
+        self.midi_source = source
+        if source:
+            self.get_chord_recognizer().reset()
+            self.midi_timer.start(MIDI_POLL_INTERVAL)
+        else:
+            self.midi_timer.stop()
+
+    def get_chord_recognizer(self):
+        if not self.chord_recognizer or self.chord_recognizer.table.context is not get_context():
+            self.chord_recognizer = ChordRecognizer(RecognitionTable())
+        return self.chord_recognizer
+
+    def get_midi_input_cell(self):
+        return next((cell for cell in self.cells if cell.chord_codes_line_edit.hasFocus()), self.cells[-1])
+
+    def poll_midi_source(self):
+        if not self.midi_source:
+            return
+        recognizer = self.get_chord_recognizer()
+        for event in self.midi_source.poll():
+            if chord := recognizer.feed(event):
+                self.get_midi_input_cell().add_chord(chord)
+
+    def on_midi_file_input(self):
+        path, success = QFileDialog.getOpenFileName(None, "Play MIDI file", "", "*.mid *.midi")
+        if not success:
+            return
+        try:
+            self.set_midi_source(FileEventSource(path))
+        except (OSError, MidiFileError) as e:
+            display_error('MIDI error', str(e))
+
+    @staticmethod
+    def on_settings_error(message):
+        display_error('Settings error', 'Settings were not reloaded. Previous settings are still in use.\n\n' + message)
+
     def init_cells(self):
         if not self.chords:
             self.cells.append(
@@ -129,7 +261,9 @@ class MainWindow(QMainWindow):
                     self.on_next_measure,
                     self.update_regions,
                     self.field_types,
-                    chords=[]
+                    chords=[],
+                    on_chords_edited=self.on_cell_chords_edited,
+                    get_next_chord=self.get_next_chord,
                 )
             )
             return
@@ -141,7 +275,9 @@ class MainWindow(QMainWindow):
                     self.on_next_measure,
                     self.update_regions,
                     self.field_types,
-                    chords=chords
+                    chords=chords,
+                    on_chords_edited=self.on_cell_chords_edited,
+                    get_next_chord=self.get_next_chord,
                 )
             )
 
@@ -155,6 +291,7 @@ class MainWindow(QMainWindow):
             self.insert_cell(len(self.cells))
         self.cells[next_index].set_focus()
 
+    @trace.traced()
     def update_regions(self):
         current_region = None
         for cell in self.cells:
@@ -164,10 +301,59 @@ class MainWindow(QMainWindow):
                 cell.set_region(current_region, inherited=True)
 
     def clear(self):
+        self.sections = {}
+        self.form = []
+        self.timeline = None
         for cell in self.cells.copy():
             self.cells.remove(cell)
             self.scene.removeItem(cell.proxy)
 
+    def get_instance_at(self, index):
+        return next(
+            (i for i in self.form if i.start <= index < i.start + len(self.sections[i.section])), None
+        )
+
+    def get_next_chord(self, cell):
+        # the first chord of the measures after that of cell, as in infer_song. Cells are numbered from 1,
+        # so the next one is at cell.n.
+        for i in range(cell.n, len(self.cells)):
+            if self.cells[i].chords:
+                return self.cells[i].chords[0]
+        return None
+
+    def analyze_cell_before(self, index):
+        # the last chord before index may resolve to the chords at index, which changed
+        for i in range(index - 1, -1, -1):
+            if self.cells[i].chords:
+                if self.cells[i].region:
+                    self.cells[i].analyze_harmonies()
+                return
+
+    def on_cell_chords_edited(self, cell):
+        index = cell.n - 1
+        self.analyze_cell_before(index)
+        # the same measure of every other instance of the section gets the chords
+        if not (instance := self.get_instance_at(index)):
+            return
+        for other in self.form:
+            if other.section == instance.section and other is not instance:
+                other_index = other.start + index - instance.start
+                self.cells[other_index].set_chords(list(cell.chords))
+                self.analyze_cell_before(other_index)
+
+    def shift_form(self, index, amount):
+        # Instances after a measure inserted or removed at index move with their measures. Those it
+        # is inside of are no longer instances.
+        form = []
+        for instance in self.form:
+            end = instance.start + len(self.sections[instance.section])
+            if instance.start < index < end or amount < 0 and instance.start == index:
+                continue
+            if instance.start >= index:
+                instance = SectionInstance(instance.section, instance.start + amount)
+            form.append(instance)
+        self.form = form
+
     def on_remove(self):
         n, accept = QInputDialog().getInt(
             None,
@@ -190,6 +376,60 @@ class MainWindow(QMainWindow):
         if accept:
             self.insert_cell(n - 1)
 
+    def on_transpose(self):
+        tonic = get_song_tonic(self.get_song()) or Note(0, 0)
+        name, accept = QInputDialog().getItem(
+            None,
+            "Transpose",
+            f"Transpose from {tonic.to_symbol()} to",
+            TRANSPOSE_TONICS,
+            editable=False,
+        )
+        if accept:
+            self.transpose(Interval.between(tonic, str_to_note(name)))
+
+    @trace.traced()
+    def transpose(self, interval):
+        transposed = transpose_song(self.get_song(), interval)
+        for cell, region in zip(self.cells, transposed.regions):
+            if cell.region and not cell.is_region_inherited:
+                cell.set_region(region, inherited=False)
+        self.update_regions()
+        for cell, chords in zip(self.cells, transposed.chords):
+            cell.set_chords(chords)
+
+    def get_explicit_regions(self):
+        return [cell.region if cell.region and not cell.is_region_inherited else None for cell in self.cells]
+
+    def on_suggest_regions(self):
+        suggestions = suggest_regions(self.get_chords(), self.get_explicit_regions())
+        n_to_region = {i: region for i, region in enumerate(suggestions) if region}
+        if not n_to_region:
+            QMessageBox.information(None, "Suggest regions", "No regions to suggest.")
+            return
+
+        summary = ', '.join(f'{i + 1}: {region.to_symbol()}' for i, region in n_to_region.items())
+        answer = QMessageBox.question(None, "Suggest regions", f"Set these regions?\n\n{summary}")
+        if answer == QMessageBox.StandardButton.Yes:
+            self.set_regions(n_to_region)
+
+    @trace.traced()
+    def set_regions(self, n_to_region):
+        for n, region in n_to_region.items():
+            self.cells[n].set_region(region, inherited=False)
+        self.update_regions()
+
+    @trace.traced()
+    def infer_analytic_types(self):
+        song = self.get_song()
+        was_locked = list(song.analytic_type_locked)
+        infer_song(song)
+        for cell, analyses, was_measure_locked, is_locked in zip(
+                self.cells, song.analyses, was_locked, song.analytic_type_locked):
+            if cell.region and not was_measure_locked:
+                cell.set_analysis(analyses)
+                cell.set_is_analytic_type_locked(is_locked)
+
     def chord_symbols_view_as_text(self):
         dialog = QDialog()
         dialog.setWindowTitle("ChordHand")
@@ -217,6 +457,24 @@ class MainWindow(QMainWindow):
     def get_are_analytic_types_locked(self):
         return [cell.is_analytic_type_locked for cell in self.cells]
 
+    def get_song(self):
+        chords = self.get_chords()
+        sections = {}
+        for name, section in self.sections.items():
+            instance = next((instance for instance in self.form if instance.section == name), None)
+            if instance:
+                section = Section(name, [list(m) for m in chords[instance.start:instance.start + len(section)]])
+            sections[name] = section
+        return Song(
+            chords,
+            self.get_regions(),
+            self.get_analyses(),
+            self.get_are_analytic_types_locked(),
+            self.timeline,
+            sections=sections,
+            form=[SectionInstance(instance.section, instance.start) for instance in self.form],
+        )
+
     def get_chord_symbols(self):
         return [list(map(str, measure)) for measure in self.get_chords()]
 
@@ -249,24 +507,120 @@ class MainWindow(QMainWindow):
 
     def load_json_file(self):
         data = self.get_file_data()
-        if data:
-            self.clear()
-            self.load_cells(len(data['chords']))
-            self.load_chords(data["chords"])
-            self.load_regions(data["regions"])
-            self.load_analyses(data['analyses'])
+        if not data:
+            return
+        try:
+            self.load_song_data(data)
+        except ValueError as e:
+            display_error('JSON error', str(e))
+
+    def load_song_data(self, data):
+        # Cells hold the measures of sections as they are played. The form is kept, so that instances are
+        # edited together and sections are saved again.
+        if 'form' not in data:
+            self.load_json_data(data)
+            return
+        song = Song.from_dict(data)
+        self.load_json_data(song.to_dict(expand_sections=True))
+        self.sections = song.sections
+        self.form = song.form
+
+    @trace.traced()
+    def load_json_data(self, data):
+        # the timeline is read first, so that the song shown is kept if it is invalid
+        timeline = Timeline.from_dict(data['timeline']) if 'timeline' in data else None
+        self.clear()
+        self.load_cells(len(data['chords']))
+        self.load_chords(data["chords"])
+        self.load_regions(data["regions"])
+        self.load_analyses(data['analyses'])
+        self.timeline = timeline
+
+    def load_midi_file(self):
+        path, success = QFileDialog.getOpenFileName(None, "Load MIDI", "", "*.mid *.midi")
+        if not success:
+            return
+        try:
+            chords = read_chords(path, self.get_chord_recognizer().table)
+        except (OSError, MidiFileError) as e:
+            display_error('MIDI error', str(e))
+            return
+        self.load_chord_lists(chords)
 
-    def load_chord_symbols_from_text(self):
-        result, success = QInputDialog().getMultiLineText(None, "Load text", "")
+    def load_chord_symbol_sheet(self):
+        result, success = QInputDialog().getMultiLineText(None, "Load chord symbols", "")
         if success:
-            self.load_chord_codes(result)
+            self.load_chord_lists(parse_chord_symbol_sheet(result))
 
-    def load_chord_codes(self, text):
+    def load_chart(self):
+        suffixes = ' '.join(f'*{suffix}' for suffix in CHART_SUFFIXES)
+        path, success = QFileDialog.getOpenFileName(None, "Load chart", "", suffixes)
+        if not success:
+            return
+        try:
+            text = Path(path).read_text(encoding='utf-8', errors='replace')
+        except OSError as e:
+            display_error('Chart error', str(e))
+            return
+        self.load_chart_text(text)
+
+    def load_chart_text(self, text):
+        self.load_chord_lists(parse_chart(text))
+
+    def load_musicxml_file(self):
+        path, success = QFileDialog.getOpenFileName(None, "Load MusicXML", "", "*.musicxml *.xml *.mxl")
+        if not success:
+            return
+        self.load_musicxml(path)
+
+    def load_musicxml(self, source):
+        try:
+            chords = read_musicxml(source)
+        except (OSError, KeyError, ET.ParseError, zipfile.BadZipFile) as e:
+            display_error('MusicXML error', str(e))
+            return
+        self.load_chord_lists(chords)
+
+    def load_humdrum_file(self):
+        path, success = QFileDialog.getOpenFileName(None, "Load Humdrum", "", f"*{HUMDRUM_SUFFIX}")
+        if not success:
+            return
+        try:
+            with open(path, encoding='utf-8') as f:
+                self.load_humdrum(f)
+        except OSError as e:
+            display_error('Humdrum error', str(e))
+
+    def load_humdrum(self, lines):
+        # the first piece of lines
+        try:
+            _, song = next(iter_humdrum_songs(lines))
+        except (StopIteration, ValueError, KeyError) as e:
+            display_error('Humdrum error', str(e) or 'No pieces found.')
+            return
+        data = song.to_dict()
+        self.load_chord_lists(song.chords, data['regions'], data['analyses'])
+
+    def load_chord_lists(self, chords, n_to_region_data=None, n_to_analyses_data=None):
+        # regions and analyses are serialized as in JSON files
         self.clear()
-        self.chords = decode_chord_code_sequence(text)
+        self.chords = to_encodable(chords)
         self.init_cells()
         self.add_widgets()
         self.position_widgets()
+        if n_to_region_data:
+            self.load_regions(n_to_region_data)
+        if n_to_analyses_data:
+            self.load_analyses(n_to_analyses_data)
+
+    def load_chord_symbols_from_text(self):
+        result, success = QInputDialog().getMultiLineText(None, "Load text", "")
+        if success:
+            self.load_chord_codes(result)
+
+    @trace.traced()
+    def load_chord_codes(self, text):
+        self.load_chord_lists(decode_chord_code_sequence(text))
 
     def load_chords(self, n_to_data):
         for n, data in n_to_data.items():
@@ -303,19 +657,20 @@ class MainWindow(QMainWindow):
         if not success:
             return
 
-        with open(path, "w") as file:
-            json.dump(
-                {
-                    "chords": self.get_serialized_chords(),
-                    "analyses": self.get_serialized_analyses(),
-                    "regions": self.get_serialized_regions(),
-                },
-                file,
+        song = self.get_song()
+        song.save(path)
+        try:
+            update_index_on_save(path, song)
+        except (OSError, json.JSONDecodeError, KeyError) as e:
+            # the song is saved, only the search index of its corpus is out of date
+            QMessageBox.warning(
+                None, 'Search index', f'The song was saved, but the search index was not updated.\n\n{e!r}'
             )
 
     def export(self, exporter_name):
         try:
-            name_to_exporter[exporter_name][1](self.get_chords(), self.get_regions(), self.get_analyses())
+            with trace.span(f'export: {exporter_name}'):
+                get_context().name_to_exporter[exporter_name][1](self.get_chords(), self.get_regions(), self.get_analyses())
         except:
             display_error('Export error', traceback.format_exc())
 
@@ -333,21 +688,27 @@ class MainWindow(QMainWindow):
             raise OSError(f"Unsupported platform: {sys.platform}")
 
     def remove_cell(self, index):
+        self.shift_form(index, -1)
         cell = self.cells[index]
         self.scene.removeItem(cell.proxy)
         for c in self.cells[index:]:
             c.set_n(c.n - 1)
         self.cells.pop(index)
         self.position_widgets()
+        self.analyze_cell_before(index)
 
+    @trace.traced()
     def insert_cell(self, index):
         cell = Cell(
             index,
             self.on_next_measure,
             self.update_regions,
             self.field_types,
-            chords=[]
+            chords=[],
+            on_chords_edited=self.on_cell_chords_edited,
+            get_next_chord=self.get_next_chord,
         )
+        self.shift_form(index, 1)
         self.cells.insert(index, cell)
         self.add_cell_to_scene(cell)
         for cell in self.cells[index:]:
@@ -365,6 +726,7 @@ class MainWindow(QMainWindow):
         for cell in self.cells:
             self.add_cell_to_scene(cell)
 
+    @trace.traced()
     def position_cell(self, cell):
         height = cell.widget.height() + 15
         cell.widget.move(
@@ -381,6 +743,18 @@ class MainWindow(QMainWindow):
         for cell in self.cells:
             cell.analyze_harmonies()
 
+    @staticmethod
+    def on_trace_toggled(checked):
+        if checked:
+            trace.clear()
+            trace.enable()
+            return
+
+        trace.disable()
+        path, success = QFileDialog.getSaveFileName(None, "Save trace", "trace.json", "*.json")
+        if success:
+            trace.save(path)
+
     def on_encoding_help(self):
         class EncodingHelp(QLabel):
             def __init__(self, img1_path, img2_path):
@@ -392,7 +766,7 @@ class MainWindow(QMainWindow):
             def toggle_pixmap(self):
                 self.setPixmap(self.pixmap2 if self.pixmap() == self.pixmap1 else self.pixmap1)
 
-        from chord_hand.settings import encoder
+        encoder = get_context().encoder
         img_path = Path(__file__).parent / 'img'
         filename = 'kb-layout-qualities-combined.png' if isinstance(encoder, StandardEncoder) else 'projeto_mpb_codes_help.png'
         widget = EncodingHelp(str(img_path / filename), '')
@@ -401,24 +775,6 @@ class MainWindow(QMainWindow):
         widget.show()
 
 
-def serialize_chord(chord):
-    if not chord:
-        return "RepeatChord()"
-    return chord.to_dict()
-
-
-def serialize_region(region):
-    return region.to_dict() if region else None
-
-
-def serialize_chord_list(chords):
-    return [serialize_chord(chord) for chord in chords]
-
-
-def serialize_analysis(analysis):
-    return analysis.to_dict() if analysis else None
-
-
 def show_crash_dialog(data_dump, exc_message):
     dialog = CrashDialog(exc_message, data_dump)
     dialog.exec()
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import csv
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from chord_hand import diagnostics
+from chord_hand.analysis import HarmonicAnalysis
+from chord_hand.chord.chord import Chord
+from chord_hand.chord.note import Note
+from chord_hand.chord.quality import ChordQuality
+from chord_hand.corpus import SONG_SUFFIX, iter_song_paths, parallel_map
+from chord_hand.encoding.correction import CODES_SUFFIX
+from chord_hand.settings import SettingsContext, get_context
+from chord_hand.song import Song
+from chord_hand.trace import traced
+
+
+def validate_codes(collector: diagnostics.Collector, text: str, context: Optional[SettingsContext] = None):
+    # chord codes as in File > Load text. The decoder reports the spans of the codes it can't decode.
+    decoder = (context or get_context()).decoder
+    for i, measure_code in enumerate(text.replace('\n', '').split(' ')):
+        collector.measure = i
+        decoder.decode_measure(measure_code)
+
+
+def validate_song(collector: diagnostics.Collector, song: Song, context: Optional[SettingsContext] = None):
+    # Spans are those of the chord codes the active encoder gives, since songs don't keep the codes typed
+    encoder = (context or get_context()).encoder
+    for i, (chords, analyses) in enumerate(zip(song.chords, song.analyses)):
+        collector.measure = i
+        start = 0
+        for chord in chords:
+            try:
+                code = encoder.encode_measure([chord])
+            except KeyError:
+                code = ''
+                detail = f'{chord.root.to_symbol()} {chord.quality.to_string()}' if isinstance(chord, Chord) else chord
+                diagnostics.report(diagnostics.ENCODE_ERROR, detail, (start, start))
+            span = start, start + len(code)
+            start += len(code)
+
+            if chord is None:
+                diagnostics.report(diagnostics.DECODE_ERROR, 'missing chord', span)
+            elif isinstance(chord, Note):
+                diagnostics.report(diagnostics.INCOMPLETE_CHORD, chord.to_symbol(), span)
+            elif isinstance(chord, Chord) and isinstance(chord.quality, ChordQuality):
+                if chord.quality.name == 'ERROR':
+                    diagnostics.report(diagnostics.DECODE_ERROR, 'error chord', span)
+                    continue
+                chord.quality.to_symbol(context)
+                chord.quality.to_chordal_type(context)
+
+        for analysis in analyses:
+            if isinstance(analysis, HarmonicAnalysis):
+                analysis.to_symbol()
+
+
+def validate_file(path: Path) -> list[diagnostics.Diagnostic]:
+    path = Path(path)
+    with diagnostics.collecting(str(path)) as collector:
+        try:
+            if path.suffix == CODES_SUFFIX:
+                validate_codes(collector, path.read_text(encoding='utf-8'))
+            else:
+                validate_song(collector, Song.load(path))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            collector.measure = None
+            collector.report(diagnostics.LOAD_ERROR, f'{type(e).__name__}: {e}')
+    return collector.diagnostics
+
+
+@traced()
+def validate_corpus(
+        corpus_dir: Path,
+        report_path: Path,
+        context: Optional[SettingsContext] = None,
+        workers: Optional[int] = None,
+) -> Counter:
+    # Writes the diagnostics of every JSON song and codes file in corpus_dir to a single CSV report.
+    # Returns the number of diagnostics of each kind.
+    corpus_dir = Path(corpus_dir)
+    paths = sorted([*iter_song_paths(corpus_dir, SONG_SUFFIX), *iter_song_paths(corpus_dir, CODES_SUFFIX)])
+    kind_counts = Counter()
+    with open(report_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['song', 'measure', 'start', 'end', 'kind', 'detail'])
+        for file_diagnostics in parallel_map(validate_file, paths, context, workers):
+            for diagnostic in file_diagnostics:
+                start, end = diagnostic.span or ('', '')
+                writer.writerow([
+                    Path(diagnostic.song).relative_to(corpus_dir),
+                    '' if diagnostic.measure is None else diagnostic.measure + 1,
+                    start,
+                    end,
+                    diagnostic.kind,
+                    diagnostic.detail,
+                ])
+                kind_counts[diagnostic.kind] += 1
+    return kind_counts
@@ -0,0 +1,41 @@
+from chord_hand.analysis import analyze
+from chord_hand.analysis.alternatives import get_alternatives
+from chord_hand.analysis.harmonic_region import HarmonicRegion
+from chord_hand.analysis.modality import Modality
+from chord_hand.chord.note import Note
+from chord_hand.encoding.common import decode_chord_code_sequence
+from chord_hand.settings import get_context
+
+C_MAJOR = HarmonicRegion(Note(0, 0), Modality.MAJOR)
+
+
+def get_chords(codes):
+    return [chord for measure in decode_chord_code_sequence(codes) for chord in measure]
+
+
+def test_alternatives_cover_every_analytic_type():
+    d7, = get_chords('sf')
+    alternatives = get_alternatives(d7, C_MAJOR)
+    assert alternatives.default == analyze(d7, C_MAJOR)
+    assert {analysis.type.name for analysis in alternatives.ranked} == set(get_context().name_to_analytic_type)
+    for name, analytic_type in get_context().name_to_analytic_type.items():
+        assert alternatives.get(name) == analyze(d7, C_MAJOR, analytic_type)
+
+
+def test_alternatives_are_ranked_by_next_chord():
+    d7, g7 = get_chords('sf jf')
+    assert get_alternatives(d7, C_MAJOR).ranked[0].to_symbol() == 'V/V'
+    assert get_alternatives(d7, C_MAJOR, g7).ranked[0].to_symbol() == 'V/V'
+
+    dm7, db7 = get_chords('sj xf')
+    assert get_alternatives(dm7, C_MAJOR).ranked[0].to_symbol() == 'II'
+    assert get_alternatives(dm7, C_MAJOR, db7).ranked[0].type.name == 'II'
+
+    d7, eb = get_chords('sf cg')
+    assert get_alternatives(d7, C_MAJOR, eb).ranked[0].type.name == 'aSubV'
+
+
+def test_alternatives_of_unanalyzable_chords():
+    d7, = get_chords('sf')
+    assert get_alternatives(d7, None) is None
+    assert get_alternatives(None, C_MAJOR) is None
@@ -0,0 +1,58 @@
+import csv
+
+from chord_hand.analysis.form import SelfSimilarity, apply_form, detect_corpus_forms, detect_form
+from chord_hand.analysis.harmonic_region import HarmonicRegion
+from chord_hand.analysis.modality import Modality
+from chord_hand.chord.note import Note
+from chord_hand.encoding.common import decode_chord_code_sequence
+from chord_hand.song import Song
+
+A = 'ad sj jf ad'
+B = 'kh sj jf jf'
+C = '.d , x ad'
+C_MAJOR = HarmonicRegion(Note(0, 0), Modality.MAJOR)
+D_MAJOR = HarmonicRegion(Note(1, 0), Modality.MAJOR)
+
+
+def make_song():
+    return Song(decode_chord_code_sequence(' '.join([A, A, B, A, 'ad', C, A])))
+
+
+def get_form(sections):
+    return [(section.label, section.start, section.end) for section in sections]
+
+
+def test_diagonals():
+    similarity = SelfSimilarity([1, 2, 1, 2, None, None])
+    assert list(similarity.iter_stripes(2)) == [(0, 2, 2)]
+    assert not similarity.get_diagonal(1)  # measures without chords match nothing
+
+
+def test_detect_form():
+    assert get_form(detect_form(make_song())) == [
+        ('A', 0, 4), ('A', 4, 8), ('B', 8, 12), ('A', 12, 16), ('C', 16, 21), ('A', 21, 25),
+    ]
+
+
+def test_analyses_find_transposed_repeats():
+    song = Song(decode_chord_code_sequence(A + ' ' + 'sd dj kf sd'), [C_MAJOR] * 4 + [D_MAJOR] * 4)
+    song.analyze()
+    assert get_form(detect_form(song)) == [('A', 0, 8)]
+    assert get_form(detect_form(song, 'analyses')) == [('A', 0, 4), ('A', 4, 8)]
+
+
+def test_apply_form():
+    song = make_song()
+    apply_form(song, detect_form(song))
+    assert [instance.start for instance in song.form] == [0, 4, 12, 21]
+    assert song.chords[0] is song.chords[21]
+    assert list(song.sections) == ['A']
+
+
+def test_corpus(tmp_path):
+    make_song().save(tmp_path / 'song.json')
+    forms = detect_corpus_forms(tmp_path, tmp_path / 'report.csv', apply=True, workers=1)
+    assert forms[0].to_string() == 'A A B A C A'
+    with open(tmp_path / 'report.csv', newline='') as f:
+        assert list(csv.reader(f))[1] == ['song.json', 'A', '1', '4']
+    assert len(Song.load(tmp_path / 'song.json').form) == 4
@@ -0,0 +1,60 @@
+from chord_hand.analysis.harmonic_region import HarmonicRegion
+from chord_hand.analysis.inference import infer_corpus, infer_song
+from chord_hand.analysis.modality import Modality
+from chord_hand.chord.note import Note
+from chord_hand.encoding.common import decode_chord_code_sequence
+from chord_hand.song import Song
+
+C_MAJOR = HarmonicRegion(Note(0, 0), Modality.MAJOR)
+
+
+def make_song(codes):
+    chords = decode_chord_code_sequence(codes)
+    song = Song(chords, [C_MAJOR] * len(chords))
+    song.analyze()
+    return song
+
+
+def get_symbols(song):
+    return [analysis.to_symbol() for analyses in song.analyses for analysis in analyses]
+
+
+def test_infer_applied_ii():
+    song = make_song('ad dj kf sj jf ad')
+    assert infer_song(song) == 1
+    assert get_symbols(song) == ['I', 'II/II', 'V/II', 'II', 'V', 'I']
+
+
+def test_infer_tritone_substitute():
+    song = make_song('ad ,f jd')
+    assert get_symbols(song) == ['I', 'V/bII', 'V']
+    infer_song(song)
+    assert get_symbols(song) == ['I', 'SubV/V', 'V']
+
+
+def test_infer_keeps_analyses_that_resolve():
+    song = make_song('ad sj jf ad xf ad lf ad')
+    assert infer_song(song) == 0
+    assert get_symbols(song) == ['I', 'II', 'V', 'I', 'SubV', 'I', 'aSubV', 'I']
+
+
+def test_infer_skips_locked_measures():
+    song = make_song('ad kj sf jf')
+    song.analytic_type_locked[1] = True
+    infer_song(song)
+    assert get_symbols(song) == ['I', 'VI', 'V/V', 'V']
+
+
+def test_inferred_analyses_survive_reanalysis():
+    song = make_song('ad ,f jd')
+    infer_song(song)
+    assert song.analytic_type_locked == [False, True, False]
+    song.analyze()
+    assert get_symbols(song) == ['I', 'SubV/V', 'V']
+
+
+def test_infer_corpus(tmp_path):
+    make_song('ad kj sf jf').save(tmp_path / 'a.json')
+    make_song('ad sj jf ad').save(tmp_path / 'b.json')
+    assert infer_corpus(tmp_path, workers=1) == (1, 1)
+    assert get_symbols(Song.load(tmp_path / 'a.json')) == ['I', 'II/V', 'V/V', 'V']
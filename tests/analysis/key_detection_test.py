@@ -0,0 +1,43 @@
+from chord_hand.analysis.harmonic_region import HarmonicRegion
+from chord_hand.analysis.key_detection import detect_regions, suggest_regions
+from chord_hand.analysis.modality import Modality
+from chord_hand.chord.note import Note
+from chord_hand.encoding.common import decode_chord_code_sequence
+
+C_MAJOR = HarmonicRegion(Note(0, 0), Modality.MAJOR)
+G_MAJOR = HarmonicRegion(Note(4, 0), Modality.MAJOR)
+A_MINOR = HarmonicRegion(Note(5, 0), Modality.MINOR)
+F_MAJOR = HarmonicRegion(Note(3, 0), Modality.MAJOR)
+
+
+def test_detect_single_region():
+    chords = decode_chord_code_sequence('ad kj sj jf ad fd jf ad')
+    assert detect_regions(chords) == [C_MAJOR] * 8
+
+
+def test_detect_minor_region():
+    chords = decode_chord_code_sequence('kj sh df kj sh df kj')
+    assert detect_regions(chords) == [A_MINOR] * 7
+
+
+def test_detect_modulation():
+    chords = decode_chord_code_sequence('ad kj sj jf ad sj jf ad jd dj sf jd dj sf jd jd')
+    assert detect_regions(chords) == [C_MAJOR] * 8 + [G_MAJOR] * 8
+
+
+def test_detect_regions_keeps_fixed_regions():
+    chords = decode_chord_code_sequence('ad kj sj jf ad fd jf ad')
+    fixed = [None] * 4 + [F_MAJOR] + [None] * 3
+    assert detect_regions(chords, fixed)[4] == F_MAJOR
+
+
+def test_suggest_regions():
+    chords = decode_chord_code_sequence('ad kj sj jf ad sj jf ad jd dj sf jd dj sf jd jd')
+    assert suggest_regions(chords, [None] * 16) == [C_MAJOR] + [None] * 7 + [G_MAJOR] + [None] * 7
+
+    explicit = [C_MAJOR] + [None] * 15
+    assert suggest_regions(chords, explicit) == [None] * 8 + [G_MAJOR] + [None] * 7
+
+
+def test_detect_empty_song():
+    assert detect_regions([]) == []
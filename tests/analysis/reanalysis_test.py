@@ -0,0 +1,61 @@
+import dataclasses
+
+from chord_hand.analysis.harmonic_region import HarmonicRegion
+from chord_hand.analysis.modality import Modality
+from chord_hand.analysis.reanalysis import DefaultAnalysisIndex, reanalyze_corpus
+from chord_hand.chord.note import Note
+from chord_hand.chord.quality import ChordQuality
+from chord_hand.encoding.common import decode_chord_code_sequence
+from chord_hand.settings import get_context
+from chord_hand.song import Song
+
+C_MAJOR = HarmonicRegion(Note(0, 0), Modality.MAJOR)
+DOMINANT_SEVENTH = ChordQuality('M', 'p', 'm')
+
+
+def make_song(codes, locked=()):
+    chords = decode_chord_code_sequence(codes)
+    song = Song(chords, [C_MAJOR] * len(chords))
+    song.analyze()
+    song.analytic_type_locked = [i in locked for i in range(len(chords))]
+    return song
+
+
+def get_symbols(song):
+    return [[analysis.to_symbol() for analysis in analyses] for analyses in song.analyses]
+
+
+def get_context_with_changed_default(step, chroma, quality, name):
+    context = get_context()
+    default_analyses = {k: dict(v) for k, v in context.default_analyses_major.items()}
+    default_analyses[(step, chroma)][quality] = name
+    return dataclasses.replace(context, default_analyses_major=default_analyses)
+
+
+def test_only_affected_chords_are_reanalyzed(tmp_path):
+    make_song('sfjf af').save(tmp_path / 'a.json')
+    make_song('sf sf', locked=(1,)).save(tmp_path / 'b.json')
+    make_song('jf af').save(tmp_path / 'c.json')
+
+    assert reanalyze_corpus(tmp_path, workers=1) == (0, 0)  # builds the index
+    assert get_symbols(Song.load(tmp_path / 'a.json')) == [['V/V', 'V'], ['V/IV']]
+
+    context = get_context_with_changed_default(1, 0, DOMINANT_SEVENTH, 'SubV')
+    assert reanalyze_corpus(tmp_path, context, workers=2) == (2, 2)
+
+    assert get_symbols(Song.load(tmp_path / 'a.json')) == [['SubV', 'V'], ['V/IV']]
+    assert get_symbols(Song.load(tmp_path / 'b.json')) == [['SubV'], ['V/V']]  # second measure is locked
+    assert get_symbols(Song.load(tmp_path / 'c.json')) == [['V'], ['V/IV']]
+
+
+def test_index_tracks_modified_songs(tmp_path):
+    make_song('jf').save(tmp_path / 'a.json')
+    index = DefaultAnalysisIndex.build(tmp_path, workers=1)
+    index.save()
+
+    make_song('sf').save(tmp_path / 'a.json')
+    index = DefaultAnalysisIndex.load(tmp_path)
+    index.update(workers=1)
+
+    context = get_context_with_changed_default(1, 0, DOMINANT_SEVENTH, 'SubV')
+    assert dict(index.get_affected_locations(context.default_analyses_major)) == {'a.json': [(0, 0)]}
@@ -0,0 +1,41 @@
+from chord_hand import diagnostics
+from chord_hand.chart import encode_chart, import_charts, parse_chart
+from chord_hand.song import Song
+
+CHART = '''{title: Test}
+Intro
+| C7M A7 | Dm7 G7/B | % | |
+[C]Some lyrics [Am]here
+|: [F]more | [G7]words [Hm] | lyrics only :|
+A day in the life
+'''
+
+
+def to_symbols(measures):
+    return [[chord.to_symbol() for chord in chords] for chords in measures]
+
+
+def test_bars_markers_and_repeats():
+    with diagnostics.collecting() as collector:
+        measures = parse_chart(CHART)
+    assert to_symbols(measures) == [
+        ['C7M', 'A7'], ['Dm7', 'G7/B'], ['Dm7', 'G7/B'], ['Dm7', 'G7/B'], ['C'], ['Am'], ['F'], ['G7'], ['G7'],
+    ]
+    assert [(d.measure, d.detail) for d in collector.diagnostics] == [(7, 'Hm')]
+
+
+def test_import_charts(tmp_path):
+    (tmp_path / 'in' / 'sub').mkdir(parents=True)
+    (tmp_path / 'in' / 'sub' / 'a.cho').write_text(CHART, encoding='utf-8')
+    (tmp_path / 'in' / 'b.txt').write_text('| Bb7.9(#11)/D | C |', encoding='utf-8')
+
+    imports = import_charts(tmp_path / 'in', tmp_path / 'json', workers=1)
+    assert [chart_import.n_measures for chart_import in imports] == [2, 9]
+    assert to_symbols(Song.load(tmp_path / 'json' / 'b.json').chords) == [['Bb7.9(#11)/D'], ['C']]
+
+    import_charts(tmp_path / 'in', tmp_path / 'codes', to_codes=True, workers=1)
+    assert (tmp_path / 'codes' / 'sub' / 'a.txt').read_text(encoding='utf-8').startswith('adkf sjjf/l')
+
+
+def test_encode_chords_without_codes():
+    assert encode_chart(parse_chart('| C6(#11) G7 | Am |')) == 'a{6(#11)}jf kh'
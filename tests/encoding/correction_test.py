@@ -0,0 +1,45 @@
+import csv
+
+from chord_hand.encoding.correction import CodeCorrector, fix_up_corpus, get_corrector, get_edit_distance
+from chord_hand.settings import load_context
+
+
+def test_edit_distance():
+    assert get_edit_distance('sj', 'sj') == 0
+    assert get_edit_distance('sj', 'js') == 1
+    assert get_edit_distance('sj', 'sjf') == 1
+    assert get_edit_distance('sj', 'ad') == 2
+
+
+def test_suggestions_are_valid_and_ranked():
+    corrector = get_corrector()
+    assert corrector.is_valid('sj') and corrector.is_valid('sja') and corrector.is_valid('a{x}')
+    suggestions = corrector.suggest('sp')
+    assert suggestions[:2] == ['so', 'sl']  # keys next to p come first
+    assert all(corrector.is_valid(code) for code in suggestions)
+    assert corrector.suggest('sj') == ['sj']
+
+
+def test_suggest_measure():
+    corrector = get_corrector()
+    assert corrector.suggest_measure('sjjp')[0] == 'sjjo'
+    assert corrector.suggest_measure('sj/p')[0] == 'sj/o'
+    assert corrector.suggest_measure('sjjf') == []
+
+
+def test_projeto_mpb_codes():
+    corrector = CodeCorrector.from_context(load_context(encoding='projeto_mpb'))
+    assert corrector.is_valid('aY2/s')
+    assert 'aY2' in corrector.suggest('aY2q')
+    assert corrector.suggest('aYq/s')[0].endswith('/s')
+
+
+def test_fix_up_corpus(tmp_path):
+    (tmp_path / 'a.txt').write_text('sj jp ad', encoding='utf-8')
+    (tmp_path / 'b.txt').write_text('sj jf ad', encoding='utf-8')
+    corrections = fix_up_corpus(tmp_path, tmp_path / 'report.csv', apply=True, workers=1)
+    assert [(c.measure, c.code) for c in corrections] == [(1, 'jp')]
+    with open(tmp_path / 'report.csv', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    assert rows[1][:3] == ['a.txt', '2', 'jp']
+    assert (tmp_path / 'a.txt').read_text(encoding='utf-8') == 'sj jo ad'
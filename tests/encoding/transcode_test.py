@@ -0,0 +1,30 @@
+from chord_hand import diagnostics
+from chord_hand.encoding.transcode import iter_measure_codes, transcode, transcode_files
+
+
+def test_round_trip():
+    codes = 'ad sj/l  jf'
+    assert transcode(codes, 'standard', 'projeto_mpb') == 'aZ0 sz0/l  jY0'
+    assert transcode(transcode(codes, 'standard', 'projeto_mpb'), 'projeto_mpb', 'standard') == codes
+
+
+def test_unrepresentable_chords_are_reported():
+    with diagnostics.collecting() as collector:
+        assert transcode('ad aZjf', 'standard', 'projeto_mpb') == 'aZ0 jY0'
+    assert [(d.measure, d.kind, d.detail) for d in collector.diagnostics] == [(1, diagnostics.ENCODE_ERROR, 'C2')]
+
+
+def test_measures_are_read_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr('chord_hand.encoding.transcode.CHUNK_SIZE', 3)
+    path = tmp_path / 'a.txt'
+    path.write_text('ad sj/l\n jf kh', encoding='utf-8')
+    with open(path, encoding='utf-8') as f:
+        assert list(iter_measure_codes(f)) == ['ad', 'sj/l', 'jf', 'kh']
+
+
+def test_transcode_directory(tmp_path):
+    (tmp_path / 'in' / 'sub').mkdir(parents=True)
+    (tmp_path / 'in' / 'sub' / 'a.txt').write_text('ad sj/l', encoding='utf-8')
+    [transcoded] = transcode_files(tmp_path / 'in', tmp_path / 'out', 'standard', 'projeto_mpb', workers=1)
+    assert transcoded.n_measures == 2
+    assert (tmp_path / 'out' / 'sub' / 'a.txt').read_text(encoding='utf-8') == 'aZ0 sz0/l'
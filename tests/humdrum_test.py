@@ -0,0 +1,47 @@
+import io
+
+from chord_hand import diagnostics
+from chord_hand.analysis.alternatives import get_alternatives
+from chord_hand.analysis.harmonic_region import HarmonicRegion
+from chord_hand.analysis.modality import Modality
+from chord_hand.chord.note import Note
+from chord_hand.encoding.common import decode_chord_code_sequence
+from chord_hand.humdrum import iter_humdrum_lines, iter_humdrum_songs, write_humdrum
+from chord_hand.song import Song
+
+C_MAJOR = HarmonicRegion(Note(0, 0), Modality.MAJOR)
+A_MINOR = HarmonicRegion(Note(5, 0), Modality.MINOR)
+BB_MAJOR = HarmonicRegion(Note(6, -1), Modality.MAJOR)
+
+
+def make_song():
+    song = Song(decode_chord_code_sequence('ad sjjf  kh .d'), [C_MAJOR, C_MAJOR, C_MAJOR, A_MINOR, BB_MAJOR])
+    song.analyze()
+    song.analyses[1][1] = get_alternatives(song.chords[1][1], C_MAJOR).get('aSubV')
+    song.analytic_type_locked[1] = True
+    return song
+
+
+def test_spines():
+    lines = list(iter_humdrum_lines(make_song(), 'Test'))
+    assert lines[:5] == ['!!!OTL: Test\n', '**mxhm\t**harm\t**region\n', '=1\t=1\t=1\n', '*C:\t*C:\t*C:\n', 'C7M\tI\tC\n']
+    assert 'G7\taSubV/bVI\tC\n' in lines
+    assert '*B-:\t*B-:\t*B-:\n' in lines
+    assert lines[-1] == '*-\t*-\t*-\n'
+
+
+def test_multi_song_round_trip():
+    song = make_song()
+    f = io.StringIO()
+    write_humdrum(f, [('a', song), ('b', song)])
+    f.seek(0)
+    assert [(title, s.to_dict()) for title, s in iter_humdrum_songs(f)] == [('a', song.to_dict()), ('b', song.to_dict())]
+
+
+def test_key_interpretations_without_region_spine():
+    text = '**mxhm\n=1\n*a:\nAm\n=2\nDm7\n*-\n'
+    with diagnostics.collecting() as collector:
+        [(_, song)] = iter_humdrum_songs(io.StringIO(text))
+    assert song.regions == [A_MINOR, A_MINOR]
+    assert [analyses[0].to_symbol() for analyses in song.analyses] == ['I', 'IV']
+    assert not collector.diagnostics
@@ -0,0 +1,112 @@
+import pytest
+
+from chord_hand.chord.chord import Chord
+from chord_hand.chord.note import Note
+from chord_hand.encoding.common import decode_chord_code_sequence
+from chord_hand.encoding.transcode import get_encoding_context
+from chord_hand.midi.recognizer import ChordRecognizer, RecognitionTable, read_chords
+from chord_hand.midi.smf import MidiFileError, NoteEvent, parse_midi
+from chord_hand.midi.source import FileEventSource, QueueEventSource
+from chord_hand.settings import get_context, use_context
+
+TICKS_PER_BEAT = 96
+
+
+def variable_length(value):
+    result = [value & 0x7F]
+    while value := value >> 7:
+        result.insert(0, value & 0x7F | 0x80)
+    return bytes(result)
+
+
+def make_midi(chords, beats_per_chord=4, numerator=4):
+    # one track with a time signature and each chord held for beats_per_chord
+    track = b'\x00\xff\x58\x04' + bytes([numerator, 2, 24, 8])
+    for notes in chords:
+        track += b''.join(b'\x00' + bytes([0x90, note, 100]) for note in notes)
+        for i, note in enumerate(notes):
+            delta = beats_per_chord * TICKS_PER_BEAT if i == 0 else 0
+            track += variable_length(delta) + bytes([0x80, note, 0])
+    track += b'\x00\xff\x2f\x00'
+    header = b'MThd' + (6).to_bytes(4, 'big') + (0).to_bytes(2, 'big') + (1).to_bytes(2, 'big')
+    header += TICKS_PER_BEAT.to_bytes(2, 'big')
+    return header + b'MTrk' + len(track).to_bytes(4, 'big') + track
+
+
+def get_chord(code):
+    return decode_chord_code_sequence(code)[0][0]
+
+
+@pytest.fixture(scope='module')
+def recognizer():
+    return ChordRecognizer(RecognitionTable())
+
+
+def test_recognize_pitch_sets(recognizer):
+    assert recognizer.recognize([60, 64, 67, 71]) == get_chord('ad')
+    assert recognizer.recognize([55, 59, 62, 65]) == get_chord('jf')
+    assert recognizer.recognize([50, 60, 65, 69]) == get_chord('sj')
+    assert recognizer.recognize([64, 67, 72]) == Chord(Note(0, 0), get_chord('ag').quality, Note(2, 0))
+    assert recognizer.recognize([60, 72]) is None
+
+
+def test_recognize_ranks_ties_by_bass_and_simplicity(recognizer):
+    # C E G A is C6 or Am7
+    assert recognizer.recognize([57, 60, 64, 67]).root == Note(5, 0)
+    assert recognizer.recognize([48, 57, 64, 67]).root == Note(0, 0)
+
+
+def test_feed_gives_chord_on_release(recognizer):
+    recognizer.reset()
+    events = [NoteEvent(0, note, True) for note in (60, 64, 67)] + [NoteEvent(1, note, False) for note in (60, 64)]
+    assert [recognizer.feed(event) for event in events] == [None] * 5
+    assert recognizer.feed(NoteEvent(1, 67, False)) == get_chord('ag')
+
+
+def test_parse_midi():
+    midi_file = parse_midi(make_midi([[60, 64, 67]], numerator=3))
+    assert [(e.note, e.is_on, e.tick) for e in midi_file.events] == [
+        (60, True, 0), (64, True, 0), (67, True, 0), (60, False, 384), (64, False, 384), (67, False, 384)
+    ]
+    assert midi_file.events[-1].time == 2.0
+    assert midi_file.get_measure(384) == 1
+    with pytest.raises(MidiFileError):
+        parse_midi(b'RIFF')
+
+
+def test_read_chords_into_measures(tmp_path):
+    path = tmp_path / 'a.mid'
+    path.write_bytes(make_midi([[62, 65, 69, 72], [55, 59, 62, 65], [60, 64, 67, 71]], beats_per_chord=2))
+    assert read_chords(path) == [[get_chord('sj'), get_chord('jf')], [get_chord('ad')]]
+    context = get_context()
+    assert context.encoder.encode_measure(read_chords(path)[0]) == 'sjjf'
+
+
+def test_event_sources(tmp_path):
+    source = QueueEventSource()
+    source.put(NoteEvent(0, 60, True))
+    assert source.poll() == [NoteEvent(0, 60, True)]
+    assert source.poll() == []
+
+    path = tmp_path / 'a.mid'
+    path.write_bytes(make_midi([[60, 64, 67]]))
+    now = [0.0]
+    source = FileEventSource(path, clock=lambda: now[0])
+    assert len(source.poll()) == 3
+    now[0] = 2.0
+    assert len(source.poll()) == 3
+    assert source.is_finished()
+
+
+def test_table_only_has_qualities_of_the_active_encoding():
+    context = get_encoding_context('projeto_mpb')
+    table = RecognitionTable(context)
+    recognizer = ChordRecognizer(table)
+    with use_context(context):
+        # a power chord, C7M and C7(#9.#11), whose qualities have no projeto_mpb code
+        chords = [recognizer.recognize(notes) for notes in ([48, 55], [60, 64, 67, 71], [60, 64, 67, 70, 75, 78])]
+        context.encoder.encode_measure([chord for chord in chords if chord])
+    assert all(
+        context.encoder.can_encode_quality(quality, context)
+        for candidates in table.candidates for _, quality in candidates
+    )
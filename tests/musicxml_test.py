@@ -0,0 +1,48 @@
+import io
+
+from chord_hand import diagnostics
+from chord_hand.chord.chord import Chord
+from chord_hand.chord.note import Note
+from chord_hand.musicxml import get_kind_and_degrees, iter_musicxml, read_musicxml
+from chord_hand.settings import get_context
+
+SCORE = b'''<?xml version="1.0" encoding="UTF-8"?>
+<score-partwise version="4.0">
+<part id="P1">
+<measure number="1"><note><pitch><step>C</step><octave>4</octave></pitch><duration>4</duration></note></measure>
+</part>
+<part id="P2">
+<measure number="1">
+<harmony><root><root-step>D</root-step></root><kind>minor-seventh</kind></harmony>
+<harmony><root><root-step>G</root-step></root><kind text="7(b9)">dominant</kind><bass><bass-step>B</bass-step></bass>
+<degree><degree-value>9</degree-value><degree-alter>-1</degree-alter><degree-type>add</degree-type></degree></harmony>
+</measure>
+<measure number="2"><harmony><root><root-step>C</root-step></root><kind>none</kind></harmony></measure>
+<measure number="3"><harmony><root><root-step>C</root-step></root><kind>Tristan</kind></harmony></measure>
+</part>
+</score-partwise>
+'''
+
+
+def to_symbols(measures):
+    return [[chord.to_symbol() for chord in chords] for chords in measures]
+
+
+def test_read_harmonies():
+    with diagnostics.collecting() as collector:
+        measures = read_musicxml(io.BytesIO(SCORE))
+    assert to_symbols(measures) == [['Dm7', 'G7(b9)/B'], [], ['CTristan']]
+    assert [(d.measure, d.detail) for d in collector.diagnostics] == [(2, 'Tristan')]
+    assert any(measures[0][0].quality is quality for quality in get_context().chord_quality_to_symbol)
+
+
+def test_every_quality_round_trips():
+    qualities = [quality for quality, symbol in get_context().chord_quality_to_symbol.items() if symbol != '???']
+    chords = [[Chord(Note(6, -1), quality, Note(1, 0))] for quality in qualities] + [[]]
+    measures = read_musicxml(io.BytesIO(''.join(iter_musicxml(chords)).encode()))
+    assert to_symbols(measures) == to_symbols(chords)
+
+
+def test_kind_needs_fewest_degrees():
+    quality = get_context().decoder.decode_measure('ad')[0].quality
+    assert get_kind_and_degrees(quality) == ('major-seventh', ())
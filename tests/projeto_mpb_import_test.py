@@ -0,0 +1,52 @@
+import csv
+
+from chord_hand.analysis.alternatives import get_alternatives
+from chord_hand.analysis.harmonic_region import HarmonicRegion
+from chord_hand.analysis.modality import Modality
+from chord_hand.chord.note import Note
+from chord_hand.encoding.common import decode_chord_code_sequence
+from chord_hand.projeto_mpb import (
+    get_projeto_mpb_new_db_data, get_projeto_mpb_old_db_data, import_projeto_mpb_csvs, spell_pitch_class
+)
+from chord_hand.song import Song
+
+C_MAJOR = HarmonicRegion(Note(0, 0), Modality.MAJOR)
+A_MINOR = HarmonicRegion(Note(5, 0), Modality.MINOR)
+
+
+def make_song():
+    song = Song(decode_chord_code_sequence('ad sjjf ,f kh'), [C_MAJOR, C_MAJOR, C_MAJOR, A_MINOR])
+    song.analyze()
+    song.analyses[2][0] = get_alternatives(song.chords[2][0], C_MAJOR).get('SubV')
+    song.analytic_type_locked[2] = True
+    return song
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(rows)
+
+
+def test_spelling():
+    assert spell_pitch_class(8, C_MAJOR) == Note(5, -1)
+    assert spell_pitch_class(1, C_MAJOR) == Note(1, -1)
+    assert spell_pitch_class(6, C_MAJOR) == Note(3, 1)
+    assert spell_pitch_class(8, A_MINOR) == Note(4, 1)
+    assert spell_pitch_class(10, None) == Note(6, -1)
+
+
+def test_round_trip(tmp_path):
+    song = make_song()
+    header, *rows = get_projeto_mpb_new_db_data(song.chords, song.regions, song.analyses)
+    write_csv(tmp_path / 'new.csv', [header] + [['corpus', name] + row[2:] for name in ['a', 'b'] for row in rows])
+    write_csv(tmp_path / 'old.csv', get_projeto_mpb_old_db_data(song.chords, song.regions, song.analyses))
+
+    imported = import_projeto_mpb_csvs([tmp_path / 'new.csv', tmp_path / 'old.csv'], tmp_path / 'out', workers=1)
+    assert [imported_song.path for imported_song in imported] == [
+        str(tmp_path / 'out' / 'corpus' / 'a.json'),
+        str(tmp_path / 'out' / 'corpus' / 'b.json'),
+        str(tmp_path / 'out' / 'old.json'),
+    ]
+    for imported_song in imported:
+        assert not imported_song.diagnostics
+        assert Song.load(imported_song.path).to_dict() == song.to_dict()
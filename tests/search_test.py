@@ -0,0 +1,66 @@
+import os
+
+from chord_hand.analysis.harmonic_region import HarmonicRegion
+from chord_hand.analysis.modality import Modality
+from chord_hand.chord.note import Note
+from chord_hand.encoding.common import decode_chord_code_sequence
+from chord_hand.search import Hit, SearchIndex, get_updated_index, tokenize_song, update_index_on_save
+from chord_hand.song import Song
+from chord_hand.transpose import Interval, transpose_song
+
+C_MAJOR = HarmonicRegion(Note(0, 0), Modality.MAJOR)
+
+
+def make_song(codes):
+    chords = decode_chord_code_sequence(codes)
+    song = Song(chords, [C_MAJOR] * len(chords))
+    song.analyze()
+    return song
+
+
+def make_index(name_to_song):
+    index = SearchIndex()
+    for name, song in name_to_song.items():
+        index.add_song(name, tokenize_song(song))
+    return index
+
+
+def test_search_analysis_symbols():
+    index = make_index({'a': make_song('sj jf ad'), 'b': make_song('ad sj jf ad')})
+    assert index.search('II V I') == [Hit('a', 0, 0), Hit('b', 1, 0)]
+    assert index.search('II V/ I') == index.search('II V I')
+    assert index.search('V I II') == []
+
+    index.add_song('a', tokenize_song(make_song('jf ad sj')))
+    index.remove_song('b')
+    assert index.search('II V I') == []
+    assert index.search('V I II') == [Hit('a', 0, 0)]
+
+
+def test_search_with_wildcards():
+    index = make_index({'a': make_song('sj jf ad'), 'b': make_song('ad kj jf ad')})
+    assert index.search('* V I') == [Hit('a', 0, 0), Hit('b', 1, 0)]
+    assert index.search('V? V') == [Hit('b', 1, 0)]
+    assert len(index.search('*')) == 7
+
+
+def test_search_roots_is_transposition_invariant():
+    song = make_song('sj jf ad')
+    transposed = transpose_song(song, Interval(2, 3))
+    index = make_index({'a': song, 'b': transposed})
+    hits = index.search('2:* 7:* 0:*', kind='roots')
+    assert [hit.song for hit in hits] == ['a', 'b']
+
+
+def test_index_updates_when_songs_change(tmp_path):
+    make_song('sj jf ad').save(tmp_path / 'a.json')
+    index = get_updated_index(tmp_path, workers=1)
+    assert index.search('II V I') == [Hit('a.json', 0, 0)]
+
+    song = make_song('ad sj jf ad')
+    song.save(tmp_path / 'b.json')
+    update_index_on_save(tmp_path / 'b.json', song)
+    assert SearchIndex.load(tmp_path).search('II V I') == [Hit('a.json', 0, 0), Hit('b.json', 1, 0)]
+
+    os.remove(tmp_path / 'a.json')
+    assert get_updated_index(tmp_path, workers=1).search('II V I') == [Hit('b.json', 1, 0)]
@@ -0,0 +1,73 @@
+from chord_hand import trace
+from chord_hand.analysis.harmonic_region import HarmonicRegion
+from chord_hand.analysis.modality import Modality
+from chord_hand.chord.note import Note
+from chord_hand.encoding.common import decode_chord_code_sequence
+from chord_hand.song import Section, SectionInstance, Song
+
+C_MAJOR = HarmonicRegion(Note(0, 0), Modality.MAJOR)
+A_MINOR = HarmonicRegion(Note(5, 0), Modality.MINOR)
+
+
+def make_song():
+    # A A B A, with the last A in A minor
+    a = Section('A', decode_chord_code_sequence('ad sjjf'))
+    b = Section('B', decode_chord_code_sequence('kh'))
+    form = [SectionInstance('A', 0), SectionInstance('A', 2), SectionInstance('B', 4), SectionInstance('A', 5)]
+    regions = [C_MAJOR] * 5 + [A_MINOR] * 2
+    return Song(regions=regions, sections={'A': a, 'B': b}, form=form)
+
+
+def test_expansion():
+    song = make_song()
+    assert len(song) == 7
+    assert [chord.to_symbol() for chord in song.chords[3]] == ['Dm7', 'G7']
+    assert song.chords[1] is song.chords[3] is song.sections['A'].chords[1]
+    assert song.get_instance_at(4).section == 'B'
+    assert song.get_instance_at(6).start == 5
+
+
+def test_edits_show_in_every_instance():
+    song = make_song()
+    song.set_chords(2, decode_chord_code_sequence('kh')[0])
+    assert [song.chords[i][0].to_symbol() for i in (0, 2, 5)] == ['Am'] * 3
+
+
+def test_analyzed_once_per_region():
+    song = make_song()
+    was_enabled = trace.is_enabled()
+    trace.clear()
+    trace.enable()
+    song.analyze()
+    name_to_calls = {row[0]: row[1] for row in trace.get_summary()}
+    if not was_enabled:
+        trace.disable()
+    trace.clear()
+    assert name_to_calls['analyze'] == 7  # A in C, B in C and A in Am, instead of 10 for all measures
+    assert song.analyses[0] is song.analyses[2]
+    assert song.analyses[0] is not song.analyses[5]
+    assert song.analyses[6][1].to_symbol() != song.analyses[1][1].to_symbol()
+
+
+def test_serialization():
+    song = make_song()
+    song.analyze()
+    data = song.to_dict()
+    assert list(data['chords']) == []
+    assert len(data['sections']['A']) == 2
+    loaded = Song.from_dict(data)
+    assert loaded.chords == song.chords
+    assert loaded.chords[0] is loaded.chords[5]
+    assert loaded.form == song.form
+
+    expanded = song.to_dict(expand_sections=True)
+    assert len(expanded['chords']) == 7 and 'form' not in expanded
+    assert Song.from_dict(expanded).chords == song.chords
+
+
+def test_add_section():
+    song = Song(decode_chord_code_sequence('ad sjjf kh ad sjjf'))
+    song.add_section('A', 0, 2)
+    song.add_instance('A', 3)
+    assert [instance.start for instance in song.form] == [0, 3]
+    assert song.chords[1] is song.chords[4]
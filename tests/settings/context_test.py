@@ -0,0 +1,76 @@
+import pickle
+import threading
+
+import pytest
+
+from chord_hand.chord.chord import Chord
+from chord_hand.chord.note import Note
+from chord_hand.chord.quality import ChordQuality
+from chord_hand.encoding.projeto_mpb import ProjetoMPBDecoder
+from chord_hand.encoding.standard import StandardDecoder
+from chord_hand.settings import cached_per_context, load_context, get_context, use_context
+
+
+@pytest.fixture(scope='module')
+def projeto_mpb_context():
+    return load_context(encoding='projeto_mpb')
+
+
+def test_context_tables_are_immutable():
+    context = get_context()
+    with pytest.raises(TypeError):
+        context.key_to_chord_quality['0'] = ChordQuality('M', 'p')
+    with pytest.raises(AttributeError):
+        context.decoder = None
+
+
+def test_context_survives_pickling():
+    context = get_context()
+    unpickled = pickle.loads(pickle.dumps(context))
+    assert unpickled.key_to_chord_quality == context.key_to_chord_quality
+    assert unpickled.default_analyses_major == context.default_analyses_major
+    assert type(unpickled.decoder) is type(context.decoder)
+
+
+def test_use_context(projeto_mpb_context):
+    assert isinstance(get_context().decoder, StandardDecoder)
+    with use_context(projeto_mpb_context):
+        assert isinstance(get_context().decoder, ProjetoMPBDecoder)
+    assert isinstance(get_context().decoder, StandardDecoder)
+
+
+def test_cached_per_context(projeto_mpb_context):
+    built = []
+    get_encoding = cached_per_context(lambda context: built.append(context) or context.encoding)
+    assert get_encoding() == get_encoding() == 'standard'
+    assert get_encoding(projeto_mpb_context) == 'projeto_mpb'
+    with use_context(projeto_mpb_context):
+        assert get_encoding() == 'projeto_mpb'
+    assert get_encoding() == 'standard'
+    assert built == [get_context(), projeto_mpb_context, get_context()]
+
+
+def test_contexts_coexist_across_threads(projeto_mpb_context):
+    chord = Chord(Note(0, 0), ChordQuality('M', 'p', 'm'))
+    results = {}
+
+    def encode(name, context):
+        with use_context(context):
+            results[name] = get_context().encoder.encode_measure([chord] * 100)
+
+    threads = [
+        threading.Thread(target=encode, args=('standard', get_context())),
+        threading.Thread(target=encode, args=('projeto_mpb', projeto_mpb_context)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results['standard'] == 'af' * 100
+    assert results['projeto_mpb'] == 'aY0' * 100
+
+
+def test_explicit_context_for_symbols(projeto_mpb_context):
+    quality = ChordQuality('M', 'p', 'm')
+    assert quality.to_symbol(projeto_mpb_context) == '7'
@@ -0,0 +1,87 @@
+import os
+import time
+
+import pytest
+
+from chord_hand.analysis.harmonic_region import HarmonicRegion
+from chord_hand.analysis.modality import Modality
+from chord_hand.chord.note import Note
+from chord_hand.chord.quality import ChordQuality
+from chord_hand.encoding.standard import StandardDecoder
+from chord_hand.settings import load_context, use_context
+from chord_hand.settings.context import get_context, set_default_context
+from chord_hand.settings.watcher import SettingsWatcher
+
+
+@pytest.fixture
+def watcher(tmp_path):
+    previous_context = get_context()
+    context = load_context(tmp_path)
+    changes, errors = [], []
+    watcher = SettingsWatcher(context, changes.append, errors.append, settings_dir=tmp_path)
+    watcher.changes, watcher.errors = changes, errors
+    yield watcher
+    watcher.stop()
+    set_default_context(previous_context)
+
+
+def edit_settings_file(watcher, name, old, new):
+    path = watcher.settings_dir / name
+    path.write_text(path.read_text(encoding='utf-8').replace(old, new), encoding='utf-8')
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def poll_until_done(watcher):
+    watcher.poll()
+    for _ in range(500):
+        if not watcher._pending:
+            return
+        watcher.poll()
+        time.sleep(0.01)
+
+
+def test_keymap_change(watcher):
+    edit_settings_file(watcher, 'keymap.csv', 'f,ChordQuality(Mpm______)', 'f,ChordQuality(mpm______)')
+    poll_until_done(watcher)
+
+    change, = watcher.changes
+    assert change.changed_keys == {'f'}
+    assert watcher.context.key_to_chord_quality['f'] == ChordQuality('m', 'p', 'm')
+    assert change.affects_chord_codes('af')
+    assert not change.affects_chord_codes('aj')
+    assert not change.encoding_changed
+
+
+def test_default_analyses_change(watcher):
+    edit_settings_file(watcher, 'default_analyses.csv', 'II,1,0,,,,,,,V,', 'II,1,0,,,,,,,II,')
+    poll_until_done(watcher)
+
+    change, = watcher.changes
+    assert change.changed_default_analyses == {(1, 0, ChordQuality('M', 'A', 'm'))}
+
+    region = HarmonicRegion(Note(0, 0), Modality.MAJOR)
+    with use_context(watcher.context):
+        decoder = StandardDecoder()
+        assert change.affects_analyses(decoder.decode_measure('sq'), region, [])
+        assert not change.affects_analyses(decoder.decode_measure('sf'), region, [])
+
+
+def test_encoding_change(watcher):
+    edit_settings_file(watcher, 'settings.toml', 'active = "standard"', 'active = "projeto_mpb"')
+    poll_until_done(watcher)
+
+    change, = watcher.changes
+    assert change.encoding_changed
+    assert watcher.context.encoding == 'projeto_mpb'
+
+
+def test_bad_file_keeps_previous_context(watcher):
+    context = watcher.context
+    edit_settings_file(watcher, 'keymap.csv', 'f,ChordQuality(Mpm______)', 'f,Mpm______')
+    poll_until_done(watcher)
+
+    assert not watcher.changes
+    error, = watcher.errors
+    assert 'keymap.csv' in error
+    assert watcher.context is context
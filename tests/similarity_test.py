@@ -0,0 +1,54 @@
+from chord_hand.analysis.harmonic_region import HarmonicRegion
+from chord_hand.analysis.modality import Modality
+from chord_hand.chord.note import Note
+from chord_hand.chord.pitch_class import get_bass_mask, get_chord_mask, to_pitch_classes
+from chord_hand.encoding.common import decode_chord_code_sequence
+from chord_hand.search import Hit
+from chord_hand.similarity import SimilarityIndex, SongMasks, get_distance, get_similarity_index, pack_chord
+from chord_hand.song import Song
+
+C_MAJOR = HarmonicRegion(Note(0, 0), Modality.MAJOR)
+
+
+def get_chords(codes):
+    return [chord for measure in decode_chord_code_sequence(codes) for chord in measure]
+
+
+def make_song(codes):
+    chords = decode_chord_code_sequence(codes)
+    return Song(chords, [C_MAJOR] * len(chords))
+
+
+def test_chord_masks():
+    c7m, g7, dm7 = get_chords('ad jf sj')
+    assert to_pitch_classes(get_chord_mask(c7m)) == [0, 4, 7, 11]
+    assert to_pitch_classes(get_chord_mask(g7)) == [2, 5, 7, 11]
+    assert to_pitch_classes(get_chord_mask(dm7)) == [0, 2, 5, 9]
+    assert get_bass_mask(g7) == 1 << 7
+    assert get_chord_mask(None) == 0
+
+
+def test_distances():
+    c7m, em = get_chords('ad dh')
+    assert get_distance(get_chord_mask(c7m), get_chord_mask(em), 'hamming') == 1
+    assert get_distance(get_chord_mask(c7m), get_chord_mask(em), 'jaccard') == 1 - 3 / 4
+    assert get_distance(0, 0) == 0
+
+
+def test_nearest_chords_and_measures():
+    index = SimilarityIndex({
+        'a': SongMasks.from_song(make_song('ad jf sj')),
+        'b': SongMasks.from_song(make_song('dh kh')),
+    })
+    c7m, = get_chords('ad')
+    assert index.nearest_chords(c7m, 2, use_bass=False) == [(0, Hit('a', 0, 0)), (0.25, Hit('b', 0, 0))]
+    assert index.nearest_chords(c7m, 1, 'hamming')[0] == (0, Hit('a', 0, 0))
+    assert index.nearest_measures(get_chords('dh'), 1) == [(0, Hit('b', 0, 0))]
+
+
+def test_similarity_index_from_corpus(tmp_path):
+    make_song('ad jf').save(tmp_path / 'a.json')
+    index = get_similarity_index(tmp_path, workers=1)
+    g7, = get_chords('jf')
+    assert index.nearest_chords(g7, 1) == [(0, Hit('a.json', 1, 0))]
+    assert list(index.songs['a.json'].chords) == [pack_chord(chord) for chord in get_chords('ad jf')]
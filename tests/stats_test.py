@@ -0,0 +1,68 @@
+import csv
+
+from chord_hand.analysis.alternatives import get_alternatives
+from chord_hand.analysis.harmonic_region import HarmonicRegion
+from chord_hand.analysis.modality import Modality
+from chord_hand.chord.note import Note
+from chord_hand.encoding.common import decode_chord_code_sequence
+from chord_hand.song import Song
+from chord_hand.stats import ALL_REGIONS, CorpusStats, count_song, get_corpus_stats
+
+C_MAJOR = HarmonicRegion(Note(0, 0), Modality.MAJOR)
+G_MAJOR = HarmonicRegion(Note(4, 0), Modality.MAJOR)
+
+
+def make_song(codes, regions):
+    chords = decode_chord_code_sequence(codes)
+    return Song(chords, regions)
+
+
+def test_count_song():
+    song = make_song('sj jf ad ad', [C_MAJOR, C_MAJOR, C_MAJOR, G_MAJOR])
+    stats = CorpusStats.from_counts(count_song(song), 1)
+    analysis = stats.kind_to_table['analysis']
+
+    assert analysis.get_count(['II', 'V', 'I']) == 1
+    assert analysis.get_count(['I']) == 1
+    assert analysis.get_count(['IV']) == 1
+    assert analysis.get_count(['IV'], 'G') == 1
+    assert analysis.get_count(['I', 'IV']) == 0  # n-grams don't span regions
+    assert stats.kind_to_table['symbol'].get_count(['Dm7', 'G7'], 'C') == 1
+
+
+def test_transition_probabilities():
+    song = make_song('jf ad jf ad jf sj', [C_MAJOR] * 6)
+    analysis = CorpusStats.from_counts(count_song(song), 1).kind_to_table['analysis']
+    rows = dict(zip(analysis.tokens, analysis.get_transition_probabilities()))
+    v_row = dict(zip(analysis.tokens, rows['V']))
+    assert v_row['I'] == 2 / 3
+    assert v_row['II'] == 1 / 3
+    assert sum(rows['II']) == 0
+
+
+def test_corpus_stats_are_merged_across_workers(tmp_path):
+    for i in range(5):
+        make_song('sj jf ad ad', [C_MAJOR] * 3 + [G_MAJOR]).save(tmp_path / f'{i}.json')
+
+    serial = get_corpus_stats(tmp_path, workers=1)
+    parallel = get_corpus_stats(tmp_path, workers=2)
+    for kind, table in serial.kind_to_table.items():
+        assert list(table.iter_counts(2)) == list(parallel.kind_to_table[kind].iter_counts(2))
+    assert serial.kind_to_table['analysis'].get_count(['V', 'I']) == 5
+
+    serial.write_csv(tmp_path / 'stats')
+    with open(tmp_path / 'stats' / 'analysis_2grams.csv', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['region', 'token_1', 'token_2', 'count']
+    assert [ALL_REGIONS, 'II', 'V', '5'] in rows
+
+
+def test_stored_analyses_are_counted():
+    song = make_song('sf jf ad', [C_MAJOR] * 3)
+    song.analyze()
+    song.analyses[0] = [get_alternatives(song.chords[0][0], C_MAJOR).get('SubV')]
+    stored = song.analyses[0]
+    analysis = CorpusStats.from_counts(count_song(song), 1).kind_to_table['analysis']
+    assert analysis.get_count([stored[0].to_symbol()]) == 1
+    assert song.analyses[0] is stored  # the song is left as it was
+    assert analysis.get_count(['I']) == 1
@@ -0,0 +1,33 @@
+from chord_hand import diagnostics
+from chord_hand.chord.chord import Chord
+from chord_hand.chord.note import Note
+from chord_hand.chord.symbol_parser import parse_chord_symbol, parse_chord_symbol_sheet
+from chord_hand.settings import get_context
+
+
+def test_longest_quality_and_bass():
+    chord = parse_chord_symbol('Bb7.9(#11)/D')
+    assert chord.root == Note(6, -1)
+    assert chord.bass == Note(1, 0)
+    assert chord.to_symbol() == 'Bb7.9(#11)/D'
+
+
+def test_qualities_are_those_of_the_settings():
+    chord = parse_chord_symbol('F#m7')
+    assert any(chord.quality is quality for quality in get_context().chord_quality_to_symbol)
+
+
+def test_every_symbol_round_trips():
+    for quality, symbol in get_context().chord_quality_to_symbol.items():
+        if symbol == '???':
+            continue
+        chord = Chord(Note(2, -1), quality, Note(4, 1))
+        assert parse_chord_symbol(chord.to_symbol()).to_symbol() == chord.to_symbol()
+
+
+def test_unknown_symbols_are_reported():
+    with diagnostics.collecting('sheet') as collector:
+        measures = parse_chord_symbol_sheet('| C7M A7 | Dm7 Hm7 G7/B |')
+    assert [[chord.to_symbol() for chord in measure] for measure in measures] == [['C7M', 'A7'], ['Dm7', 'G7/B']]
+    assert [(d.measure, d.kind, d.detail) for d in collector.diagnostics] == [(1, diagnostics.UNKNOWN_SYMBOL, 'Hm7')]
+    assert parse_chord_symbol('C7/X') is None
@@ -0,0 +1,75 @@
+import pytest
+
+from chord_hand.encoding.common import decode_chord_code_sequence
+from chord_hand.export import get_audio_labels_data, get_tilia_csv_data
+from chord_hand.song import Song
+from chord_hand.timeline import Meter, Timeline, TimelineIndex
+
+CODES = 'ad sjjf  kh'
+
+
+def get_times(index):
+    return [(t.measure, t.index, t.start, t.end, t.start_seconds, t.end_seconds) for t in index.iter_chord_times()]
+
+
+def test_default_timeline():
+    index = TimelineIndex(decode_chord_code_sequence(CODES))
+    assert get_times(index) == [
+        (0, 0, 0, 4, 0, 2),
+        (1, 0, 4, 6, 2, 3),
+        (1, 1, 6, 8, 3, 4),
+        (3, 0, 12, 16, 6, 8),
+    ]
+    assert index.length == 16
+
+
+def test_meters_durations_and_tempos():
+    timeline = Timeline(meter_changes={1: Meter(3, 4)}, durations={1: [2, 1]}, tempo_changes={4.0: 60})
+    index = TimelineIndex(decode_chord_code_sequence(CODES), timeline)
+    assert get_times(index) == [
+        (0, 0, 0, 4, 0, 2),
+        (1, 0, 4, 6, 2, 4),
+        (1, 1, 6, 7, 4, 5),
+        (3, 0, 10, 13, 8, 11),
+    ]
+
+
+def test_anchors():
+    index = TimelineIndex(decode_chord_code_sequence(CODES), Timeline(anchors={0.0: 1.0, 4.0: 3.0, 8.0: 5.0}))
+    assert index.to_seconds(6) == 4
+    assert index.to_seconds(12) == 7  # the rate of the last segment goes on
+    index = TimelineIndex(decode_chord_code_sequence(CODES), Timeline(anchors={4.0: 10.0}))
+    assert index.to_seconds(0) == 8
+
+
+def test_anchors_must_increase():
+    with pytest.raises(ValueError, match='Anchor seconds must increase'):
+        Timeline(anchors={0.0: 1.0, 4.0: 3.0, 8.0: 3.0})
+    with pytest.raises(ValueError):
+        Timeline.from_dict({'anchors': {'0.0': 2.0, '4.0': 1.0}})
+
+
+def test_lookup():
+    index = TimelineIndex(decode_chord_code_sequence(CODES))
+    assert [index.get_chord_at_beat(beat) for beat in [0, 3.9, 4, 7.5, 8, 12, 15.9, 16, -1]] == [
+        (0, 0), (0, 0), (1, 0), (1, 1), None, (3, 0), (3, 0), None, None,
+    ]
+    assert index.get_chord_at_seconds(3.5) == (1, 1)
+    assert index.get_measure_at_beat(9) == 2
+
+
+def test_serialization():
+    timeline = Timeline(meter_changes={2: Meter(6, 8)}, durations={1: [3, 1]}, tempo_changes={8.0: 90}, anchors={0.0: 0.5})
+    song = Song(decode_chord_code_sequence(CODES), timeline=timeline)
+    assert Song.from_dict(song.to_dict()).timeline == timeline
+    assert 'timeline' not in Song(decode_chord_code_sequence(CODES)).to_dict()
+
+
+def test_exports():
+    chords = decode_chord_code_sequence(CODES)
+    timeline = Timeline(durations={1: [3, 1]})
+    rows = get_tilia_csv_data(chords, [None] * 4, [[]] * 4, timeline)
+    assert rows[0][-1] == 'time'
+    assert [row[1] for row in rows[1:]] == ['0.0', '0.0', '0.75', '0.0']
+    assert [row[-1] for row in rows[1:]] == [0, 2, 3.5, 6]
+    assert get_audio_labels_data(chords, timeline).splitlines()[1] == '2.000000\t3.500000\tDm7'
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from chord_hand import trace
+from chord_hand.encoding.common import decode_chord_code_sequence
+
+
+@pytest.fixture
+def tracing():
+    was_enabled = trace.is_enabled()
+    trace.clear()
+    trace.enable()
+    yield
+    if not was_enabled:
+        trace.disable()
+    trace.clear()
+
+
+def test_disabled_tracing_records_nothing():
+    trace.disable()
+    trace.clear()
+    decode_chord_code_sequence('af jf sj')
+    assert trace.get_summary() == []
+
+
+def test_spans_and_counters(tracing, tmp_path):
+    decode_chord_code_sequence('af jf sjaf')
+    with trace.span('custom'):
+        pass
+
+    name_to_calls = {row[0]: row[1] for row in trace.get_summary()}
+    assert name_to_calls['StandardDecoder.decode_measure'] == 3
+    assert name_to_calls['custom'] == 1
+
+    trace.save(tmp_path / 'trace.json')
+    with open(tmp_path / 'trace.json') as f:
+        events = json.load(f)['traceEvents']
+    assert {event['ph'] for event in events} == {'X', 'C'}
+    assert events[-1]['args'] == {'chords decoded': 4}
+    assert (tmp_path / 'trace.summary.txt').exists()
@@ -0,0 +1,100 @@
+import pytest
+
+from chord_hand.analysis.harmonic_region import HarmonicRegion
+from chord_hand.analysis.modality import Modality
+from chord_hand.chord.chord import Chord
+from chord_hand.chord.note import Note
+from chord_hand.encoding.common import decode_chord_code_sequence
+from chord_hand.song import Section, SectionInstance, Song
+from chord_hand.timeline import Meter, Timeline
+from chord_hand.transpose import INDEX_TO_NOTE, Interval, normalize_songs, transpose_note, transpose_song
+
+C = Note(0, 0)
+D = Note(1, 0)
+E_FLAT = Note(2, -1)
+MAJOR_SECOND = Interval(1, 2)
+
+
+@pytest.mark.parametrize('note, interval, expected', [
+    (C, MAJOR_SECOND, D),
+    (Note(6, 0), MAJOR_SECOND, Note(0, 1)),  # B -> C#
+    (Note(3, 1), Interval(4, 7), Note(0, 1)),  # F# -> C#
+    (Note(1, 2), MAJOR_SECOND, Note(2, 2)),  # Dx -> Ex
+    (Note(4, 2), Interval(1, 3), Note(6, 1)),  # Gx -> Ax# -> B#
+    (Note(0, -2), Interval(3, 4), Note(2, -2)),  # Cbb -> Fbbb -> Ebb
+    (Note(-1, 0), MAJOR_SECOND, Note(-1, 0)),
+])
+def test_transpose_note(note, interval, expected):
+    assert transpose_note(note, interval) == expected
+
+
+def test_transposed_notes_keep_pitch_class_and_fit_the_keymap():
+    for steps in range(7):
+        for semitones in range(12):
+            interval = Interval(steps, semitones)
+            for note in INDEX_TO_NOTE[:-1]:
+                transposed = transpose_note(note, interval)
+                assert abs(transposed.chroma) <= 2
+                assert (transposed.to_pitch_class() - note.to_pitch_class()) % 12 == semitones
+
+
+def test_interval_between():
+    assert Interval.between(D, C) == Interval(6, 10)
+    assert Interval.between(C, E_FLAT) == Interval(2, 3)
+
+
+def test_transpose_song_keeps_analyses():
+    chords = decode_chord_code_sequence('sf jf af')
+    song = Song(chords, [HarmonicRegion(C, Modality.MAJOR), None, None])
+    song.analyze()
+
+    transposed = transpose_song(song, MAJOR_SECOND)
+
+    assert [measure[0].root for measure in transposed.chords] == [Note(2, 0), Note(5, 0), D]
+    assert transposed.chords[0][0].quality == chords[0][0].quality
+    assert transposed.regions == [HarmonicRegion(D, Modality.MAJOR), None, None]
+    assert transposed.analyses == song.analyses
+    assert song.chords[0][0].root == Note(1, 0)  # original is untouched
+
+
+def test_transpose_song_keeps_inversions():
+    chord = Chord(C, decode_chord_code_sequence('af')[0][0].quality, Note(2, 0))
+    transposed = transpose_song(Song([[chord]]), Interval(2, 3))
+    assert transposed.chords[0][0].root == E_FLAT
+    assert transposed.chords[0][0].bass == Note(4, 0)
+
+
+def test_transpose_song_keeps_timeline():
+    timeline = Timeline(meter_changes={1: Meter(3, 4)}, durations={0: [3, 1]})
+    transposed = transpose_song(Song(decode_chord_code_sequence('sjjf af'), timeline=timeline), MAJOR_SECOND)
+    assert transposed.timeline == timeline
+    assert transposed.timeline is not timeline
+
+
+def test_transpose_song_keeps_sections():
+    sections = {
+        'A': Section('A', decode_chord_code_sequence('sjjf af')),
+        'B': Section('B', decode_chord_code_sequence('kh')),  # not played
+    }
+    song = Song(sections=sections, form=[SectionInstance('A', 0), SectionInstance('A', 2)])
+    transposed = transpose_song(song, MAJOR_SECOND)
+    assert [instance.start for instance in transposed.form] == [0, 2]
+    assert transposed.chords[0] is transposed.chords[2] is transposed.sections['A'].chords[0]
+    assert transposed.chords[1][0].root == D
+    assert transposed.sections['B'].chords[0][0].root == Note(6, 0)
+
+    round_trip = transpose_song(transposed, Interval(6, 10))
+    assert round_trip.to_dict() == song.to_dict()
+
+
+def test_normalize_songs():
+    songs = [
+        Song(decode_chord_code_sequence('sf'), [HarmonicRegion(D, Modality.MAJOR)]),
+        Song(decode_chord_code_sequence('cf'), [HarmonicRegion(E_FLAT, Modality.MINOR)]),
+        Song(decode_chord_code_sequence('jf')),
+    ]
+    normalized = normalize_songs(songs)
+    assert [song.regions[0] for song in normalized] == [
+        HarmonicRegion(C, Modality.MAJOR), HarmonicRegion(C, Modality.MINOR), None
+    ]
+    assert [song.chords[0][0].root for song in normalized] == [C, C, Note(4, 0)]
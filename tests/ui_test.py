@@ -0,0 +1,151 @@
+import io
+import os
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt6.QtWidgets import QApplication  # noqa: E402
+
+from chord_hand.analysis import Modality  # noqa: E402
+from chord_hand.analysis.alternatives import get_alternatives  # noqa: E402
+from chord_hand.analysis.harmonic_region import HarmonicRegion  # noqa: E402
+from chord_hand.chord.chord import Chord  # noqa: E402
+from chord_hand.chord.note import Note  # noqa: E402
+from chord_hand.chord.symbol_parser import parse_chord_symbol_sheet  # noqa: E402
+from chord_hand.encoding.common import decode_chord_code_sequence  # noqa: E402
+from chord_hand.song import Song  # noqa: E402
+from chord_hand.timeline import Meter, Timeline  # noqa: E402
+
+
+@pytest.fixture
+def window():
+    app = QApplication.instance() or QApplication([])
+    from chord_hand.ui import MainWindow
+    window = MainWindow()
+    yield window
+    window.settings_watcher.stop()
+    window.close()
+    window.deleteLater()
+    app.processEvents()
+
+
+def get_codes(window):
+    return [cell.chord_codes for cell in window.cells]
+
+
+def test_load_chord_symbols_without_codes(window):
+    window.load_chord_lists(parse_chord_symbol_sheet('| C6(#11) | G7 |'))
+    assert get_codes(window) == ['a{6(#11)}', 'jf']
+
+
+def test_load_chart_with_chords_without_codes(window):
+    window.load_chart_text('| C6(#11) G7 | Am |')
+    assert get_codes(window) == ['a{6(#11)}jf', 'kh']
+
+
+def test_load_musicxml_with_chords_without_codes(window):
+    window.load_musicxml(io.BytesIO(b'''<?xml version="1.0"?>
+<score-partwise version="4.0"><part id="P1"><measure number="1">
+<harmony><root><root-step>C</root-step></root><kind>major-sixth</kind>
+<degree><degree-value>11</degree-value><degree-alter>1</degree-alter><degree-type>add</degree-type></degree></harmony>
+<harmony><root><root-step>G</root-step></root><kind>dominant</kind></harmony>
+</measure></part></score-partwise>'''))
+    assert get_codes(window) == ['a{6(#11)}jf']
+
+
+def test_sections_are_edited_together_and_saved(window):
+    song = Song(decode_chord_code_sequence('sjjf af sjjf af kh'))
+    song.add_section('A', 0, 2)
+    song.add_instance('A', 2)
+    window.load_song_data(song.to_dict())
+
+    window.cells[2].on_chord_symbol_code_edited('kh')
+    assert get_codes(window) == ['kh', 'af', 'kh', 'af', 'kh']
+    saved = window.get_song().to_dict()
+    assert [list(map(Chord.from_dict, m)) for m in saved['sections']['A']] == decode_chord_code_sequence('kh af')
+    assert saved['form'] == [['A', 0], ['A', 2]]
+
+    window.insert_cell(0)
+    window.insert_cell(4)  # inside the second instance
+    assert [[i.section, i.start] for i in window.get_song().form] == [['A', 1]]
+
+
+def test_timeline_is_loaded_and_saved(window):
+    timeline = Timeline(meter_changes={1: Meter(3, 4)}, durations={1: [2, 1]}, anchors={0.0: 0.5, 4.0: 2.5})
+    song = Song(decode_chord_code_sequence('sj jf'), timeline=timeline)
+    window.load_song_data(song.to_dict())
+    assert window.get_song().timeline == timeline
+
+    section_song = Song(decode_chord_code_sequence('sj jf sj jf'), timeline=timeline)
+    section_song.add_section('A', 0, 2)
+    section_song.add_instance('A', 2)
+    window.load_song_data(section_song.to_dict())
+    assert window.get_song().timeline == timeline
+
+    window.load_chord_lists(decode_chord_code_sequence('sj'))
+    assert window.get_song().timeline is None
+
+
+def test_code_suggestions_wait_for_the_user(window):
+    cell = window.cells[0]
+    popup = cell.code_suggestions_completer.popup()
+    cell.on_chord_symbol_code_edited('sp')
+    assert cell.code_suggestions_timer.isActive() and not popup.isVisible()
+
+    cell.on_chord_symbol_code_edited('sj')
+    assert not cell.code_suggestions_timer.isActive()
+
+    cell.on_chord_symbol_code_edited('sp')
+    cell.chord_codes_line_edit.returnPressed.emit()
+    assert not cell.code_suggestions_timer.isActive() and popup.isVisible()
+
+
+def test_alternatives_look_at_the_next_measure(window):
+    region = HarmonicRegion(Note(0, 0), Modality.MAJOR)
+    window.load_chord_lists(decode_chord_code_sequence('kf sj'))
+    window.cells[0].set_region(region, inherited=False)
+    window.update_regions()
+    chord, next_chord = window.cells[0].chords[0], window.cells[1].chords[0]
+    assert window.cells[0].alternatives == [get_alternatives(chord, region, next_chord)]
+
+    window.insert_cell(1)  # empty measures are skipped
+    window.cells[0].analyze_harmonies()
+    assert window.cells[0].alternatives == [get_alternatives(chord, region, next_chord)]
+
+    window.remove_cell(1)
+    window.cells[1].on_chord_symbol_code_edited('')
+    assert window.cells[0].alternatives == [get_alternatives(chord, region)]
+
+
+def test_save_with_a_corrupt_search_index(window, tmp_path, monkeypatch):
+    from chord_hand import ui
+    from chord_hand.search import SearchIndex
+    (tmp_path / SearchIndex.FILENAME).write_text('{', encoding='utf-8')
+    path = tmp_path / 'song.json'
+    warnings = []
+    monkeypatch.setattr(ui.QFileDialog, 'getSaveFileName', lambda *args: (str(path), '*.json'))
+    monkeypatch.setattr(ui.QMessageBox, 'warning', lambda parent, title, text: warnings.append(title))
+
+    window.load_chord_lists(decode_chord_code_sequence('sj jf'))
+    window.save_as_json()
+    assert Song.load(path).chords == decode_chord_code_sequence('sj jf')
+    assert warnings == ['Search index']
+
+
+def test_load_humdrum_with_chords_without_codes(window):
+    window.load_humdrum(['**mxhm\t**harm\t**region\n', '=1\t=1\t=1\n', 'C6(#11)\tI\tC\n', 'G7\tV\tC\n', '*-\t*-\t*-\n'])
+    assert get_codes(window) == ['a{6(#11)}jf']
+    assert window.cells[0].region == HarmonicRegion(Note(0, 0), Modality.MAJOR)
+    assert [analysis.to_symbol() for analysis in window.get_analyses()[0]] == ['I', 'V']
+
+
+def test_inferred_analyses_survive_editing_the_next_measure(window):
+    window.load_chord_lists(decode_chord_code_sequence('ad,f jd ad'))
+    window.cells[0].set_region(HarmonicRegion(Note(0, 0), Modality.MAJOR), inherited=False)
+    window.update_regions()
+    window.infer_analytic_types()
+    assert [a.to_symbol() for a in window.cells[0].harmonic_analysis] == ['I', 'SubV/V']
+
+    window.cells[1].on_chord_symbol_code_edited('jf')
+    assert [a.to_symbol() for a in window.cells[0].harmonic_analysis] == ['I', 'SubV/V']
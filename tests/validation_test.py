@@ -0,0 +1,56 @@
+import csv
+
+from chord_hand import diagnostics
+from chord_hand.chord.chord import Chord
+from chord_hand.chord.note import Note
+from chord_hand.chord.quality import ChordQuality
+from chord_hand.encoding.common import decode_chord_code_sequence
+from chord_hand.settings import get_context, load_context
+from chord_hand.song import Song
+from chord_hand.validation import validate_corpus, validate_file
+
+
+def test_decoders_report_spans():
+    with diagnostics.collecting('a') as collector:
+        collector.measure = 2
+        get_context().decoder.decode_measure('sjjpad')
+        get_context().decoder.decode_measure('sj/pad')
+    assert collector.diagnostics == [
+        diagnostics.Diagnostic('a', 2, (2, 4), diagnostics.DECODE_ERROR, 'jp'),
+        diagnostics.Diagnostic('a', 2, (0, 4), diagnostics.DECODE_ERROR, 'sjp'),
+    ]
+
+    with diagnostics.collecting() as collector:
+        load_context(encoding='projeto_mpb').decoder.decode_measure('aY2sQ9')
+    assert [(d.span, d.detail) for d in collector.diagnostics] == [((3, 6), 'sQ9')]
+
+
+def test_lookups_report_without_printing(capsys):
+    quality = ChordQuality('M', 'A', 'd')
+    assert quality.to_symbol() is None
+    with diagnostics.collecting() as collector:
+        quality.to_symbol()
+        quality.to_chordal_type()
+    assert [d.kind for d in collector.diagnostics] == [diagnostics.MISSING_SYMBOL, diagnostics.MISSING_CHORDAL_TYPE]
+    assert capsys.readouterr().out == ''
+
+
+def test_validate_corpus(tmp_path):
+    chords = decode_chord_code_sequence('sj jf ad')
+    chords[1].append(Note(4, 0))
+    chords[2].append(Chord(Note(0, 0), ChordQuality('M', 'A', 'd')))
+    Song(chords).save(tmp_path / 'a.json')
+    (tmp_path / 'b.txt').write_text('sj jp', encoding='utf-8')
+    (tmp_path / 'c.json').write_text('{', encoding='utf-8')
+
+    assert [d.kind for d in validate_file(tmp_path / 'a.json')] == [
+        diagnostics.INCOMPLETE_CHORD, diagnostics.ENCODE_ERROR, diagnostics.MISSING_SYMBOL,
+        diagnostics.MISSING_CHORDAL_TYPE,
+    ]
+
+    kind_counts = validate_corpus(tmp_path, tmp_path / 'report.csv', workers=1)
+    assert kind_counts[diagnostics.LOAD_ERROR] == 1
+    with open(tmp_path / 'report.csv', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 6
+    assert {'song': 'b.txt', 'measure': '2', 'start': '0', 'end': '2', 'kind': 'decode', 'detail': 'jp'} in rows